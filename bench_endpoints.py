@@ -0,0 +1,170 @@
+import argparse
+import json
+import random
+import statistics
+import time
+from urllib.parse import urljoin
+
+import requests
+
+from generate_github_manifest_final import URL_STRATEGIES
+from lfs_pointer import SNIFF_BYTES, check_served_head
+
+MAX_REDIRECTS = 10
+
+def measure_download(url, expected_size=None, timeout=10, max_bytes=None):
+    """Télécharge une URL en suivant les redirections une à une et chronomètre
+
+    Chaque essai ouvre une nouvelle session, comme l'application qui ouvre
+    un PDF : la mise en place des connexions est comprise dans les mesures.
+    Le temps au premier octet (TTFB) court jusqu'aux SNIFF_BYTES premiers
+    octets du contenu final ; le débit est mesuré sur le reste du corps.
+    """
+    trial = {"url": url, "hops": 0}
+    start = time.perf_counter()
+    with requests.Session() as session:
+        while True:
+            response = session.get(url, stream=True, allow_redirects=False, timeout=timeout)
+            if not response.is_redirect:
+                break
+            response.close()
+            trial["hops"] += 1
+            if trial["hops"] > MAX_REDIRECTS:
+                trial["error"] = f"Plus de {MAX_REDIRECTS} redirections"
+                return trial
+            url = urljoin(url, response.headers["location"])
+
+        with response:
+            trial["final_url"] = url
+            trial["status"] = response.status_code
+            if response.status_code != 200:
+                trial["error"] = f"HTTP {response.status_code}"
+                return trial
+
+            head = response.raw.read(SNIFF_BYTES, decode_content=True)
+            first_byte = time.perf_counter()
+            trial["ttfb"] = first_byte - start
+            received = len(head)
+            for chunk in response.iter_content(chunk_size=1 << 16):
+                received += len(chunk)
+                if max_bytes and received >= max_bytes:
+                    break
+            end = time.perf_counter()
+
+            length = response.headers.get("content-length")
+            served_size = int(length) if length and length.isdigit() else None
+
+    trial["total"] = end - start
+    trial["bytes"] = received
+    body_time = end - first_byte
+    trial["throughput"] = (received - len(head)) / body_time if body_time > 0 and received > len(head) else None
+    trial["kind"], error = check_served_head(head, served_size, expected_size)
+    if error:
+        trial["error"] = error
+    return trial
+
+def sample_manifest_files(manifest_path, count, seed=None):
+    """Tire count PDFs du manifeste : (chemin depuis la racine du dépôt, taille attendue)"""
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    files = []
+    for filiere in manifest["filieres"]:
+        for semestre in filiere["semestres"]:
+            for matiere in semestre["matieres"]:
+                for pdf in matiere["pdfs"]:
+                    # Manifeste local (noms) ou en ligne (entrées avec taille)
+                    name = pdf["name"] if isinstance(pdf, dict) else pdf
+                    size = pdf.get("size") if isinstance(pdf, dict) else None
+                    files.append((f"{matiere['folder']}/{name}", size))
+    rng = random.Random(seed)
+    return rng.sample(files, min(count, len(files)))
+
+def _median(values):
+    values = [value for value in values if value is not None]
+    return statistics.median(values) if values else None
+
+def bench_endpoints(strategies, files, trials, timeout=10, max_bytes=None):
+    """Mesure chaque stratégie sur chaque fichier, trials fois, et agrège"""
+    summary = {}
+    for name, template in strategies.items():
+        print(f"\n🌐 {name}: {template}")
+        results = []
+        for path, expected_size in files:
+            url = template.format(path=path)
+            for _ in range(trials):
+                try:
+                    trial = measure_download(url, expected_size, timeout, max_bytes)
+                except requests.RequestException as e:
+                    trial = {"url": url, "hops": 0, "error": str(e) or type(e).__name__}
+                results.append(trial)
+            last = results[-1]
+            print(f"   {'✅' if 'error' not in last else '❌'} {path} → {last.get('kind', '-')}, "
+                  f"{last['hops']} redirection(s){' - ' + last['error'] if 'error' in last else ''}")
+
+        working = [trial for trial in results if "error" not in trial]
+        summary[name] = {
+            "template": template,
+            "trials": len(results),
+            "ok": len(working),
+            "kinds": {kind: sum(1 for trial in results if trial.get("kind") == kind)
+                      for kind in sorted({trial.get("kind") for trial in results if trial.get("kind")})},
+            "hops": _median([trial["hops"] for trial in working]),
+            "ttfb": _median([trial["ttfb"] for trial in working]),
+            "total": _median([trial["total"] for trial in working]),
+            "throughput": _median([trial["throughput"] for trial in working])
+        }
+    return summary
+
+def recommend(summary):
+    """Stratégie la plus rapide parmi celles qui servent toujours le vrai PDF"""
+    working = [name for name, stats in summary.items() if stats["trials"] and stats["ok"] == stats["trials"]]
+    if not working:
+        return None
+    return min(working, key=lambda name: (summary[name]["total"], summary[name]["ttfb"]))
+
+def _parse_strategy(value):
+    name, sep, template = value.partition("=")
+    if not sep or "{path}" not in template:
+        raise argparse.ArgumentTypeError("attendu NOM=MODÈLE, le modèle contenant {path}")
+    return name, template
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare les points de téléchargement des PDFs")
+    parser.add_argument("--manifest", default="assets/resources_manifest.json",
+                        help="manifeste (local ou en ligne) dont on tire les fichiers")
+    parser.add_argument("--files", type=int, default=5, help="nombre de PDFs tirés du manifeste")
+    parser.add_argument("--trials", type=int, default=3, help="essais par fichier et par stratégie")
+    parser.add_argument("--seed", type=int, help="graine du tirage (reproductible)")
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--max-bytes", type=int, help="arrêter chaque téléchargement après ce nombre d'octets")
+    parser.add_argument("--strategy", action="append", type=_parse_strategy, metavar="NOM=MODÈLE",
+                        help="stratégie à mesurer à la place des stratégies GitHub (répétable)")
+    parser.add_argument("--json", help="écrire le résumé en JSON")
+    args = parser.parse_args()
+
+    strategies = dict(args.strategy) if args.strategy else URL_STRATEGIES
+    files = sample_manifest_files(args.manifest, args.files, args.seed)
+    print(f"⏱️  {len(strategies)} stratégies × {len(files)} fichiers × {args.trials} essais")
+    summary = bench_endpoints(strategies, files, args.trials, args.timeout, args.max_bytes)
+
+    def fmt(value, scale=1000, unit="ms", digits=0):
+        return "-" if value is None else f"{value * scale:.{digits}f} {unit}"
+
+    print(f"\n📊 Médianes par stratégie:")
+    for name, stats in summary.items():
+        print(f"   {name:12s} {stats['ok']}/{stats['trials']} OK, {stats['kinds']}, "
+              f"redirections {stats['hops'] if stats['hops'] is not None else '-'}, "
+              f"TTFB {fmt(stats['ttfb'])}, total {fmt(stats['total'])}, "
+              f"débit {fmt(stats['throughput'], 1e-6, 'Mo/s', 1)}")
+
+    best = recommend(summary)
+    if best:
+        print(f"\n🏆 Stratégie recommandée pour le manifeste en ligne: {best}")
+        print(f"   {summary[best]['template']}")
+    else:
+        print("\n❌ Aucune stratégie ne sert le vrai PDF à chaque essai")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"recommended": best, "strategies": summary}, f, indent=2, ensure_ascii=False)
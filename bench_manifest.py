@@ -0,0 +1,254 @@
+import argparse
+import gzip
+import json
+import os
+import statistics
+import shutil
+import tempfile
+import time
+
+from generate_github_manifest_final import expand_compact_manifest
+from manifest_artifacts import brotli, compress_variants
+from generate_manifest import load_stat_cache, scan_resources, simple_sanitize
+
+class FsCallCounter:
+    """Compte les appels système de fichiers faits depuis Python
+
+    os.stat / os.listdir / os.scandir sont instrumentés, ainsi que les
+    DirEntry.stat() (is_dir() lit d_type et ne coûte rien).
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self._originals = {}
+
+    def _count(self, name):
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def __enter__(self):
+        counter = self
+        self._originals = {name: getattr(os, name) for name in ("stat", "listdir", "scandir")}
+        original_stat = self._originals["stat"]
+        original_listdir = self._originals["listdir"]
+        original_scandir = self._originals["scandir"]
+
+        class CountingEntry:
+            def __init__(self, entry):
+                self._entry = entry
+
+            def __getattr__(self, attr):
+                return getattr(self._entry, attr)
+
+            def __fspath__(self):
+                return self._entry.path
+
+            def stat(self, **kwargs):
+                counter._count("stat")
+                return self._entry.stat(**kwargs)
+
+        class CountingScandir:
+            def __init__(self, path):
+                self._it = original_scandir(path)
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                self._it.close()
+
+            def __iter__(self):
+                return self
+
+            def __next__(self):
+                return CountingEntry(next(self._it))
+
+            def close(self):
+                self._it.close()
+
+        def stat(*args, **kwargs):
+            counter._count("stat")
+            return original_stat(*args, **kwargs)
+
+        def listdir(*args, **kwargs):
+            counter._count("listdir")
+            return original_listdir(*args, **kwargs)
+
+        def scandir(path="."):
+            counter._count("scandir")
+            return CountingScandir(path)
+
+        os.stat, os.listdir, os.scandir = stat, listdir, scandir
+        return self
+
+    def __exit__(self, *exc):
+        for name, func in self._originals.items():
+            setattr(os, name, func)
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+def make_synthetic_tree(root, n_files, filieres=6, semestres=2, files_per_matiere=200):
+    """Crée une arborescence filière/semestre/matière de n_files fichiers"""
+    n_matieres = max(1, n_files // (filieres * semestres * files_per_matiere))
+    created = 0
+    for f in range(filieres):
+        for s in range(semestres):
+            for m in range(n_matieres):
+                matiere_path = os.path.join(root, f"lf_{f}", f"semestre_{s + 1}", f"matiere_{m}")
+                os.makedirs(matiere_path)
+                for i in range(files_per_matiere):
+                    ext = "pdf" if i % 10 else "docx"
+                    with open(os.path.join(matiere_path, f"cours_{i}.{ext}"), "wb"):
+                        pass
+                    created += 1
+    return created
+
+def legacy_pipeline(resources_path):
+    """Ancien pipeline : os.walk de correction puis quatre boucles listdir/isdir"""
+    for root, dirs, files in os.walk(resources_path, topdown=False):
+        for name in files:
+            if name.endswith('.pdf'):
+                old_path = os.path.join(root, name)
+                new_path = os.path.join(root, simple_sanitize(name))
+                if old_path != new_path and os.path.exists(old_path):
+                    os.rename(old_path, new_path)
+        for name in dirs:
+            old_path = os.path.join(root, name)
+            new_path = os.path.join(root, simple_sanitize(name))
+            if old_path != new_path and os.path.exists(old_path):
+                os.rename(old_path, new_path)
+
+    manifest = {"filieres": []}
+    for filiere in sorted(os.listdir(resources_path)):
+        filiere_path = os.path.join(resources_path, filiere)
+        if not os.path.isdir(filiere_path):
+            continue
+        filiere_data = {"name": filiere, "semestres": []}
+        for semestre in sorted(os.listdir(filiere_path)):
+            semestre_path = os.path.join(filiere_path, semestre)
+            if not os.path.isdir(semestre_path):
+                continue
+            semestre_data = {"name": semestre, "matieres": []}
+            for matiere in sorted(os.listdir(semestre_path)):
+                matiere_path = os.path.join(semestre_path, matiere)
+                if not os.path.isdir(matiere_path):
+                    continue
+                pdfs = [f for f in sorted(os.listdir(matiere_path)) if f.lower().endswith('.pdf')]
+                if pdfs:
+                    semestre_data["matieres"].append({
+                        "name": matiere,
+                        "folder": f"assets/resources/{filiere}/{semestre}/{matiere}",
+                        "pdfs": pdfs
+                    })
+            if semestre_data["matieres"]:
+                filiere_data["semestres"].append(semestre_data)
+        if filiere_data["semestres"]:
+            manifest["filieres"].append(filiere_data)
+    return manifest
+
+def _measure(label, func):
+    with FsCallCounter() as counter:
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+    details = ", ".join(f"{k}={v}" for k, v in sorted(counter.counts.items()))
+    print(f"   {label:<28} {elapsed * 1000:9.1f} ms   {counter.total:8d} appels ({details})")
+    return result
+
+def bench_walk(n_files, jobs):
+    """Compare l'ancien pipeline au parcours scandir unique"""
+    tmp = tempfile.mkdtemp(prefix="bench_manifest_")
+    try:
+        print(f"🏗️  Création d'un arbre synthétique de {n_files} fichiers...")
+        created = make_synthetic_tree(tmp, n_files)
+        # Vieillir les dossiers pour que le cache puisse leur faire confiance
+        old = time.time_ns() - 3600 * 10**9
+        for root, dirs, _ in os.walk(tmp):
+            for name in dirs:
+                os.utime(os.path.join(root, name), ns=(old, old))
+        print(f"   {created} fichiers créés\n")
+
+        print("⏱️  Parcours (correction + manifest):")
+        legacy = _measure("ancien pipeline", lambda: legacy_pipeline(tmp))
+        fused = _measure("scandir unique", lambda: scan_resources(tmp, fix=True))
+        cache = load_stat_cache(os.path.join(tmp, "absent.json"))
+        _measure("scandir + cache (froid)", lambda: scan_resources(tmp, cache, fix=True))
+        _measure("scandir + cache (chaud)", lambda: scan_resources(tmp, cache, fix=True))
+        threaded = _measure(f"scandir --jobs {jobs}", lambda: scan_resources(tmp, fix=True, jobs=jobs))
+        print(f"\n   Manifest identique: {'✅' if legacy == fused == threaded else '❌'}")
+    finally:
+        shutil.rmtree(tmp)
+
+def _median_ms(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+def bench_compact(online_path, compact_path, repeat):
+    """Compare taille et temps de parsing du manifeste en ligne et du format compact"""
+    with open(online_path, "rb") as f:
+        online = f.read()
+    with open(compact_path, "rb") as f:
+        compact = f.read()
+    minified = json.dumps(json.loads(online), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    print(f"📏 Taille et parsing (médiane sur {repeat} essais):")
+    for label, data in (("en ligne (indent=2)", online), ("en ligne minifié", minified), ("compact", compact)):
+        parse_ms = _median_ms(lambda: json.loads(data), repeat)
+        print(f"   {label:<22} {len(data):9d} octets   {parse_ms:7.2f} ms")
+
+    compact_manifest = json.loads(compact)
+    expand_ms = _median_ms(lambda: expand_compact_manifest(compact_manifest), repeat)
+    identical = expand_compact_manifest(compact_manifest) == json.loads(online)
+    print(f"\n   Expansion compact → classique: {expand_ms:.2f} ms ({'✅ identique' if identical else '❌ différent'})")
+
+def bench_compress(paths, repeat):
+    """Compare taille compressée et temps de décompression de chaque variante"""
+    decompressors = {"gzip": gzip.decompress}
+    if brotli is not None:
+        decompressors["br"] = brotli.decompress
+    else:
+        print("⚠️  Module brotli absent : variante br ignorée")
+
+    for path in paths:
+        with open(path, "rb") as f:
+            data = f.read()
+        print(f"\n📦 {path} ({len(data)} octets, médiane sur {repeat} essais)")
+        for encoding, compressed in compress_variants(data).items():
+            decompress = decompressors[encoding]
+            assert decompress(compressed) == data
+            decompress_ms = _median_ms(lambda: decompress(compressed), repeat)
+            ratio = len(compressed) / len(data) * 100
+            print(f"   {encoding:<5} {len(compressed):9d} octets ({ratio:5.1f} %)   décompression {decompress_ms:6.2f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks du générateur de manifest")
+    subparsers = parser.add_subparsers(dest="bench", required=True)
+
+    walk_parser = subparsers.add_parser("walk", help="parcours de l'arborescence")
+    walk_parser.add_argument("--files", type=int, default=100_000, help="taille de l'arbre synthétique")
+    walk_parser.add_argument("--jobs", type=int, default=6, help="threads pour le scan parallèle")
+
+    compact_parser = subparsers.add_parser("compact", help="format compact du manifeste en ligne")
+    compact_parser.add_argument("--online", default="assets/resources_manifest_online.json")
+    compact_parser.add_argument("--compact", default="assets/resources_manifest_online_compact.json")
+    compact_parser.add_argument("--repeat", type=int, default=20)
+
+    compress_parser = subparsers.add_parser("compress", help="variantes gzip/brotli des manifestes")
+    compress_parser.add_argument("paths", nargs="*", default=[
+        "assets/resources_manifest.json",
+        "assets/resources_manifest_online.json",
+    ])
+    compress_parser.add_argument("--repeat", type=int, default=20)
+
+    args = parser.parse_args()
+    if args.bench == "walk":
+        bench_walk(args.files, args.jobs)
+    elif args.bench == "compact":
+        bench_compact(args.online, args.compact, args.repeat)
+    else:
+        bench_compress(args.paths, args.repeat)
@@ -0,0 +1,183 @@
+import argparse
+import asyncio
+import fnmatch
+import hashlib
+import json
+import os
+import time
+from functools import partial
+
+import aiohttp
+
+from content_store import STORE_PATH, ContentStore, hash_stream
+from host_throttle import parse_retry_after
+from lfs_pointer import parse_content_range_start
+from verify_github_urls import MANIFEST_PATH, group_entries, iter_manifest_pdfs, verify_grouped
+
+def matches(entry, selectors):
+    """Vrai si l'entrée correspond à un sélecteur filière[/semestre[/matière]] (motifs autorisés)"""
+    if not selectors:
+        return True
+    parts = (entry['filiere'], entry['semestre'], entry['matiere'])
+    for selector in selectors:
+        patterns = selector.strip('/').split('/')
+        if all(fnmatch.fnmatchcase(part, pattern) for part, pattern in zip(parts, patterns)):
+            return True
+    return False
+
+def _save_part_meta(meta_path, etag):
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({'etag': etag}, f)
+
+async def download_probe(session, entry, timeout, store, chunk_size=1 << 16):
+    """Télécharge une entrée dans le magasin, en reprenant un fichier partiel existant
+
+    Le fichier partiel survit à un arrêt brutal : au lancement suivant, son
+    contenu est rehashé puis la suite est demandée avec Range (et If-Range
+    sur l'ETag d'origine, pour ne jamais recoller deux versions). Un partiel
+    déjà complet est vérifié et rangé sans requête. Le contenu n'entre dans
+    le magasin qu'une fois taille et sha256 vérifiés.
+    """
+    pdf = entry['pdf']
+    oid = pdf.get('sha256') or pdf.get('oid')
+    expected_size = pdf.get('size')
+    if oid and store.has(oid):
+        return {'status': 200, 'oid': oid, 'bytes': 0, 'stored': True}
+
+    part_path = store.partial_path(oid or hashlib.sha256(entry['url'].encode('utf-8')).hexdigest())
+    meta_path = part_path + '.json'
+    digest, offset = hashlib.sha256(), 0
+    headers = {}
+    if os.path.exists(part_path):
+        with open(part_path, 'rb') as f:
+            digest, offset = hash_stream(f)
+    if offset and expected_size is not None and offset >= expected_size:
+        # Arrêté entre la dernière écriture et l'entrée au magasin : rien à redemander
+        if offset == expected_size and oid in (None, digest.hexdigest()):
+            store.commit(part_path, digest.hexdigest())
+            if os.path.exists(meta_path):
+                os.remove(meta_path)
+            return {'status': 200, 'oid': digest.hexdigest(), 'bytes': 0, 'resumed_from': offset}
+        os.remove(part_path)
+        digest, offset = hashlib.sha256(), 0
+    if offset:
+        headers['Range'] = f'bytes={offset}-'
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                etag = json.load(f).get('etag')
+        except (OSError, ValueError):
+            etag = None
+        if etag:
+            headers['If-Range'] = etag
+
+    # Pas de délai global : seules les connexions et lectures bloquées expirent
+    client_timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+    while True:
+        async with session.get(entry['url'], headers=headers, timeout=client_timeout) as response:
+            status = response.status
+            if status == 416 and offset:
+                # Le partiel dépasse le contenu servi (changé depuis) : on repart de zéro
+                os.remove(part_path)
+                digest, offset, headers = hashlib.sha256(), 0, {}
+                continue
+            if status == 206 and offset:
+                if parse_content_range_start(response.headers.get('Content-Range')) != offset:
+                    # Plage servie ailleurs qu'à la suite du partiel : on repart de zéro
+                    os.remove(part_path)
+                    digest, offset, headers = hashlib.sha256(), 0, {}
+                    continue
+                mode = 'ab'
+            elif status == 206:
+                # Réponse partielle sans Range demandé : rien à quoi la raccrocher
+                return {'status': status, 'error': "Réponse partielle sans reprise demandée"}
+            elif status == 200:
+                # Premier essai, ou reprise refusée (contenu changé, Range ignoré) : on repart de zéro
+                digest, offset, mode = hashlib.sha256(), 0, 'wb'
+                _save_part_meta(meta_path, response.headers.get('ETag'))
+            else:
+                return {'status': status, 'retry_after': parse_retry_after(response.headers.get('Retry-After'))}
+
+            received = 0
+            with open(part_path, mode) as f:
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    received += len(chunk)
+        break
+
+    total = offset + received
+    served_sha256 = digest.hexdigest()
+    error = None
+    if expected_size is not None and total != expected_size:
+        error = f"Taille reçue {total} ≠ taille LFS {expected_size}"
+    elif oid and served_sha256 != oid:
+        error = f"sha256 {served_sha256[:12]}… ≠ oid {oid[:12]}…"
+    if error:
+        os.remove(part_path)
+        return {'status': status, 'error': error, 'bytes': received}
+
+    store.commit(part_path, served_sha256)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    return {'status': status, 'oid': served_sha256, 'bytes': received, 'resumed_from': offset}
+
+async def bulk_download_async(selectors=(), manifest_path=MANIFEST_PATH, out_dir='offline', store_path=STORE_PATH,
+                              connections=8, timeout=30, retries=4):
+    """Télécharge la sélection dans le magasin puis la matérialise dans out_dir"""
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    store = ContentStore(store_path)
+    entries = [entry for entry in iter_manifest_pdfs(manifest) if matches(entry, selectors)]
+    folders = {(f['name'], s['name'], m['name']): m['folder'] for f in manifest['filieres']
+               for s in f['semestres'] for m in s['matieres']}
+
+    # Un contenu présent dans plusieurs matières n'est téléchargé qu'une fois
+    groups = group_entries(entries)
+    print(f"📥 {len(entries)} PDFs sélectionnés, {len(groups)} contenus distincts, {connections} connexions")
+
+    start = time.perf_counter()
+    downloaded = resumed = stored = 0
+    errors = []
+    probe = partial(download_probe, store=store)
+    async for result in verify_grouped(groups, probe=probe, concurrency=connections, per_host=connections,
+                                       timeout=timeout, retries=retries):
+        where = f"{result['filiere']}/{result['semestre']}/{result['matiere']}/{result['file']}"
+        if 'error' in result:
+            print(f"  ❌ {where} - {result['error']}")
+            errors.append(result)
+            continue
+        if result['url'] == result['probed_url']:
+            downloaded += result.get('bytes', 0)
+            resumed += bool(result.get('resumed_from'))
+            stored += result.get('stored', False)
+        folder = folders[(result['filiere'], result['semestre'], result['matiere'])]
+        store.link(result['oid'], os.path.join(out_dir, folder, result['file']))
+        print(f"  ✅ {where}")
+
+    elapsed = time.perf_counter() - start
+    print(f"\n📊 {len(entries) - len(errors)}/{len(entries)} PDFs dans {out_dir}")
+    print(f"   📦 {downloaded / 1e6:.1f} Mo téléchargés en {elapsed:.1f} s ({downloaded / 1e6 / elapsed:.1f} Mo/s)")
+    print(f"   ♻️  {stored} contenus déjà dans le magasin, {resumed} téléchargements repris")
+    return errors
+
+def bulk_download(**kwargs):
+    """Point d'entrée synchrone du téléchargement"""
+    return asyncio.run(bulk_download_async(**kwargs))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Téléchargement hors ligne de filières, semestres ou matières")
+    parser.add_argument("selectors", nargs="*", metavar="FILIÈRE[/SEMESTRE[/MATIÈRE]]",
+                        help="sélection (motifs * acceptés) ; tout le manifeste si absent")
+    parser.add_argument("--manifest", default=MANIFEST_PATH)
+    parser.add_argument("--out", default="offline", help="dossier où matérialiser les PDFs")
+    parser.add_argument("--store", default=STORE_PATH, help="magasin de contenus partagé entre les téléchargements")
+    parser.add_argument("-j", "--connections", type=int, default=8, help="téléchargements simultanés")
+    parser.add_argument("--timeout", type=float, default=30, help="délai de connexion et de lecture (s)")
+    parser.add_argument("--retries", type=int, default=4)
+    args = parser.parse_args()
+
+    errors = bulk_download(selectors=args.selectors, manifest_path=args.manifest, out_dir=args.out,
+                           store_path=args.store, connections=args.connections, timeout=args.timeout,
+                           retries=args.retries)
+    raise SystemExit(1 if errors else 0)
@@ -0,0 +1,329 @@
+import argparse
+import errno
+import hashlib
+import os
+import shutil
+import stat
+import subprocess
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+STORE_PATH = '.content_store'
+TREES = ('resources', 'assets/resources')
+
+# ioctl de clonage Linux (btrfs, XFS, bcachefs…) : _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+READ_ONLY = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+
+class ContentStore:
+    """Magasin de fichiers indexé par sha256 (l'oid LFS pour les fichiers LFS)
+
+    Chaque contenu est stocké une seule fois sous objects/ab/cdef… en lecture
+    seule ; les arborescences qui l'utilisent en sont des liens physiques.
+    Les téléchargements en cours vivent dans partial/ jusqu'à leur
+    vérification.
+    """
+
+    def __init__(self, root=STORE_PATH):
+        self.root = root
+        self.objects = os.path.join(root, 'objects')
+        self.partial = os.path.join(root, 'partial')
+
+    def object_path(self, oid):
+        return os.path.join(self.objects, oid[:2], oid[2:])
+
+    def partial_path(self, key):
+        os.makedirs(self.partial, exist_ok=True)
+        return os.path.join(self.partial, f"{key}.part")
+
+    def has(self, oid):
+        return os.path.exists(self.object_path(oid))
+
+    def iter_objects(self):
+        """(oid, chemin) de chaque objet du magasin"""
+        if not os.path.isdir(self.objects):
+            return
+        for prefix in sorted(os.listdir(self.objects)):
+            directory = os.path.join(self.objects, prefix)
+            for rest in sorted(os.listdir(directory)):
+                # Les .tmp d'une écriture interrompue n'ont pas la longueur d'un sha256
+                if len(prefix) + len(rest) == 64:
+                    yield prefix + rest, os.path.join(directory, rest)
+
+    def commit(self, path, oid):
+        """Range un fichier vérifié dans le magasin (le déplace) et renvoie son chemin"""
+        target = self.object_path(oid)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Lecture seule : une modification par un des liens corromprait tous les autres
+        os.chmod(path, READ_ONLY)
+        os.replace(path, target)
+        return target
+
+    def add(self, path, oid):
+        """Range un fichier déjà haché dans le magasin sans le déplacer (il en devient un lien)"""
+        target = self.object_path(oid)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_path = target + '.tmp'
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        try:
+            os.link(path, tmp_path)
+        except OSError:
+            shutil.copyfile(path, tmp_path)
+        os.chmod(tmp_path, READ_ONLY)
+        os.replace(tmp_path, target)
+        return target
+
+    def link(self, oid, dest, reflink=False):
+        """Matérialise un objet à dest (lien physique, copie si le lien est impossible)
+
+        Avec reflink, dest est d'abord un clone de l'objet : un fichier à part,
+        modifiable, dont les blocs restent partagés tant qu'il n'est pas modifié.
+        """
+        os.makedirs(os.path.dirname(dest) or '.', exist_ok=True)
+        source = self.object_path(oid)
+        if os.path.exists(dest):
+            # Déjà lié : rename() entre deux liens du même fichier ne ferait rien
+            if os.path.samefile(source, dest):
+                return
+            if reflink and _is_clone(source, dest):
+                return
+        tmp_path = dest + '.tmp'
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        if reflink:
+            try:
+                clone_file(source, tmp_path)
+            except OSError:
+                reflink = False
+        if not reflink:
+            try:
+                os.link(source, tmp_path)
+            except OSError:
+                # Autre système de fichiers, ou liens non supportés
+                shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, dest)
+
+    def ingest(self, path, oid, reflink=False):
+        """Remplace un fichier de contenu oid par un lien vers l'objet, créé au besoin"""
+        if not self.has(oid):
+            self.add(path, oid)
+        self.link(oid, path, reflink)
+
+def clone_file(source, dest):
+    """Copie source vers dest en partageant ses blocs ; OSError si le système ne sait pas cloner
+
+    Les dates de source sont reprises : c'est ainsi qu'un clone est reconnu
+    au passage suivant, sans relire les deux fichiers.
+    """
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "Clonage de fichiers non supporté", dest)
+    with open(source, 'rb') as src, open(dest, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.remove(dest)
+            raise
+    st = os.stat(source)
+    os.utime(dest, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+def _is_clone(source, dest):
+    a, b = os.stat(source), os.stat(dest)
+    return a.st_size == b.st_size and a.st_mtime_ns == b.st_mtime_ns
+
+def hash_stream(f, digest=None, chunk_size=1 << 20):
+    """Poursuit un hash sha256 avec le contenu d'un fichier ouvert ; renvoie (hash, octets lus)"""
+    digest = digest or hashlib.sha256()
+    size = 0
+    while chunk := f.read(chunk_size):
+        digest.update(chunk)
+        size += len(chunk)
+    return digest, size
+
+def hash_path(path):
+    with open(path, 'rb') as f:
+        return hash_stream(f)[0].hexdigest()
+
+def iter_tree_files(root):
+    """(chemin, stat) des fichiers ordinaires d'une arborescence ; les liens symboliques sont ignorés"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            path = os.path.join(dirpath, name)
+            st = os.lstat(path)
+            if stat.S_ISREG(st.st_mode):
+                yield path, st
+
+def dedup_trees(trees=TREES, store_path=STORE_PATH, reflink=False):
+    """Range le contenu des arborescences dans le magasin et les remplace par des liens
+
+    La clé est le sha256 des octets sur disque : l'oid LFS pour un PDF
+    récupéré, le sha256 du pointeur sinon. Les chemins ne changent pas, seul
+    l'inode derrière chaque nom change. Un inode déjà vu n'est haché qu'une
+    fois, si bien qu'un nouveau passage ne relit que les objets distincts.
+    """
+    store = ContentStore(store_path)
+    oids_by_inode = {}
+    sizes_before = {}
+    sizes_after = {}
+    stats = {"files": 0, "hashed": 0, "linked": 0}
+    for tree in trees:
+        for path, st in iter_tree_files(tree):
+            key = (st.st_dev, st.st_ino)
+            sizes_before[key] = st.st_size
+            oid = oids_by_inode.get(key)
+            if oid is None:
+                oid = oids_by_inode[key] = hash_path(path)
+                stats["hashed"] += st.st_size
+            stats["files"] += 1
+            already = store.has(oid) and os.path.samefile(store.object_path(oid), path)
+            store.ingest(path, oid, reflink)
+            stats["linked"] += not already
+            sizes_after[oid] = st.st_size
+    stats["distinct"] = len(sizes_after)
+    stats["bytes_before"] = sum(sizes_before.values())
+    stats["bytes_after"] = sum(sizes_after.values())
+    return stats
+
+def verify_trees(trees=TREES, store_path=STORE_PATH):
+    """Vérifie les objets du magasin et les liens des arborescences, sans rien modifier
+
+    Renvoie un rapport : objets corrompus (avec les chemins qui y sont liés),
+    copies non dédupliquées, clones, fichiers absents du magasin, objets
+    orphelins et, pour les objets corrompus, une copie saine trouvée dans
+    les arborescences.
+    """
+    store = ContentStore(store_path)
+    report = {"objects": 0, "files": 0, "corrupt": {}, "copies": [], "clones": [], "missing": [],
+              "orphans": [], "sources": {}}
+    object_inodes = {}
+    links = {}
+    for oid, path in store.iter_objects():
+        st = os.stat(path)
+        report["objects"] += 1
+        if hash_path(path) != oid:
+            report["corrupt"][oid] = []
+        object_inodes[(st.st_dev, st.st_ino)] = oid
+        links[oid] = st.st_nlink
+
+    used = set()
+    hashed = {}
+    for tree in trees:
+        for path, st in iter_tree_files(tree):
+            report["files"] += 1
+            key = (st.st_dev, st.st_ino)
+            oid = object_inodes.get(key)
+            if oid is not None:
+                used.add(oid)
+                if oid in report["corrupt"]:
+                    report["corrupt"][oid].append(path)
+                continue
+            oid = hashed.get(key) or hash_path(path)
+            hashed[key] = oid
+            if oid in report["corrupt"]:
+                report["sources"].setdefault(oid, path)
+                report["copies"].append((path, oid))
+            elif oid in links:
+                used.add(oid)
+                kind = "clones" if _is_clone(store.object_path(oid), path) else "copies"
+                report[kind].append((path, oid))
+            else:
+                report["missing"].append((path, oid))
+
+    report["orphans"] = [oid for oid, count in links.items() if count == 1 and oid not in used]
+    return report
+
+def _restore_from_git(paths):
+    """Réécrit depuis git les fichiers suivis parmi paths ; renvoie ceux restaurés"""
+    try:
+        listed = subprocess.run(["git", "ls-files", "-z", "--", *paths], capture_output=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return []
+    tracked = [path for path in listed.stdout.decode("utf-8").split("\0") if path]
+    if not tracked:
+        return []
+    # Supprimés d'abord : un fichier corrompu sur place garde parfois le stat connu de l'index
+    for path in tracked:
+        os.remove(path)
+    subprocess.run(["git", "checkout", "--", *tracked], check=True)
+    return tracked
+
+def repair_trees(trees=TREES, store_path=STORE_PATH, reflink=False, prune=False):
+    """Répare ce que verify_trees signale ; renvoie (rapport, chemins irrécupérables)
+
+    Un objet corrompu est reconstruit depuis une copie saine des
+    arborescences, sinon ses liens suivis par git sont réécrits depuis le
+    dépôt puis rangés à nouveau. Copies et fichiers absents sont liés au
+    magasin ; avec prune, les objets que plus rien n'utilise sont supprimés.
+    """
+    store = ContentStore(store_path)
+    report = verify_trees(trees, store_path)
+    lost = []
+    for oid, paths in report["corrupt"].items():
+        os.remove(store.object_path(oid))
+        source = report["sources"].get(oid)
+        if source is not None:
+            store.add(source, oid)
+            for path in paths:
+                store.link(oid, path, reflink)
+            continue
+        restored = _restore_from_git(paths)
+        for path in restored:
+            store.ingest(path, hash_path(path), reflink)
+        lost.extend(path for path in paths if path not in restored)
+
+    for path, oid in report["copies"] + report["missing"]:
+        if oid not in report["corrupt"]:
+            store.ingest(path, oid, reflink)
+    if prune:
+        for oid in report["orphans"]:
+            os.remove(store.object_path(oid))
+    return report, lost
+
+def _print_report(report):
+    print(f"   📦 {report['objects']} objets, {report['files']} fichiers")
+    for oid, paths in report["corrupt"].items():
+        print(f"   ❌ Objet corrompu {oid[:12]}… ({len(paths)} liens)")
+    for path, _ in report["missing"]:
+        print(f"   ⚠️  Absent du magasin: {path}")
+    if report["copies"]:
+        print(f"   ⚠️  {len(report['copies'])} copies non dédupliquées")
+    if report["clones"]:
+        print(f"   🧬 {len(report['clones'])} clones")
+    if report["orphans"]:
+        print(f"   🗑️  {len(report['orphans'])} objets orphelins")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Déduplication des arborescences de ressources par le magasin de contenus")
+    parser.add_argument("command", choices=["dedup", "verify", "repair"])
+    parser.add_argument("trees", nargs="*", default=list(TREES), help="arborescences (par défaut: %(default)s)")
+    parser.add_argument("--store", default=STORE_PATH)
+    parser.add_argument("--reflink", action="store_true",
+                        help="cloner les fichiers (btrfs, XFS…) au lieu de liens physiques ; repli sur les liens")
+    parser.add_argument("--prune", action="store_true", help="repair: supprimer les objets orphelins")
+    args = parser.parse_args()
+
+    if args.command == "dedup":
+        stats = dedup_trees(args.trees, args.store, args.reflink)
+        print(f"✅ {stats['files']} fichiers, {stats['distinct']} contenus distincts, {stats['linked']} liens créés")
+        print(f"   💾 {stats['bytes_before'] / 1e6:.1f} Mo → {stats['bytes_after'] / 1e6:.1f} Mo "
+              f"({stats['hashed'] / 1e6:.1f} Mo hachés)")
+    elif args.command == "verify":
+        print("🔍 VÉRIFICATION DU MAGASIN")
+        report = verify_trees(args.trees, args.store)
+        _print_report(report)
+        broken = report["corrupt"] or report["missing"] or report["copies"]
+        print("❌ Réparation nécessaire" if broken else "✅ Magasin et liens intacts")
+        raise SystemExit(1 if broken else 0)
+    else:
+        print("🔧 RÉPARATION DU MAGASIN")
+        report, lost = repair_trees(args.trees, args.store, args.reflink, args.prune)
+        _print_report(report)
+        for path in lost:
+            print(f"   ❌ Irrécupérable (ni copie saine ni fichier suivi par git): {path}")
+        print("❌ Réparation incomplète" if lost else "✅ Réparé")
+        raise SystemExit(1 if lost else 0)
@@ -1,15 +1,259 @@
+import argparse
+import hashlib
 import json
 import os
+import subprocess
 import urllib.parse
 
-def generate_github_manifest_final():
+from manifest_artifacts import ARTIFACT_SUFFIXES, write_atomic, write_artifacts
+
+GITHUB_USERNAME = "light667"
+GITHUB_REPO = "PolyAssistant-Android"
+GITHUB_BRANCH = "main"
+GITHUB_DOSSIER = "assets"
+
+def github_media_url(ref=GITHUB_BRANCH):
+    """Préfixe des URLs media pour une branche ou un commit"""
+    return f"https://media.githubusercontent.com/media/{GITHUB_USERNAME}/{GITHUB_REPO}/{ref}/{GITHUB_DOSSIER}"
+
+GITHUB_MEDIA_URL = github_media_url()
+
+DEFAULT_SOURCE = "github_media_lfs"
+
+# Points de téléchargement possibles pour un fichier du dépôt ({path} : chemin depuis la racine)
+URL_STRATEGIES = {
+    # raw : sert le pointeur LFS, pas le PDF
+    "raw": f"https://raw.githubusercontent.com/{GITHUB_USERNAME}/{GITHUB_REPO}/{GITHUB_BRANCH}/{{path}}",
+    # github.com/raw : redirige vers raw ou media
+    "github_raw": f"https://github.com/{GITHUB_USERNAME}/{GITHUB_REPO}/raw/{GITHUB_BRANCH}/{{path}}",
+    "media": f"https://media.githubusercontent.com/media/{GITHUB_USERNAME}/{GITHUB_REPO}/{GITHUB_BRANCH}/{{path}}"
+}
+
+# Format compact : modèles d'URL et sources déclarés une seule fois
+COMPACT_FORMAT = "polyassistant-manifest-compact"
+COMPACT_VERSION = 2
+# v2 ajoute les PDFs épinglés (refs par matière) et le bloc cache ; v1 reste lisible
+COMPACT_READABLE_VERSIONS = (1, 2)
+COMPACT_MANIFEST_PATH = 'assets/resources_manifest_online_compact.json'
+
+# Manifeste découpé : un petit index + un fichier par filière (ou semestre)
+SHARDS_DIR = 'assets/manifest_shards'
+SHARD_INDEX_NAME = 'index.json'
+SHARD_INDEX_FORMAT = "polyassistant-manifest-index"
+SHARD_INDEX_VERSION = 1
+
+# URLs épinglées sur un commit : le contenu ne change jamais, le cache peut être permanent
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Le manifeste, lui, change à chaque publication et doit être revalidé
+MANIFEST_CACHE_CONTROL = "no-cache"
+
+def _git(*args):
+    return subprocess.run(["git", "-c", "core.quotepath=off", *args],
+                          check=True, capture_output=True, text=True).stdout
+
+def pinned_commits(paths, ref="HEAD"):
+    """Associe chaque fichier au dernier commit qui l'a modifié (jusqu'à ref)
+    
+    Un fichier inchangé garde le même commit d'une publication à l'autre,
+    donc la même URL et les mêmes entrées de cache. Les fichiers absents de
+    ref ou modifiés localement ne sont pas épinglés : leur URL sur le
+    commit renverrait une autre version, ou rien.
+    """
+    head = _git("rev-parse", ref).strip()
+    root = GITHUB_DOSSIER
+    tracked = set(_git("ls-tree", "-r", "--name-only", head, "--", root).splitlines())
+    modified = set(_git("diff", "--name-only", head, "--", root).splitlines())
+    wanted = set(paths) & tracked - modified
+    
+    pins = {}
+    # Historique du plus récent au plus ancien : la première apparition est la dernière modification
+    for block in _git("log", "--format=%x00%H", "--name-only", head, "--", root).split("\0")[1:]:
+        commit, *names = block.strip().splitlines()
+        for name in names:
+            if name in wanted and name not in pins:
+                pins[name] = commit
+        if len(pins) == len(wanted):
+            break
+    return head, pins
+
+def _online_pdf_entry(url_template, source, folder, pdf_name, oid, blobs):
+    """Construit l'entrée d'un PDF telle qu'elle figure dans le manifeste en ligne"""
+    # Encoder le nom du fichier pour l'URL
+    pdf_url = url_template.format(folder=folder, name=urllib.parse.quote(pdf_name))
+    
+    pdf_entry = {
+        "name": pdf_name,
+        "url": pdf_url,
+        "source": source
+    }
+    if oid:
+        blob = blobs[oid]
+        pdf_entry["size"] = blob["size"]
+        pdf_entry["sha256"] = oid
+        if blob["lfs"]:
+            pdf_entry["oid"] = oid
+    return pdf_entry
+
+def build_compact_manifest(manifest, pins=None, cache=None):
+    """Construit le manifeste compact à partir du manifeste local
+    
+    Les URLs ne sont pas répétées : chaque entrée garde son nom relatif et
+    le modèle d'URL de sa source est déclaré en tête du fichier. Les PDFs
+    épinglés (--pin) gardent leur commit dans "refs", aligné sur "pdfs".
+    """
+    pins = pins or {}
+    filieres = []
+    for filiere in manifest["filieres"]:
+        semestres = []
+        for semestre in filiere["semestres"]:
+            matieres = []
+            for matiere in semestre["matieres"]:
+                refs = [pins.get(f"{GITHUB_DOSSIER}/{matiere['folder']}/{pdf_name}") for pdf_name in matiere["pdfs"]]
+                if any(refs):
+                    matiere = {**matiere, "refs": refs}
+                matieres.append(matiere)
+            semestres.append({**semestre, "matieres": matieres})
+        filieres.append({**filiere, "semestres": semestres})
+    
+    compact = {
+        "format": COMPACT_FORMAT,
+        "version": COMPACT_VERSION,
+        "default_source": DEFAULT_SOURCE,
+        "sources": {
+            DEFAULT_SOURCE: {
+                "url": f"{GITHUB_MEDIA_URL}/{{folder}}/{{name}}",
+                "pinned_url": f"{github_media_url('{ref}')}/{{folder}}/{{name}}"
+            }
+        },
+        "filieres": filieres
+    }
+    if "blobs" in manifest:
+        compact["blobs"] = manifest["blobs"]
+    if cache:
+        compact["cache"] = cache
+    return compact
+
+def expand_compact_manifest(compact):
+    """Reconstruit le manifeste en ligne classique à partir du format compact"""
+    if compact.get("format") != COMPACT_FORMAT or compact.get("version") not in COMPACT_READABLE_VERSIONS:
+        raise ValueError(f"Format de manifeste compact non supporté: {compact.get('format')} v{compact.get('version')}")
+    
+    source = compact["default_source"]
+    url_template = compact["sources"][source]["url"]
+    pinned_template = compact["sources"][source].get("pinned_url")
+    blobs = compact.get("blobs", {})
+    
+    def pdf_entry(folder, pdf_name, oid, ref):
+        if not ref:
+            return _online_pdf_entry(url_template, source, folder, pdf_name, oid, blobs)
+        entry = _online_pdf_entry(pinned_template.replace("{ref}", ref), source, folder, pdf_name, oid, blobs)
+        entry["immutable"] = True
+        return entry
+    
+    filieres = []
+    for filiere in compact["filieres"]:
+        semestres = []
+        for semestre in filiere["semestres"]:
+            matieres = []
+            for matiere in semestre["matieres"]:
+                oids = matiere.get("oids") or [None] * len(matiere["pdfs"])
+                refs = matiere.get("refs") or [None] * len(matiere["pdfs"])
+                matieres.append({
+                    "name": matiere["name"],
+                    "folder": matiere["folder"],
+                    "pdfs": [
+                        pdf_entry(matiere["folder"], pdf_name, oid, ref)
+                        for pdf_name, oid, ref in zip(matiere["pdfs"], oids, refs)
+                    ]
+                })
+            semestres.append({"name": semestre["name"], "matieres": matieres})
+        filieres.append({"name": filiere["name"], "semestres": semestres})
     
-    GITHUB_USERNAME = "light667"
-    GITHUB_REPO = "PolyAssistant-Android"
-    GITHUB_BRANCH = "main"
-    GITHUB_DOSSIER = "assets"
+    expanded = {"filieres": filieres}
+    if "blobs" in compact:
+        expanded["blobs"] = compact["blobs"]
+    if "cache" in compact:
+        expanded["cache"] = compact["cache"]
+    return expanded
+
+def _write_shard(shards_dir, stem, payload):
+    """Écrit un shard nommé d'après son contenu et renvoie sa référence"""
+    data = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    digest = hashlib.sha256(data).hexdigest()
+    shard_name = f"{stem}.{digest[:16]}.json"
+    shard_path = os.path.join(shards_dir, shard_name)
+    # Même nom = même contenu : un shard existant n'est jamais réécrit
+    if not os.path.exists(shard_path):
+        write_atomic(shard_path, data)
+    return {"shard": shard_name, "sha256": digest, "size": len(data)}
+
+def _shard_refs(index):
+    """Liste les shards référencés par un index"""
+    for filiere in index.get("filieres", []):
+        if "shard" in filiere:
+            yield filiere
+        for semestre in filiere.get("semestres", []):
+            if isinstance(semestre, dict) and "shard" in semestre:
+                yield semestre
+
+def write_sharded_manifest(online_manifest, shards_dir=SHARDS_DIR, per_semestre=False):
+    """Découpe le manifeste en ligne en un index racine et un shard par filière
+    
+    Avec per_semestre, chaque semestre a son propre shard. Les shards sont
+    écrits avant l'index, qui est remplacé atomiquement : un lecteur voit
+    toujours un ensemble cohérent. Les shards de l'index précédent sont
+    conservés pour les clients en cours de chargement.
+    """
+    os.makedirs(shards_dir, exist_ok=True)
+    index_path = os.path.join(shards_dir, SHARD_INDEX_NAME)
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            previous_index = json.load(f)
+    except (OSError, ValueError):
+        previous_index = {}
+    
+    index = {"format": SHARD_INDEX_FORMAT, "version": SHARD_INDEX_VERSION, "filieres": []}
+    for filiere in online_manifest["filieres"]:
+        if per_semestre:
+            semestres = []
+            for semestre in filiere["semestres"]:
+                ref = _write_shard(shards_dir, f"{filiere['name']}.{semestre['name']}", semestre)
+                semestres.append({"name": semestre["name"], **ref})
+            index["filieres"].append({"name": filiere["name"], "semestres": semestres})
+        else:
+            ref = _write_shard(shards_dir, filiere["name"], filiere)
+            index["filieres"].append({
+                "name": filiere["name"],
+                "semestres": [semestre["name"] for semestre in filiere["semestres"]],
+                **ref
+            })
+    
+    verify_sharded_manifest(index, shards_dir)
+    write_atomic(index_path, json.dumps(index, ensure_ascii=False, indent=2).encode('utf-8'))
     
-    GITHUB_MEDIA_URL = f"https://media.githubusercontent.com/media/{GITHUB_USERNAME}/{GITHUB_REPO}/{GITHUB_BRANCH}/{GITHUB_DOSSIER}"
+    # Nettoyage des shards que ni l'index courant ni le précédent ne référencent
+    keep = {ref["shard"] for ref in _shard_refs(index)} | {ref["shard"] for ref in _shard_refs(previous_index)}
+    keep.add(SHARD_INDEX_NAME)
+    for name in os.listdir(shards_dir):
+        # Les variantes compressées suivent leur shard
+        base = name
+        for suffix in ARTIFACT_SUFFIXES:
+            base = base.removesuffix(suffix)
+        if base not in keep:
+            os.remove(os.path.join(shards_dir, name))
+    
+    return index
+
+def verify_sharded_manifest(index, shards_dir=SHARDS_DIR):
+    """Vérifie que chaque shard référencé existe et correspond à son hash"""
+    for ref in _shard_refs(index):
+        with open(os.path.join(shards_dir, ref["shard"]), 'rb') as f:
+            data = f.read()
+        if len(data) != ref["size"] or hashlib.sha256(data).hexdigest() != ref["sha256"]:
+            raise ValueError(f"Shard incohérent avec l'index: {ref['shard']}")
+
+def generate_github_manifest_final(compact=False, shards=False, shards_per_semestre=False, compress=False,
+                                   resolve_redirects=False, redirect_ttl=None, pin=False):
     
     print("🔗 Configuration GitHub FINALE (LFS Compatible):")
     print(f"   👤 Utilisateur: {GITHUB_USERNAME}")
@@ -20,12 +264,36 @@ def generate_github_manifest_final():
     with open('assets/resources_manifest.json', 'r', encoding='utf-8') as f:
         manifest = json.load(f)
     
+    blobs = manifest.get('blobs', {})
+    url_template = f"{GITHUB_MEDIA_URL}/{{folder}}/{{name}}"
+    
+    pins = {}
+    cache = None
+    if pin:
+        paths = [f"{GITHUB_DOSSIER}/{m['folder']}/{pdf_name}" for f in manifest['filieres']
+                 for s in f['semestres'] for m in s['matieres'] for pdf_name in m['pdfs']]
+        head, pins = pinned_commits(paths)
+        print(f"   📌 Épinglage sur {head[:12]}: {len(pins)}/{len(paths)} PDFs à URL immuable")
+        if not _git("branch", "-r", "--contains", head).strip():
+            print(f"   ⚠️  Le commit {head[:12]} n'est sur aucune branche distante : poussez-le avant de publier")
+        cache = {
+            "commit": head,
+            "pdf_cache_control": IMMUTABLE_CACHE_CONTROL,
+            "manifest_cache_control": MANIFEST_CACHE_CONTROL
+        }
+    
+    if compact:
+        # Sérialisé avant la mise à jour en place ci-dessous
+        compact_json = json.dumps(build_compact_manifest(manifest, pins, cache), ensure_ascii=False, separators=(',', ':'))
+    
     # Mettre à jour le manifeste avec les URLs media GitHub
     for filiere in manifest['filieres']:
         for semestre in filiere['semestres']:
             for matiere in semestre['matieres']:
                 pdfs_with_urls = []
                 folder = matiere['folder']
+                # sha256 des contenus (manifest généré avec --blobs), alignés sur les PDFs
+                oids = matiere.pop('oids', None) or [None] * len(matiere['pdfs'])
                 
                 # ✅ CORRECTION CRITIQUE : NE PAS MODIFIER LE DOSSIER !
                 # Le dossier dans le manifeste est déjà correct : "assets/resources/..."
@@ -34,28 +302,60 @@ def generate_github_manifest_final():
                 print(f"\n📚 {filiere['name']} -> {semestre['name']} -> {matiere['name']}")
                 print(f"   📁 Dossier: {folder}")
                 
-                for pdf_name in matiere['pdfs']:
-                    # Encoder le nom du fichier pour l'URL
-                    encoded_pdf_name = urllib.parse.quote(pdf_name)
-                    
+                for pdf_name, oid in zip(matiere['pdfs'], oids):
                     # ✅ CORRECTION : Utiliser le dossier COMPLET sans modification
-                    pdf_url = f"{GITHUB_MEDIA_URL}/{folder}/{encoded_pdf_name}"
-                    
-                    pdfs_with_urls.append({
-                        "name": pdf_name,
-                        "url": pdf_url,
-                        "source": "github_media_lfs"
-                    })
+                    commit = pins.get(f"{GITHUB_DOSSIER}/{folder}/{pdf_name}")
+                    if commit:
+                        pdf_template = f"{github_media_url(commit)}/{{folder}}/{{name}}"
+                        pdf_entry = _online_pdf_entry(pdf_template, DEFAULT_SOURCE, folder, pdf_name, oid, blobs)
+                        pdf_entry["immutable"] = True
+                    else:
+                        pdf_entry = _online_pdf_entry(url_template, DEFAULT_SOURCE, folder, pdf_name, oid, blobs)
+                    pdfs_with_urls.append(pdf_entry)
                     
                     print(f"   📄 {pdf_name}")
-                    print(f"   🔗 {pdf_url}")
+                    print(f"   🔗 {pdf_entry['url']}")
                 
                 matiere['pdfs'] = pdfs_with_urls
     
+    if cache:
+        manifest['cache'] = cache
+    
+    if resolve_redirects:
+        # Importé ici : seule la résolution a besoin d'aiohttp
+        from redirect_resolver import DEFAULT_REDIRECT_TTL, REDIRECT_CACHE_PATH, resolve_manifest_urls
+        if redirect_ttl is None:
+            redirect_ttl = DEFAULT_REDIRECT_TTL
+        # Adresse sans redirection pour les clients qui savent revenir à "url"
+        resolved, annotated = resolve_manifest_urls(manifest, REDIRECT_CACHE_PATH, redirect_ttl)
+        print(f"\n↪️  Redirections: {resolved} URLs résolues, {annotated} adresses directes notées")
+    
     # Sauvegarder le nouveau manifeste
     with open('assets/resources_manifest_online.json', 'w', encoding='utf-8') as f:
         json.dump(manifest, f, indent=2, ensure_ascii=False)
     
+    if compact:
+        with open(COMPACT_MANIFEST_PATH, 'w', encoding='utf-8') as f:
+            f.write(compact_json)
+        print(f"\n🗜️  Manifeste compact: {COMPACT_MANIFEST_PATH} ({os.path.getsize(COMPACT_MANIFEST_PATH)} octets)")
+    
+    written = ['assets/resources_manifest_online.json']
+    if compact:
+        written.append(COMPACT_MANIFEST_PATH)
+    
+    if shards or shards_per_semestre:
+        index = write_sharded_manifest(manifest, SHARDS_DIR, per_semestre=shards_per_semestre)
+        print(f"\n🧩 Manifeste découpé: {SHARDS_DIR}/{SHARD_INDEX_NAME} ({len(list(_shard_refs(index)))} shards)")
+        written.append(os.path.join(SHARDS_DIR, SHARD_INDEX_NAME))
+        written.extend(os.path.join(SHARDS_DIR, ref["shard"]) for ref in _shard_refs(index))
+    
+    if compress:
+        print("\n🗜️  Variantes compressées:")
+        for path in written:
+            meta = write_artifacts(path)
+            sizes = ", ".join(f"{enc} {v['size']}" for enc, v in meta["variants"].items())
+            print(f"   {path}: {meta['size']} octets → {sizes}")
+    
     total_pdfs = sum(len(m['pdfs']) for f in manifest['filieres'] for s in f['semestres'] for m in s['matieres'])
     print(f"\n✅ Manifeste FINAL (LFS Compatible) généré avec succès!")
     print(f"📊 Total de {total_pdfs} PDFs configurés")
@@ -63,4 +363,23 @@ def generate_github_manifest_final():
     return True
 
 if __name__ == "__main__":
-    generate_github_manifest_final()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Génération du manifeste en ligne (URLs GitHub media)")
+    parser.add_argument("--compact", action="store_true", help=f"écrire aussi {COMPACT_MANIFEST_PATH}")
+    parser.add_argument("--shards", action="store_true", help=f"écrire un index et un shard par filière dans {SHARDS_DIR}")
+    parser.add_argument("--shards-per-semestre", action="store_true", help="un shard par semestre plutôt que par filière")
+    parser.add_argument("--compress", action="store_true", help="écrire les variantes gzip/brotli et les métadonnées ETag")
+    parser.add_argument("--resolve-redirects", action="store_true",
+                        help="suivre les redirections et noter l'adresse finale stable dans direct_url")
+    parser.add_argument("--redirect-ttl", type=float,
+                        help="durée (h) de validité d'une résolution en cache (24 h par défaut)")
+    parser.add_argument("--pin", action="store_true",
+                        help="URLs épinglées sur le dernier commit de chaque PDF (cache permanent)")
+    args = parser.parse_args()
+    if args.compact and args.resolve_redirects:
+        # Le format compact ne porte pas direct_url : son expansion différerait du manifeste en ligne
+        parser.error("--compact ne se combine pas avec --resolve-redirects")
+    
+    generate_github_manifest_final(compact=args.compact, shards=args.shards,
+                                   shards_per_semestre=args.shards_per_semestre, compress=args.compress,
+                                   resolve_redirects=args.resolve_redirects, redirect_ttl=args.redirect_ttl and args.redirect_ttl * 3600,
+                                   pin=args.pin)
@@ -2,6 +2,23 @@ import os
 import json
 import unicodedata
 import re
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+
+from lfs_pointer import read_blob_info
+from manifest_artifacts import write_artifacts
+
+CACHE_PATH = ".resources_manifest_cache.json"
+CACHE_VERSION = 3
+
+# Fenêtre (ns) pendant laquelle le mtime d'un dossier est jugé peu fiable
+RACY_WINDOW_NS = 2_000_000_000
+
+# Nom déjà propre : simple_sanitize le laisserait inchangé
+CLEAN_NAME_RE = re.compile(r'[a-z0-9.]+(?:_[a-z0-9.]+)*')
 
 def simple_sanitize(name):
     """Version ultra-simple et fiable de sanitize"""
@@ -29,85 +46,259 @@ def simple_sanitize(name):
 def quick_fix_structure(resources_path):
     """Correction rapide et fiable"""
     print("🔧 Correction rapide de la structure...")
+    scan_resources(resources_path, fix=True)
+
+def load_stat_cache(cache_path):
+    """Charge le cache de stat (cache vide s'il est absent ou obsolète)"""
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if cache.get("version") == CACHE_VERSION:
+            return cache
+    except (OSError, ValueError):
+        pass
+    return {"version": CACHE_VERSION, "dirs": {}}
+
+def save_stat_cache(cache, cache_path):
+    """Sauvegarde atomique du cache de stat"""
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, cache_path)
+
+def _rename_entry(dir_path, name, new_name, is_dir):
+    """Renomme une entrée, en gardant l'ancien nom en cas d'échec"""
+    try:
+        os.rename(os.path.join(dir_path, name), os.path.join(dir_path, new_name))
+    except OSError:
+        return name
+    print(f"{'📁' if is_dir else '📄'} {name} → {new_name}")
+    return new_name
+
+def _scan_dir(resources_path, rel, cache, new_dirs, now_ns, fix):
+    """Liste un dossier en une seule passe scandir
     
-    for root, dirs, files in os.walk(resources_path, topdown=False):
-        # Renommer les fichiers
-        for file in files:
-            if file.endswith('.pdf'):
-                old_path = os.path.join(root, file)
-                new_name = simple_sanitize(file)
-                new_path = os.path.join(root, new_name)
-                
-                if old_path != new_path and os.path.exists(old_path):
-                    try:
-                        os.rename(old_path, new_path)
-                        print(f"📄 {file} → {new_name}")
-                    except:
-                        pass
-        
-        # Renommer les dossiers
-        for dir_name in dirs:
-            old_path = os.path.join(root, dir_name)
-            new_name = simple_sanitize(dir_name)
-            new_path = os.path.join(root, new_name)
-            
-            if old_path != new_path and os.path.exists(old_path):
-                try:
-                    os.rename(old_path, new_path)
-                    print(f"📁 {dir_name} → {new_name}")
-                except:
-                    pass
-
-def generate_simple_manifest(resources_path):
-    """Génération simple du manifest"""
-    manifest = {"filieres": []}
+    Les noms sont corrigés au passage si fix est vrai. Le cache est réutilisé
+    tel quel si le mtime du dossier n'a pas bougé.
+    """
+    path = os.path.join(resources_path, rel) if rel else resources_path
+    mtime_ns = None
+    if cache is not None:
+        mtime_ns = os.stat(path).st_mtime_ns
+        cached = cache["dirs"].get(rel)
+        if cached is not None and cached["mtime_ns"] == mtime_ns and (cached["fixed"] or not fix):
+            new_dirs[rel] = cached
+            return cached
     
-    for filiere in sorted(os.listdir(resources_path)):
-        filiere_path = os.path.join(resources_path, filiere)
-        if not os.path.isdir(filiere_path):
-            continue
+    subdirs, files, renamed = set(), {}, False
+    with os.scandir(path) as it:
+        for entry in it:
+            name = entry.name
+            # Type lu depuis d_type : pas de stat supplémentaire
+            is_dir = entry.is_dir()
+            if fix and (is_dir or name.endswith('.pdf')) and not CLEAN_NAME_RE.fullmatch(name):
+                new_name = simple_sanitize(name)
+                if new_name != name:
+                    name = _rename_entry(path, name, new_name, is_dir)
+                    renamed = renamed or name == new_name
             
-        filiere_data = {"name": filiere, "semestres": []}
-        
-        for semestre in sorted(os.listdir(filiere_path)):
-            semestre_path = os.path.join(filiere_path, semestre)
-            if not os.path.isdir(semestre_path):
-                continue
-                
-            semestre_data = {"name": semestre, "matieres": []}
-            
-            for matiere in sorted(os.listdir(semestre_path)):
-                matiere_path = os.path.join(semestre_path, matiere)
-                if not os.path.isdir(matiere_path):
-                    continue
-                    
-                pdfs = [f for f in sorted(os.listdir(matiere_path)) if f.lower().endswith('.pdf')]
-                if pdfs:
-                    semestre_data["matieres"].append({
-                        "name": matiere,
-                        "folder": f"assets/resources/{filiere}/{semestre}/{matiere}",
-                        "pdfs": pdfs
-                    })
-            
-            if semestre_data["matieres"]:
-                filiere_data["semestres"].append(semestre_data)
+            if is_dir:
+                subdirs.add(name)
+            if name.lower().endswith('.pdf'):
+                # d_ino est fourni par scandir ; un renommage le conserve
+                files[name] = entry.inode()
+    
+    if mtime_ns is not None:
+        # Nos propres renommages ont modifié le dossier
+        if renamed:
+            mtime_ns = os.stat(path).st_mtime_ns
+        # Un mtime trop récent n'est pas fiable : une écriture dans le même
+        # tick d'horloge ne le changerait pas. On force alors un rescan.
+        if now_ns - mtime_ns < RACY_WINDOW_NS:
+            mtime_ns = None
+    
+    dir_entry = {
+        "mtime_ns": mtime_ns,
+        "fixed": fix,
+        "subdirs": sorted(subdirs),
+        "pdfs": sorted(files),
+        "files": files
+    }
+    new_dirs[rel] = dir_entry
+    return dir_entry
+
+def _fix_below(scan, rel, dir_entry):
+    """Corrige les sous-dossiers situés sous le niveau matière"""
+    for name in dir_entry["subdirs"]:
+        child_rel = f"{rel}/{name}"
+        _fix_below(scan, child_rel, scan(child_rel))
+
+def _scan_semestre(scan, fix, filiere, semestre):
+    """Scanne un semestre et renvoie son entrée de manifest"""
+    semestre_data = {"name": semestre, "matieres": []}
+    semestre_rel = f"{filiere}/{semestre}"
+    
+    for matiere in scan(semestre_rel)["subdirs"]:
+        matiere_rel = f"{semestre_rel}/{matiere}"
+        matiere_dir = scan(matiere_rel)
+        if fix:
+            _fix_below(scan, matiere_rel, matiere_dir)
         
-        if filiere_data["semestres"]:
-            manifest["filieres"].append(filiere_data)
+        pdfs = list(matiere_dir["pdfs"])
+        if pdfs:
+            semestre_data["matieres"].append({
+                "name": matiere,
+                "folder": f"assets/resources/{filiere}/{semestre}/{matiere}",
+                "pdfs": pdfs
+            })
+    
+    return semestre_data
+
+def scan_resources(resources_path, cache=None, fix=True, jobs=1):
+    """Parcours unique de l'arborescence : correction des noms et manifest
+    
+    Si un cache de stat est fourni (voir load_stat_cache), seuls les dossiers
+    dont le mtime a changé sont relus ; le cache est mis à jour sur place.
+    Avec jobs > 1, les filières et semestres sont scannés en parallèle.
+    """
+    new_dirs = {}
+    scan = partial(_scan_dir, resources_path, cache=cache, new_dirs=new_dirs,
+                   now_ns=time.time_ns(), fix=fix)
     
+    root = scan("")
+    with (ThreadPoolExecutor(max_workers=jobs) if jobs > 1 else nullcontext()) as pool:
+        mapper = pool.map if pool else map
+        filiere_dirs = list(mapper(scan, root["subdirs"]))
+        tasks = [
+            (filiere, semestre)
+            for filiere, filiere_dir in zip(root["subdirs"], filiere_dirs)
+            for semestre in filiere_dir["subdirs"]
+        ]
+        semestres = list(mapper(lambda task: _scan_semestre(scan, fix, *task), tasks))
+    
+    # Fusion dans l'ordre trié des tâches : le JSON reste stable
+    semestres_by_filiere = {}
+    for (filiere, _), semestre_data in zip(tasks, semestres):
+        if semestre_data["matieres"]:
+            semestres_by_filiere.setdefault(filiere, []).append(semestre_data)
+    
+    manifest = {"filieres": []}
+    for filiere in root["subdirs"]:
+        if filiere in semestres_by_filiere:
+            manifest["filieres"].append({"name": filiere, "semestres": semestres_by_filiere[filiere]})
+    
+    if cache is not None:
+        # Les dossiers disparus sont oubliés
+        cache["dirs"] = new_dirs
+    
+    return manifest
+
+def generate_simple_manifest(resources_path, cache=None, jobs=1):
+    """Génération simple du manifest (sans correction des noms)"""
+    return scan_resources(resources_path, cache, fix=False, jobs=jobs)
+
+def _blob_info_cached(path, rel, old_files, new_files, now_ns, by_inode):
+    """Renvoie (sha256, taille, est_lfs), sauf si taille, mtime et inode n'ont pas bougé
+    
+    Les liens physiques d'un même inode (arborescences dédupliquées par
+    content_store.py) ne sont lus qu'une fois.
+    """
+    st = os.stat(path)
+    key = [st.st_size, st.st_mtime_ns, st.st_ino]
+    inode = (st.st_dev, st.st_ino)
+    
+    cached = old_files.get(rel)
+    if cached is not None and cached[:3] == key:
+        info = tuple(cached[3])
+    elif inode in by_inode:
+        info = by_inode[inode]
+    else:
+        info = read_blob_info(path)
+    by_inode[inode] = info
+    
+    # Même précaution que pour les dossiers : un mtime récent n'est pas fiable
+    if now_ns - st.st_mtime_ns >= RACY_WINDOW_NS:
+        new_files[rel] = key + [list(info)]
+    return info
+
+def attach_blobs(manifest, resources_path, cache=None, jobs=1):
+    """Ajoute au manifest la table des blobs, indexée par sha256 (oid LFS)
+    
+    Chaque matière reçoit une liste "oids" alignée sur "pdfs". Les pointeurs
+    LFS ne sont lus que sur leurs premiers octets ; les vrais fichiers sont
+    hachés par blocs. Avec jobs > 1, les lectures sont faites en parallèle.
+    """
+    old_files = cache.get("files", {}) if cache is not None else {}
+    new_files = {}
+    by_inode = {}
+    now_ns = time.time_ns()
+    
+    matieres = []
+    pdf_rels = []
+    for filiere in manifest["filieres"]:
+        for semestre in filiere["semestres"]:
+            for matiere in semestre["matieres"]:
+                rel = f"{filiere['name']}/{semestre['name']}/{matiere['name']}"
+                matieres.append(matiere)
+                pdf_rels.extend(f"{rel}/{pdf_name}" for pdf_name in matiere["pdfs"])
+    
+    def blob_info(pdf_rel):
+        pdf_path = os.path.join(resources_path, pdf_rel)
+        return _blob_info_cached(pdf_path, pdf_rel, old_files, new_files, now_ns, by_inode)
+    
+    with (ThreadPoolExecutor(max_workers=jobs) if jobs > 1 else nullcontext()) as pool:
+        infos = iter(list((pool.map if pool else map)(blob_info, pdf_rels)))
+    
+    blobs = {}
+    for matiere in matieres:
+        oids = []
+        for _ in matiere["pdfs"]:
+            sha256, size, is_lfs = next(infos)
+            blobs[sha256] = {"size": size, "lfs": is_lfs}
+            oids.append(sha256)
+        matiere["oids"] = oids
+    
+    manifest["blobs"] = dict(sorted(blobs.items()))
+    if cache is not None:
+        cache["files"] = new_files
     return manifest
 
+def write_manifest_if_changed(manifest, manifest_path):
+    """Écrit le manifest seulement si son contenu a changé"""
+    content = json.dumps(manifest, indent=2, ensure_ascii=False)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            if f.read() == content:
+                return False
+    except OSError:
+        pass
+    
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    return True
+
 # EXÉCUTION RAPIDE
 if __name__ == "__main__":
-    resources_path = "assets/resources"
+    parser = argparse.ArgumentParser(description="Correction des noms et génération du manifest")
+    parser.add_argument("--jobs", type=int, default=1, help="nombre de scans parallèles")
+    parser.add_argument("--blobs", action="store_true", help="ajouter la table des blobs (sha256, taille)")
+    parser.add_argument("--compress", action="store_true", help="écrire les variantes gzip/brotli et les métadonnées ETag")
+    args = parser.parse_args()
     
-    print("🚀 CORRECTION RAPIDE")
-    quick_fix_structure(resources_path)
+    resources_path = "assets/resources"
     
-    print("\n📋 GÉNÉRATION DU MANIFEST")
-    manifest = generate_simple_manifest(resources_path)
+    print("🚀 CORRECTION RAPIDE + 📋 GÉNÉRATION DU MANIFEST")
+    cache = load_stat_cache(CACHE_PATH)
+    manifest = scan_resources(resources_path, cache, fix=True, jobs=args.jobs)
+    if args.blobs:
+        attach_blobs(manifest, resources_path, cache, jobs=args.jobs)
     
-    with open("assets/resources_manifest.json", "w", encoding="utf-8") as f:
-        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    if write_manifest_if_changed(manifest, "assets/resources_manifest.json"):
+        print("📝 Manifest mis à jour")
+    else:
+        print("💤 Aucun changement")
+    if args.compress:
+        write_artifacts("assets/resources_manifest.json")
+    save_stat_cache(cache, CACHE_PATH)
     
     print("✅ TERMINÉ !")
\ No newline at end of file
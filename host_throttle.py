@@ -0,0 +1,107 @@
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+# Statuts qui signalent une surcharge passagère : on réessaie plus tard
+THROTTLE_STATUSES = {429, 503}
+RETRYABLE_STATUSES = THROTTLE_STATUSES | {500, 502, 504}
+
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+
+# Un Retry-After plus long que ceci est ramené à cette valeur
+MAX_RETRY_AFTER = 300.0
+
+class CircuitOpenError(Exception):
+    """L'hôte a échoué trop longtemps : ses requêtes restantes sont abandonnées"""
+
+def parse_retry_after(value, now=None):
+    """Délai en secondes d'un en-tête Retry-After (nombre ou date HTTP)"""
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        now = time.time() if now is None else now
+        delay = when.timestamp() - now
+    return min(MAX_RETRY_AFTER, max(0.0, delay))
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Attente exponentielle avec gigue complète avant la tentative attempt + 1"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+class HostThrottle:
+    """Limite adaptative (AIMD) et disjoncteur pour un hôte
+
+    Chaque réponse saine augmente la limite de 1/limite (environ +1 par
+    aller-retour) ; un signal de surcharge la divise par deux, une seule fois
+    pour toutes les requêtes parties avant la baisse précédente (comme TCP
+    par fenêtre d'envoi). Après threshold échecs consécutifs, l'hôte est mis en
+    pause cooldown secondes puis une seule requête d'essai passe ; chaque
+    nouvel échec double la pause, et au-delà de max_cooldown les requêtes
+    restantes échouent immédiatement.
+    """
+
+    def __init__(self, max_limit, threshold=5, cooldown=2.0, max_cooldown=30.0):
+        self.max_limit = max_limit
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.failures = 0
+        self.resume_at = 0.0
+        self.started = 0
+        self.decreased_at = 0
+        self.tripped = False
+        self.changed = asyncio.Condition()
+
+    @property
+    def half_open(self):
+        return self.failures >= self.threshold
+
+    async def acquire(self):
+        """Attend une place et renvoie le ticket à rendre à release()"""
+        async with self.changed:
+            while True:
+                if self.tripped:
+                    raise CircuitOpenError()
+                wait = self.resume_at - time.monotonic()
+                # Disjoncteur semi-ouvert : une seule requête d'essai à la fois
+                capacity = 1 if self.half_open else int(self.limit)
+                if wait <= 0 and self.in_flight < capacity:
+                    self.in_flight += 1
+                    self.started += 1
+                    return self.started
+                try:
+                    await asyncio.wait_for(self.changed.wait(), wait if wait > 0 else None)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def release(self, ticket, signal, retry_after=None):
+        """Rend la place ; signal vaut 'ok', 'throttled' ou 'failed'"""
+        async with self.changed:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if signal == 'ok':
+                self.failures = 0
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            elif signal == 'throttled':
+                if ticket > self.decreased_at:
+                    self.limit = max(1.0, self.limit / 2)
+                    self.decreased_at = self.started
+            else:
+                self.failures += 1
+                if self.failures >= self.threshold:
+                    pause = self.cooldown * 2 ** (self.failures - self.threshold)
+                    if pause > self.max_cooldown:
+                        self.tripped = True
+                    self.resume_at = max(self.resume_at, now + pause)
+            if retry_after:
+                self.resume_at = max(self.resume_at, now + retry_after)
+            self.changed.notify_all()
@@ -0,0 +1,385 @@
+import argparse
+import asyncio
+import json
+import mimetypes
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote, urlsplit
+
+from content_store import STORE_PATH, ContentStore, hash_path, iter_tree_files
+from generate_github_manifest_final import IMMUTABLE_CACHE_CONTROL
+from lfs_pointer import LFS_POINTER_MAX_SIZE, SNIFF_BYTES, classify_content, parse_lfs_pointer
+from verify_github_urls_final import MANIFEST_PATH
+from verify_report import percentile
+
+TREE_PATH = 'assets/resources'
+MIRROR_MANIFEST_PATH = 'assets/resources_manifest_mirror.json'
+
+# Adresses par chemin : le fichier peut changer, le client revalide avec l'ETag
+PATH_CACHE_CONTROL = "no-cache"
+
+# Un oid est un sha256 en hexadécimal : rien d'autre ne doit atteindre le système de fichiers
+OID_RE = re.compile(r'[0-9a-f]{64}')
+
+def parse_range(value, size):
+    """Intervalle (début, fin incluse) d'un en-tête Range à une seule plage
+
+    Renvoie None si la plage ne peut pas être satisfaite (416), False si
+    l'en-tête est ignoré (syntaxe inconnue ou plusieurs plages : on sert
+    alors le fichier entier, ce que la RFC 9110 autorise).
+    """
+    unit, _, spec = value.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return False
+    first, sep, last = spec.strip().partition('-')
+    if not sep:
+        return False
+    try:
+        if not first:
+            # bytes=-N : les N derniers octets
+            length = int(last)
+            if length <= 0:
+                return None
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return False
+    if start >= size:
+        return None
+    if start > end:
+        return False
+    return start, min(end, size - 1)
+
+def etag_matches(header, etag):
+    """Vrai si If-None-Match (liste d'ETags ou *) désigne etag"""
+    if header is None:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(',')]
+    # Comparaison faible pour If-None-Match : W/"x" désigne le même contenu que "x"
+    return '*' in candidates or any(candidate.removeprefix('W/') == etag for candidate in candidates)
+
+class MirrorIndex:
+    """Contenus servis par le miroir : chemin d'URL → fichier, oid → fichier
+
+    L'arborescence est hachée au démarrage (un inode n'est lu qu'une fois,
+    une arborescence dédupliquée par content_store.py est donc indexée
+    vite). Un fichier modifié depuis est rehaché à la requête suivante.
+    Le magasin de contenus, lui, est déjà indexé par oid.
+    """
+
+    def __init__(self, tree=None, store_path=None):
+        self.tree = tree
+        self.prefix = '/' + os.path.basename(os.path.normpath(tree)) if tree else None
+        self.store = ContentStore(store_path) if store_path else None
+        self.paths = {}
+        self.oids = {}
+        self.pointers = set()
+        self._lock = threading.Lock()
+        if tree:
+            self._index_tree()
+
+    def _index_tree(self):
+        hashed = {}
+        for path, st in iter_tree_files(self.tree):
+            url_path = self.prefix + '/' + os.path.relpath(path, self.tree).replace(os.sep, '/')
+            key = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+            oid = hashed.get(key)
+            if oid is None:
+                oid = hashed[key] = self._hash(path, url_path)
+            if oid is not None:
+                self.paths[url_path] = (path, oid, key)
+                self.oids.setdefault(oid, path)
+
+    def _hash(self, path, url_path):
+        with open(path, 'rb') as f:
+            head = f.read(LFS_POINTER_MAX_SIZE)
+        # Un pointeur LFS non récupéré n'est pas le PDF : on ne le sert pas
+        if parse_lfs_pointer(head) is not None:
+            self.pointers.add(url_path)
+            return None
+        return hash_path(path)
+
+    def _current(self, url_path):
+        """(chemin, oid) d'une adresse, rehaché si le fichier a changé depuis l'indexation"""
+        path, oid, key = self.paths[url_path]
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns) != key:
+            oid = self._hash(path, url_path)
+            with self._lock:
+                if oid is None:
+                    del self.paths[url_path]
+                    return None
+                self.paths[url_path] = (path, oid, (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns))
+                self.oids[oid] = path
+        return path, oid
+
+    def by_path(self, url_path):
+        if url_path not in self.paths:
+            return None
+        return self._current(url_path)
+
+    def by_oid(self, oid):
+        if not OID_RE.fullmatch(oid):
+            return None
+        if self.store is not None and self.store.has(oid):
+            return self.store.object_path(oid), oid
+        path = self.oids.get(oid)
+        if path is None:
+            return None
+        url_path = self.prefix + '/' + os.path.relpath(path, self.tree).replace(os.sep, '/')
+        current = self.by_path(url_path)
+        # Contenu remplacé depuis : l'adresse par oid ne doit jamais servir autre chose
+        return current if current and current[1] == oid else None
+
+class MirrorHandler(BaseHTTPRequestHandler):
+    """Sert les fichiers avec sendfile (sans copie en espace utilisateur), Range et ETag fort"""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "PolyAssistantMirror/1"
+    # Une connexion keep-alive inactive libère son thread
+    timeout = 30
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def _serve(self, send_body):
+        index = self.server.index
+        url_path = unquote(urlsplit(self.path).path)
+        if url_path.startswith('/oid/'):
+            found = index.by_oid(url_path[len('/oid/'):])
+            cache_control = IMMUTABLE_CACHE_CONTROL
+        else:
+            found = index.by_path(url_path)
+            cache_control = PATH_CACHE_CONTROL
+        if found is None:
+            explain = "Pointeur LFS non récupéré (git lfs pull)" if url_path in index.pointers else None
+            self.send_error(404, explain=explain)
+            return
+
+        path, oid = found
+        # L'oid LFS est le sha256 du contenu : un ETag fort, identique sur tous les miroirs
+        etag = f'"{oid}"'
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            self.send_error(404)
+            return
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            if etag_matches(self.headers.get('If-None-Match'), etag):
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Cache-Control', cache_control)
+                self.end_headers()
+                return
+
+            status, start, end = 200, 0, size - 1
+            range_header = self.headers.get('Range')
+            if_range = self.headers.get('If-Range')
+            # If-Range différent : le client a une autre version, il reçoit tout
+            if range_header and (if_range is None or if_range == etag):
+                interval = parse_range(range_header, size)
+                if interval is None:
+                    self.send_response(416)
+                    self.send_header('Content-Range', f'bytes */{size}')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                if interval:
+                    status, (start, end) = 206, interval
+
+            self.send_response(status)
+            self.send_header('Content-Type', self._content_type(url_path, f))
+            self.send_header('Content-Length', str(end - start + 1))
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', cache_control)
+            if status == 206:
+                self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+            self.end_headers()
+            if send_body and end >= start:
+                # os.sendfile : le noyau copie directement du cache de pages vers la socket
+                self.connection.sendfile(f, start, end - start + 1)
+
+    def _content_type(self, url_path, f):
+        guessed, _ = mimetypes.guess_type(url_path)
+        if guessed:
+            return guessed
+        # Objets du magasin : pas d'extension, on regarde le contenu
+        kind = classify_content(f.read(SNIFF_BYTES))
+        return 'application/pdf' if kind == 'pdf' else 'application/octet-stream'
+
+    def log_request(self, code='-', size='-'):
+        if self.server.verbose:
+            super().log_request(code, size)
+
+class MirrorServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, address, index, verbose=False):
+        super().__init__(address, MirrorHandler)
+        self.index = index
+        self.verbose = verbose
+
+def rewrite_manifest(manifest, mirror_url, by_oid=True):
+    """Fait pointer les URLs du manifeste en ligne vers le miroir
+
+    Avec by_oid, un PDF dont le sha256 est connu est adressé par contenu
+    (/oid/…, cache immuable, servi aussi depuis le magasin) ; sinon par
+    chemin. L'URL d'origine est gardée dans "fallback_url" pour les outils
+    (media_proxy.py) ; l'application n'ouvre que "url", le miroir doit donc
+    rester joignable. Renvoie le nombre d'URLs réécrites.
+    """
+    mirror_url = mirror_url.rstrip('/')
+    rewritten = 0
+    for filiere in manifest['filieres']:
+        for semestre in filiere['semestres']:
+            for matiere in semestre['matieres']:
+                for pdf in matiere['pdfs']:
+                    oid = pdf.get('sha256')
+                    if by_oid and oid:
+                        url = f"{mirror_url}/oid/{oid}"
+                        pdf['immutable'] = True
+                    else:
+                        url = f"{mirror_url}/{matiere['folder']}/{quote(pdf['name'])}"
+                        pdf.pop('immutable', None)
+                    pdf.setdefault('fallback_url', pdf['url'])
+                    pdf['url'] = url
+                    rewritten += 1
+    return rewritten
+
+async def bench_mirror_async(urls, clients=32, duration=10.0, seed=None):
+    """Charge le miroir avec clients connexions simultanées pendant duration secondes
+
+    Chaque client enchaîne des GET complets sur des URLs tirées au hasard ;
+    la latence court de l'envoi de la requête au dernier octet reçu.
+    """
+    # Importé ici : servir et réécrire n'ont besoin que de la bibliothèque standard
+    import aiohttp
+
+    rng = random.Random(seed)
+    latencies = []
+    errors = 0
+    received = 0
+    connector = aiohttp.TCPConnector(limit=clients)
+    timeout = aiohttp.ClientTimeout(total=60)
+
+    async def client(session, deadline):
+        nonlocal errors, received
+        while time.perf_counter() < deadline:
+            url = rng.choice(urls)
+            start = time.perf_counter()
+            try:
+                async with session.get(url) as response:
+                    async for chunk in response.content.iter_chunked(1 << 16):
+                        received += len(chunk)
+                    ok = response.status == 200
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(session, start + duration) for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed": elapsed,
+        "requests_per_s": len(latencies) / elapsed,
+        "bytes_per_s": received / elapsed,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99)
+    }
+
+def _mirror_urls(manifest_path, mirror_url):
+    from verify_github_urls import iter_manifest_pdfs
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    return [entry['url'] for entry in iter_manifest_pdfs(manifest) if entry['url'].startswith(mirror_url)]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Miroir local (réseau du campus) des PDFs")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="servir l'arborescence et/ou le magasin de contenus")
+    serve.add_argument("--tree", default=TREE_PATH, help="arborescence servie sous /resources/… ('' pour aucune)")
+    serve.add_argument("--store", help=f"magasin de contenus servi sous /oid/… (ex. {STORE_PATH})")
+    serve.add_argument("--host", default="0.0.0.0")
+    serve.add_argument("--port", type=int, default=8080)
+    serve.add_argument("-v", "--verbose", action="store_true", help="journaliser chaque requête")
+
+    rewrite = commands.add_parser("rewrite", help="faire pointer le manifeste en ligne vers le miroir")
+    rewrite.add_argument("mirror", help="adresse du miroir, ex. http://10.0.0.5:8080")
+    rewrite.add_argument("--manifest", default=MANIFEST_PATH)
+    rewrite.add_argument("--out", default=MIRROR_MANIFEST_PATH)
+    rewrite.add_argument("--by-path", action="store_true", help="adresser les PDFs par chemin plutôt que par oid")
+
+    bench = commands.add_parser("bench", help="mesurer requêtes/s et latences sous charge")
+    bench.add_argument("mirror", help="adresse du miroir")
+    bench.add_argument("--manifest", default=MIRROR_MANIFEST_PATH, help="manifeste réécrit pour le miroir")
+    bench.add_argument("-c", "--clients", type=int, nargs="+", default=[1, 8, 32, 128],
+                       help="nombres de clients simultanés à essayer")
+    bench.add_argument("-d", "--duration", type=float, default=10, help="durée de chaque palier (s)")
+    bench.add_argument("--seed", type=int)
+    bench.add_argument("--json", help="écrire les résultats en JSON")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        if not args.tree and not args.store:
+            parser.error("rien à servir : --tree ou --store")
+        start = time.perf_counter()
+        index = MirrorIndex(args.tree or None, args.store)
+        print(f"📚 {len(index.paths)} fichiers, {len(index.oids)} contenus indexés en {time.perf_counter() - start:.1f} s")
+        if index.pointers:
+            print(f"⚠️  {len(index.pointers)} pointeurs LFS ignorés : lancez git lfs pull pour les servir")
+        with MirrorServer((args.host, args.port), index, args.verbose) as server:
+            print(f"🚀 Miroir sur http://{args.host}:{args.port}/")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                print("\n👋 Arrêt du miroir")
+
+    elif args.command == "rewrite":
+        with open(args.manifest, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        count = rewrite_manifest(manifest, args.mirror, by_oid=not args.by_path)
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        print(f"✅ {count} URLs pointent vers {args.mirror} → {args.out}")
+
+    else:
+        urls = _mirror_urls(args.manifest, args.mirror.rstrip('/'))
+        if not urls:
+            parser.error(f"aucune URL de {args.manifest} ne pointe vers {args.mirror}")
+        print(f"⏱️  {len(urls)} URLs, paliers de {args.duration:.0f} s")
+        results = []
+        for clients in args.clients:
+            result = asyncio.run(bench_mirror_async(urls, clients, args.duration, args.seed))
+            results.append(result)
+            print(f"   👥 {clients:4d} clients: {result['requests_per_s']:8.1f} req/s, "
+                  f"{result['bytes_per_s'] / 1e6:7.1f} Mo/s, p50 {result['p50'] * 1000:6.1f} ms, "
+                  f"p99 {result['p99'] * 1000:6.1f} ms, {result['errors']} erreurs"
+                  if result['requests'] else f"   👥 {clients:4d} clients: aucune réponse, {result['errors']} erreurs")
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
@@ -0,0 +1,102 @@
+import hashlib
+import re
+
+LFS_POINTER_PREFIX = b"version https://git-lfs.github.com/spec/"
+
+# Taille maximale d'un pointeur selon la spécification Git LFS
+LFS_POINTER_MAX_SIZE = 1024
+
+OID_RE = re.compile(rb"^oid sha256:([0-9a-f]{64})$", re.MULTILINE)
+SIZE_RE = re.compile(rb"^size (\d+)$", re.MULTILINE)
+
+def parse_lfs_pointer(data):
+    """Extrait (oid, size) d'un pointeur Git LFS, ou None si ce n'en est pas un"""
+    if not data.startswith(LFS_POINTER_PREFIX):
+        return None
+
+    oid_match = OID_RE.search(data)
+    size_match = SIZE_RE.search(data)
+    if not oid_match or not size_match:
+        return None
+
+    return oid_match.group(1).decode("ascii"), int(size_match.group(1))
+
+def read_lfs_pointer(path):
+    """Lit le pointeur Git LFS d'un fichier, ou None si c'est un vrai fichier"""
+    with open(path, "rb") as f:
+        return parse_lfs_pointer(f.read(LFS_POINTER_MAX_SIZE))
+
+def hash_file(path, chunk_size=1 << 20):
+    """Calcule (sha256, taille) d'un fichier en lecture par blocs"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+def read_blob_info(path, chunk_size=1 << 20):
+    """Renvoie (sha256, taille, est_lfs) du contenu d'un fichier
+
+    Pour un pointeur LFS, seul le début du fichier est lu : l'oid est le
+    sha256 du contenu réel. Sinon le fichier est haché par blocs.
+    """
+    with open(path, "rb") as f:
+        head = f.read(LFS_POINTER_MAX_SIZE)
+        pointer = parse_lfs_pointer(head)
+        if pointer is not None:
+            oid, size = pointer
+            return oid, size, True
+
+        digest = hashlib.sha256(head)
+        size = len(head)
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size, False
+
+# Octets demandés pour reconnaître le contenu servi (pointeur, PDF, page HTML)
+SNIFF_BYTES = 256
+
+def classify_content(head):
+    """Classe un contenu d'après ses premiers octets"""
+    if head.startswith(LFS_POINTER_PREFIX):
+        return "pointer"
+    if head.lstrip().startswith(b"%PDF-"):
+        return "pdf"
+    if head.lstrip()[:15].lower().startswith((b"<!doctype html", b"<html")):
+        return "html"
+    return "unknown"
+
+def parse_content_range_total(content_range):
+    """Taille totale annoncée par un en-tête Content-Range (None si inconnue)"""
+    if not content_range or "/" not in content_range:
+        return None
+    total = content_range.rsplit("/", 1)[1].strip()
+    return int(total) if total.isdigit() else None
+
+def parse_content_range_start(content_range):
+    """Premier octet d'un en-tête Content-Range (None s'il est absent)"""
+    try:
+        return int(content_range.split()[1].split("-")[0])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+def check_served_head(head, served_size, expected_size=None):
+    """Renvoie (type, erreur) pour le début d'un contenu servi
+
+    served_size est la taille annoncée par le serveur, expected_size celle
+    du pointeur LFS du dépôt. erreur vaut None si le contenu est bien le PDF.
+    """
+    kind = classify_content(head)
+    if kind == "pointer":
+        pointer = parse_lfs_pointer(head)
+        return kind, "Pointeur LFS servi au lieu du fichier" + (f" ({pointer[1]} octets)" if pointer else "")
+    if kind == "html":
+        return kind, "Page HTML servie au lieu du PDF"
+    if kind != "pdf":
+        return kind, "Contenu non reconnu (signature %PDF- absente)"
+    if expected_size is not None and served_size is not None and served_size != expected_size:
+        return kind, f"Taille servie {served_size} ≠ taille LFS {expected_size}"
+    return kind, None
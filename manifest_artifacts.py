@@ -0,0 +1,68 @@
+import gzip
+import hashlib
+import json
+import os
+
+try:
+    import brotli
+except ImportError:  # dépendance optionnelle : pip install brotli
+    brotli = None
+
+SIDECAR_SUFFIX = ".meta.json"
+ARTIFACT_SUFFIXES = (".gz", ".br", SIDECAR_SUFFIX)
+
+def write_atomic(path, data):
+    """Écrit un fichier via un fichier temporaire puis un renommage atomique"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def available_encodings():
+    """Encodages que compress_variants sait produire avec les modules installés"""
+    return {"gzip", "br"} if brotli is not None else {"gzip"}
+
+def compress_variants(data):
+    """Renvoie les variantes compressées {encodage: octets} d'un contenu"""
+    # mtime=0 : la sortie gzip ne dépend que du contenu (hash reproductible)
+    variants = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(data, quality=11, mode=brotli.MODE_TEXT)
+    return variants
+
+def _describe(data, etag_suffix=""):
+    digest = hashlib.sha256(data).hexdigest()
+    return {"etag": f'"{digest}{etag_suffix}"', "sha256": digest, "size": len(data)}
+
+def write_artifacts(path):
+    """Écrit les variantes .gz/.br d'un manifeste et son fichier compagnon
+
+    Le compagnon (<fichier>.meta.json) donne, pour l'original et chaque
+    variante, un ETag fort dérivé du sha256 et la taille en octets. Rien
+    n'est réécrit si le contenu n'a pas changé depuis le dernier passage.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    sidecar_path = path + SIDECAR_SUFFIX
+    meta = _describe(data)
+    try:
+        with open(sidecar_path, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        # brotli installé (ou retiré) depuis : les variantes sont à refaire
+        if previous.get("sha256") == meta["sha256"] and set(previous["variants"]) == available_encodings() and all(
+            os.path.exists(path + variant["suffix"]) for variant in previous["variants"].values()
+        ):
+            return previous
+    except (OSError, ValueError, KeyError):
+        pass
+
+    meta["variants"] = {}
+    for encoding, compressed in compress_variants(data).items():
+        suffix = ".gz" if encoding == "gzip" else f".{encoding}"
+        write_atomic(path + suffix, compressed)
+        # Chaque représentation a son propre ETag fort
+        meta["variants"][encoding] = {"suffix": suffix, **_describe(compressed, f"-{encoding}")}
+
+    write_atomic(sidecar_path, json.dumps(meta, indent=2).encode('utf-8'))
+    return meta
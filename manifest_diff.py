@@ -0,0 +1,274 @@
+import argparse
+import hashlib
+import json
+import urllib.parse
+
+PATCH_FORMAT = "polyassistant-manifest-patch"
+PATCH_VERSION = 1
+
+def manifest_digest(manifest):
+    """Hash du manifeste tel qu'il est sérialisé (ordre des clés compris)"""
+    data = json.dumps(manifest, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+def _pdf_name(pdf):
+    return pdf["name"] if isinstance(pdf, dict) else pdf
+
+def _pdf_oid(pdf, oid):
+    """Oid d'un PDF : liste "oids" du manifeste local ou champs du manifeste en ligne"""
+    if isinstance(pdf, dict):
+        return pdf.get("oid") or pdf.get("sha256")
+    return oid
+
+def _flatten(manifest):
+    """Aplatit le manifeste en {clé filière/semestre/matière/pdf: enregistrement}"""
+    records = {}
+    folders = {}
+    has_oids = False
+    for filiere in manifest["filieres"]:
+        for semestre in filiere["semestres"]:
+            for matiere in semestre["matieres"]:
+                matiere_key = f"{filiere['name']}/{semestre['name']}/{matiere['name']}"
+                folders[matiere_key] = matiere["folder"]
+                oids = matiere.get("oids")
+                has_oids = has_oids or oids is not None
+                for i, pdf in enumerate(matiere["pdfs"]):
+                    record = {"pdf": pdf}
+                    if oids is not None:
+                        record["oid"] = oids[i]
+                    records[f"{matiere_key}/{_pdf_name(pdf)}"] = record
+    return records, folders, has_oids
+
+def _unflatten(records, folders, has_oids):
+    """Reconstruit l'arborescence filières → semestres → matières"""
+    filieres = []
+    for key, record in records.items():
+        filiere_name, semestre_name, matiere_name, _ = key.split("/", 3)
+        if not filieres or filieres[-1]["name"] != filiere_name:
+            filieres.append({"name": filiere_name, "semestres": []})
+        semestres = filieres[-1]["semestres"]
+        if not semestres or semestres[-1]["name"] != semestre_name:
+            semestres.append({"name": semestre_name, "matieres": []})
+        matieres = semestres[-1]["matieres"]
+        if not matieres or matieres[-1]["name"] != matiere_name:
+            matiere = {
+                "name": matiere_name,
+                "folder": folders[f"{filiere_name}/{semestre_name}/{matiere_name}"],
+                "pdfs": []
+            }
+            if has_oids:
+                matiere["oids"] = []
+            matieres.append(matiere)
+        matieres[-1]["pdfs"].append(record["pdf"])
+        if has_oids:
+            matieres[-1]["oids"].append(record.get("oid"))
+    return filieres
+
+def _sort_key(key):
+    return tuple(key.split("/", 3))
+
+def _renamed_pdf(pdf, old_key, new_key, old_folder, new_folder):
+    """Déduit l'entrée renommée : nouveau nom et URL réécrite"""
+    new_name = new_key.rsplit("/", 1)[1]
+    if not isinstance(pdf, dict):
+        return new_name
+    old_name = old_key.rsplit("/", 1)[1]
+    renamed = dict(pdf, name=new_name)
+    if "url" in pdf:
+        old_path = f"{old_folder}/{urllib.parse.quote(old_name)}"
+        new_path = f"{new_folder}/{urllib.parse.quote(new_name)}"
+        renamed["url"] = pdf["url"].replace(old_path, new_path)
+    return renamed
+
+def diff_manifests(old, new):
+    """Calcule le patch ordonné qui transforme old en new
+
+    Les entrées supprimées puis ajoutées avec le même oid sont codées comme
+    des renommages. Les champs déductibles (nom, URL, dossier) sont omis.
+    """
+    old_records, old_folders, _ = _flatten(old)
+    new_records, new_folders, has_oids = _flatten(new)
+
+    removed = [key for key in old_records if key not in new_records]
+    added = [key for key in new_records if key not in old_records]
+
+    # Renommages : un oid supprimé une seule fois et ajouté une seule fois
+    removed_by_oid = {}
+    for key in removed:
+        oid = _pdf_oid(old_records[key]["pdf"], old_records[key].get("oid"))
+        if oid:
+            removed_by_oid.setdefault(oid, []).append(key)
+    added_by_oid = {}
+    for key in added:
+        oid = _pdf_oid(new_records[key]["pdf"], new_records[key].get("oid"))
+        if oid:
+            added_by_oid.setdefault(oid, []).append(key)
+    renames = {
+        keys[0]: added_by_oid[oid][0]
+        for oid, keys in removed_by_oid.items()
+        if len(keys) == 1 and len(added_by_oid.get(oid, [])) == 1
+    }
+    renamed_to = set(renames.values())
+
+    def matiere_of(key):
+        return key.rsplit("/", 1)[0]
+
+    def value_for(key, base_pdf=None):
+        record = new_records[key]
+        value = {}
+        if record["pdf"] != base_pdf:
+            value["pdf"] = record["pdf"]
+        if has_oids and "oid" in record:
+            value["oid"] = record["oid"]
+        folder = new_folders[matiere_of(key)]
+        if old_folders.get(matiere_of(key)) != folder:
+            value["folder"] = folder
+        return value
+
+    ops = []
+    for key in removed:
+        if key in renames:
+            new_key = renames[key]
+            base_pdf = _renamed_pdf(
+                old_records[key]["pdf"], key, new_key,
+                old_folders[matiere_of(key)], new_folders[matiere_of(new_key)]
+            )
+            value = value_for(new_key, base_pdf)
+            value.pop("oid", None)
+            ops.append([">", key, new_key, value] if value else [">", key, new_key])
+        else:
+            ops.append(["-", key])
+    for key in added:
+        if key not in renamed_to:
+            ops.append(["+", key, value_for(key)])
+    for key, record in new_records.items():
+        if key in old_records and record != old_records[key]:
+            ops.append(["~", key, value_for(key, old_records[key]["pdf"])])
+        elif key in old_records and old_folders[matiere_of(key)] != new_folders[matiere_of(key)]:
+            ops.append(["~", key, value_for(key, record["pdf"])])
+    ops.sort(key=lambda op: _sort_key(op[1]))
+
+    patch = {
+        "format": PATCH_FORMAT,
+        "version": PATCH_VERSION,
+        "base": manifest_digest(old),
+        "target": manifest_digest(new),
+        "keys": list(new.keys()),
+        "oids": has_oids,
+        "ops": ops
+    }
+
+    # Clés de premier niveau autres que l'arborescence (table des blobs, ...)
+    old_blobs, new_blobs = old.get("blobs", {}), new.get("blobs", {})
+    blobs_added = {oid: blob for oid, blob in new_blobs.items() if old_blobs.get(oid) != blob}
+    blobs_removed = [oid for oid in old_blobs if oid not in new_blobs]
+    if blobs_added or blobs_removed:
+        patch["blobs"] = {"+": blobs_added, "-": blobs_removed}
+    top = {k: v for k, v in new.items() if k not in ("filieres", "blobs") and old.get(k) != v}
+    if top:
+        patch["top"] = top
+
+    # Ordre explicite seulement si le nouveau manifeste n'est pas trié
+    new_keys = list(new_records)
+    if new_keys != sorted(new_keys, key=_sort_key):
+        patch["order"] = new_keys
+
+    return patch
+
+def apply_patch(old, patch):
+    """Applique un patch et renvoie exactement le nouveau manifeste"""
+    if patch.get("format") != PATCH_FORMAT or patch.get("version") != PATCH_VERSION:
+        raise ValueError(f"Format de patch non supporté: {patch.get('format')} v{patch.get('version')}")
+    if manifest_digest(old) != patch["base"]:
+        raise ValueError("Le patch ne s'applique pas à ce manifeste (hash de base différent)")
+
+    records, folders, _ = _flatten(old)
+    has_oids = patch["oids"]
+    old_folders = dict(folders)
+
+    def set_record(key, value, base_record):
+        matiere_key = key.rsplit("/", 1)[0]
+        if "folder" in value:
+            folders[matiere_key] = value["folder"]
+        elif matiere_key not in folders:
+            raise ValueError(f"Dossier inconnu pour {matiere_key}")
+        record = {"pdf": value.get("pdf", base_record.get("pdf"))}
+        if has_oids:
+            record["oid"] = value.get("oid", base_record.get("oid"))
+        records[key] = record
+
+    for op in patch["ops"]:
+        kind, key = op[0], op[1]
+        if kind == "-":
+            del records[key]
+        elif kind == "+":
+            set_record(key, op[2], {})
+        elif kind == "~":
+            set_record(key, op[2], records[key])
+        elif kind == ">":
+            new_key = op[2]
+            value = op[3] if len(op) > 3 else {}
+            base = records.pop(key)
+            matiere_key, new_matiere_key = key.rsplit("/", 1)[0], new_key.rsplit("/", 1)[0]
+            new_folder = value.get("folder", folders.get(new_matiere_key))
+            base_pdf = _renamed_pdf(base["pdf"], key, new_key, old_folders[matiere_key], new_folder)
+            set_record(new_key, value, dict(base, pdf=base_pdf))
+        else:
+            raise ValueError(f"Opération de patch inconnue: {kind}")
+
+    order = patch.get("order") or sorted(records, key=_sort_key)
+    ordered = {key: records[key] for key in order}
+
+    blobs = dict(old.get("blobs", {}))
+    if "blobs" in patch:
+        for oid in patch["blobs"]["-"]:
+            del blobs[oid]
+        blobs.update(patch["blobs"]["+"])
+        blobs = dict(sorted(blobs.items()))
+
+    new = {}
+    for top_key in patch["keys"]:
+        if top_key == "filieres":
+            new[top_key] = _unflatten(ordered, folders, has_oids)
+        elif top_key == "blobs":
+            new[top_key] = blobs
+        else:
+            new[top_key] = patch.get("top", {}).get(top_key, old.get(top_key))
+
+    if manifest_digest(new) != patch["target"]:
+        raise ValueError("Le manifeste reconstruit ne correspond pas au hash cible")
+    return new
+
+def _load(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Patchs entre deux versions d'un manifeste")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    diff_parser = subparsers.add_parser("diff", help="calculer le patch OLD → NEW")
+    diff_parser.add_argument("old")
+    diff_parser.add_argument("new")
+    diff_parser.add_argument("-o", "--output", required=True)
+
+    apply_parser = subparsers.add_parser("apply", help="appliquer un patch à OLD")
+    apply_parser.add_argument("old")
+    apply_parser.add_argument("patch")
+    apply_parser.add_argument("-o", "--output", required=True)
+
+    args = parser.parse_args()
+    if args.command == "diff":
+        old, new = _load(args.old), _load(args.new)
+        patch = diff_manifests(old, new)
+        # Contrôle : le patch doit reproduire exactement le nouveau manifeste
+        apply_patch(old, patch)
+        data = json.dumps(patch, ensure_ascii=False, separators=(',', ':'))
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(data)
+        print(f"🧮 {len(patch['ops'])} opérations, patch de {len(data.encode('utf-8'))} octets → {args.output}")
+    else:
+        new = apply_patch(_load(args.old), _load(args.patch))
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(new, f, indent=2, ensure_ascii=False)
+        print(f"✅ Manifeste reconstruit → {args.output}")
@@ -0,0 +1,349 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from urllib.parse import unquote, urlsplit
+
+import aiohttp
+from aiohttp import web
+
+from content_store import ContentStore
+from generate_github_manifest_final import IMMUTABLE_CACHE_CONTROL
+from lan_mirror import etag_matches, parse_range
+from verify_github_urls import MANIFEST_PATH, iter_manifest_pdfs
+
+PROXY_CACHE_PATH = '.media_cache'
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+CHUNK_SIZE = 1 << 16
+
+class LruCache:
+    """Objets du magasin limités en octets, les moins récemment servis évincés d'abord
+
+    L'ordre survit aux redémarrages : chaque accès remet à jour le mtime de
+    l'objet, qui sert à reconstruire l'ordre au lancement. Un objet évincé
+    pendant qu'on le sert reste lisible par les descripteurs déjà ouverts.
+    """
+
+    def __init__(self, root=PROXY_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.store = ContentStore(root)
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total = 0
+        self.evicted = 0
+        # Remplissages interrompus par un arrêt : ils ne sont pas repris
+        if os.path.isdir(self.store.partial):
+            for name in os.listdir(self.store.partial):
+                os.remove(os.path.join(self.store.partial, name))
+        objects = [(os.stat(path), oid) for oid, path in self.store.iter_objects()]
+        for st, oid in sorted(objects, key=lambda item: item[0].st_mtime_ns):
+            self.entries[oid] = st.st_size
+            self.total += st.st_size
+        self._evict(0)
+
+    def get(self, oid):
+        """Chemin de l'objet s'il est en cache (et le marque comme récent), sinon None"""
+        if oid not in self.entries:
+            return None
+        self.entries.move_to_end(oid)
+        path = self.store.object_path(oid)
+        try:
+            os.utime(path)
+        except OSError:
+            # Supprimé à la main : on l'oublie
+            self.total -= self.entries.pop(oid)
+            return None
+        return path
+
+    def put(self, path, oid):
+        """Range un fichier vérifié ; faux s'il ne tiendrait pas dans le cache"""
+        size = os.path.getsize(path)
+        if size > self.max_bytes:
+            return False
+        self._evict(size)
+        self.store.commit(path, oid)
+        self.entries[oid] = size
+        self.total += size
+        return True
+
+    def _evict(self, incoming):
+        while self.entries and self.total + incoming > self.max_bytes:
+            oid, size = self.entries.popitem(last=False)
+            try:
+                os.remove(self.store.object_path(oid))
+            except FileNotFoundError:
+                pass
+            self.total -= size
+            self.evicted += 1
+
+class _Fill:
+    """Téléchargement en cours d'un objet, lisible pendant qu'il s'écrit"""
+
+    def __init__(self, oid, size, path):
+        self.oid = oid
+        self.size = size
+        self.path = path
+        self.file = None
+        self.written = 0
+        self.done = False
+        self.error = None
+        self.upstream_status = None
+        self.started = asyncio.Event()
+        self._progress = asyncio.Event()
+
+    def notify(self):
+        progress, self._progress = self._progress, asyncio.Event()
+        progress.set()
+
+    @property
+    def readable(self):
+        """Octets transmissibles aux lecteurs
+
+        Le dernier octet attend la vérification du sha256 : si le contenu est
+        faux, le client reçoit une réponse tronquée plutôt qu'un PDF corrompu.
+        """
+        if self.done or self.size is None:
+            return self.written
+        return min(self.written, self.size - 1)
+
+    async def wait_beyond(self, position):
+        """Attend que des octets soient disponibles après position, ou la fin du remplissage"""
+        while self.readable <= position and not self.done:
+            await self._progress.wait()
+
+class MediaProxy:
+    """Proxy cache devant les URLs du manifeste en ligne
+
+    Les PDFs sont demandés par oid (/oid/<sha256>, comme sur le miroir
+    local) ou par le chemin de leur URL d'origine. Plusieurs demandes
+    simultanées d'un objet absent ne déclenchent qu'un seul téléchargement
+    en amont ; chaque client est servi au fil de l'écriture, plages
+    comprises, sans attendre la fin du téléchargement.
+    """
+
+    def __init__(self, manifest, cache, timeout=30):
+        self.cache = cache
+        self.timeout = timeout
+        self.by_oid = {}
+        self.by_path = {}
+        for entry in iter_manifest_pdfs(manifest):
+            pdf = entry['pdf']
+            # L'adresse directe évite les redirections ; url reste le recours
+            urls = [url for url in (pdf.get('direct_url'), pdf['url'], pdf.get('fallback_url')) if url]
+            oid = pdf.get('sha256')
+            for url in urls:
+                # request.path est décodé : les clés aussi
+                self.by_path[unquote(urlsplit(url).path)] = (oid, urls, pdf.get('size'))
+            if oid:
+                self.by_oid.setdefault(oid, (oid, urls, pdf.get('size')))
+        self.fills = {}
+        self.session = None
+        self.stats = {'requests': 0, 'hits': 0, 'misses': 0, 'collapsed': 0, 'upstream': 0,
+                      'upstream_bytes': 0, 'errors': 0}
+
+    async def start(self, app):
+        connector = aiohttp.TCPConnector(limit=64, ttl_dns_cache=3600)
+        self.session = aiohttp.ClientSession(connector=connector)
+
+    async def stop(self, app):
+        for fill_task in [task for task in asyncio.all_tasks() if task.get_name().startswith('fill-')]:
+            fill_task.cancel()
+        await self.session.close()
+
+    async def handle_oid(self, request):
+        target = self.by_oid.get(request.match_info['oid'])
+        if target is None:
+            raise web.HTTPNotFound(text="Objet absent du manifeste")
+        return await self._serve(request, *target)
+
+    async def handle_path(self, request):
+        target = self.by_path.get(request.path)
+        if target is None:
+            raise web.HTTPNotFound(text="URL absente du manifeste")
+        oid, urls, size = target
+        if not oid:
+            # Sans sha256, le contenu ne peut être ni vérifié ni partagé : le client va à la source
+            raise web.HTTPTemporaryRedirect(urls[0])
+        return await self._serve(request, oid, urls, size)
+
+    async def handle_stats(self, request):
+        fills = {oid: fill.written for oid, fill in self.fills.items()}
+        return web.json_response({**self.stats, 'cached_objects': len(self.cache.entries),
+                                  'cached_bytes': self.cache.total, 'evicted': self.cache.evicted,
+                                  'filling': fills})
+
+    async def _serve(self, request, oid, urls, size):
+        self.stats['requests'] += 1
+        etag = f'"{oid}"'
+        headers = {'ETag': etag, 'Cache-Control': IMMUTABLE_CACHE_CONTROL, 'Accept-Ranges': 'bytes'}
+        if etag_matches(request.headers.get('If-None-Match'), etag):
+            return web.Response(status=304, headers=headers)
+
+        # Fichier ouvert sans attendre : un commit ou une éviction ultérieurs
+        # le renomment ou le suppriment, le descripteur reste valide
+        path = self.cache.get(oid)
+        if path is not None:
+            self.stats['hits'] += 1
+            fill = None
+            f = open(path, 'rb')
+            size = os.fstat(f.fileno()).st_size
+        else:
+            fill = self.fills.get(oid)
+            if fill is None:
+                self.stats['misses'] += 1
+                fill = self._start_fill(oid, urls, size)
+            else:
+                self.stats['collapsed'] += 1
+            f = open(fill.path, 'rb')
+            try:
+                await fill.started.wait()
+            except BaseException:
+                f.close()
+                raise
+            if fill.error and not fill.written:
+                f.close()
+                self.stats['errors'] += 1
+                raise web.HTTPBadGateway(text=fill.error)
+            size = fill.size
+
+        with f:
+            return await self._stream(request, f, fill, size, headers)
+
+    async def _stream(self, request, f, fill, size, headers):
+        """Envoie le fichier ouvert f, en suivant le remplissage fill s'il est en cours"""
+        etag = headers['ETag']
+        status, start, end = 200, 0, (size - 1 if size is not None else None)
+        range_header = request.headers.get('Range')
+        if_range = request.headers.get('If-Range')
+        if size is not None and range_header and (if_range is None or if_range == etag):
+            interval = parse_range(range_header, size)
+            if interval is None:
+                raise web.HTTPRequestRangeNotSatisfiable(headers={'Content-Range': f'bytes */{size}'})
+            if interval:
+                status, (start, end) = 206, interval
+                headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+
+        response = web.StreamResponse(status=status, headers=headers)
+        response.content_type = 'application/pdf'
+        if end is not None:
+            response.content_length = end - start + 1
+        await response.prepare(request)
+        if request.method == 'HEAD':
+            return response
+
+        f.seek(start)
+        position = start
+        while end is None or position <= end:
+            if fill is not None:
+                await fill.wait_beyond(position)
+                if fill.done and fill.error:
+                    # Le client a déjà reçu un en-tête 200 : on ne peut que couper
+                    request.transport.close()
+                    return response
+                available = fill.readable
+                if available <= position:
+                    break
+            else:
+                available = size
+            limit = available if end is None else min(available, end + 1)
+            while position < limit:
+                chunk = f.read(min(CHUNK_SIZE, limit - position))
+                if not chunk:
+                    break
+                await response.write(chunk)
+                position += len(chunk)
+            if fill is None:
+                break
+        await response.write_eof()
+        return response
+
+    def _start_fill(self, oid, urls, size):
+        path = self.cache.store.partial_path(oid)
+        fill = _Fill(oid, size, path)
+        # Créé tout de suite : les lecteurs l'ouvrent dès qu'ils trouvent le remplissage
+        fill.file = open(path, 'wb')
+        self.fills[oid] = fill
+        asyncio.get_running_loop().create_task(self._fill(fill, urls), name=f'fill-{oid[:12]}')
+        return fill
+
+    async def _fill(self, fill, urls):
+        """Télécharge l'objet depuis la première URL qui répond, le vérifie et le range en cache"""
+        digest = hashlib.sha256()
+        client_timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.timeout, sock_read=self.timeout)
+        self.stats['upstream'] += 1
+        try:
+            with fill.file as f:
+                for url in urls:
+                    try:
+                        async with self.session.get(url, timeout=client_timeout) as response:
+                            if response.status != 200:
+                                fill.error = f"HTTP {response.status} en amont"
+                                continue
+                            # Erreur d'une URL précédente : les lecteurs réveillés par started ne doivent pas la voir
+                            fill.error = None
+                            fill.upstream_status = response.status
+                            if fill.size is None and response.content_length is not None:
+                                fill.size = response.content_length
+                            fill.started.set()
+                            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                                f.write(chunk)
+                                # Visible aussitôt des lecteurs, qui ont leur propre descripteur
+                                f.flush()
+                                digest.update(chunk)
+                                fill.written += len(chunk)
+                                self.stats['upstream_bytes'] += len(chunk)
+                                fill.notify()
+                            break
+                    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                        fill.error = f"{type(e).__name__} en amont"
+                        # Déjà commencé : reprendre ailleurs mélangerait deux réponses
+                        if fill.started.is_set():
+                            break
+
+            if fill.error is None:
+                served = digest.hexdigest()
+                if fill.size is not None and fill.written != fill.size:
+                    fill.error = f"Taille reçue {fill.written} ≠ taille attendue {fill.size}"
+                elif served != fill.oid:
+                    fill.error = f"sha256 {served[:12]}… ≠ oid {fill.oid[:12]}…"
+            if fill.error is None and self.cache.put(fill.path, fill.oid):
+                return
+            print(f"  ❌ {fill.oid[:12]}… {fill.error}" if fill.error else f"  ⚠️  {fill.oid[:12]}… plus grand que le cache")
+            os.remove(fill.path)
+        finally:
+            fill.done = True
+            fill.started.set()
+            fill.notify()
+            del self.fills[fill.oid]
+
+def make_app(manifest, cache, timeout=30):
+    proxy = MediaProxy(manifest, cache, timeout)
+    app = web.Application()
+    app.on_startup.append(proxy.start)
+    app.on_cleanup.append(proxy.stop)
+    app.router.add_get('/_stats', proxy.handle_stats)
+    app.router.add_get('/oid/{oid:[0-9a-f]{64}}', proxy.handle_oid)
+    app.router.add_get('/{tail:.*}', proxy.handle_path)
+    return app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Proxy cache des PDFs GitHub media pour le réseau du campus",
+                                     epilog="lan_mirror.py rewrite http://HÔTE:PORT fait pointer le manifeste vers le proxy")
+    parser.add_argument("--manifest", default=MANIFEST_PATH, help="manifeste en ligne (URLs amont et oids)")
+    parser.add_argument("--cache", default=PROXY_CACHE_PATH, help="dossier du cache disque")
+    parser.add_argument("--max-size", type=float, default=DEFAULT_MAX_BYTES / 1024 ** 3, help="taille du cache (Gio)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--timeout", type=float, default=30, help="délai de connexion et de lecture en amont (s)")
+    args = parser.parse_args()
+
+    with open(args.manifest, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    start = time.perf_counter()
+    cache = LruCache(args.cache, int(args.max_size * 1024 ** 3))
+    print(f"📦 Cache: {len(cache.entries)} objets, {cache.total / 1e6:.1f} Mo / {cache.max_bytes / 1e6:.0f} Mo "
+          f"({time.perf_counter() - start:.1f} s)")
+    web.run_app(make_app(manifest, cache, args.timeout), host=args.host, port=args.port,
+                print=lambda message: print(f"🚀 {message}"))
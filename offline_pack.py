@@ -0,0 +1,304 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+from bulk_download import matches
+from content_store import STORE_PATH, ContentStore, hash_path
+from manifest_diff import manifest_digest
+
+PACK_MAGIC = b"PAPK"
+PACK_VERSION = 1
+# magic, version, réservé, position et taille de l'index, sha256 de l'index
+HEADER = struct.Struct("<4sHHQQ32s")
+HEADER_SIZE = 64
+# Chaque objet commence sur une page : il peut être projeté en mémoire tel quel
+ALIGN = 4096
+# Au-delà de cette part d'octets morts, une mise à jour réécrit le pack
+COMPACT_RATIO = 0.5
+
+def _pad(offset):
+    return -offset % ALIGN
+
+def iter_manifest_files(manifest, selectors=()):
+    """Parcourt les PDFs du manifeste (local ou en ligne) : (clé, dossier, nom, oid)"""
+    for filiere in manifest["filieres"]:
+        for semestre in filiere["semestres"]:
+            for matiere in semestre["matieres"]:
+                position = {"filiere": filiere["name"], "semestre": semestre["name"], "matiere": matiere["name"]}
+                if not matches(position, selectors):
+                    continue
+                oids = matiere.get("oids") or [None] * len(matiere["pdfs"])
+                for pdf, oid in zip(matiere["pdfs"], oids):
+                    if isinstance(pdf, dict):
+                        name, oid = pdf["name"], pdf.get("sha256") or pdf.get("oid")
+                    else:
+                        name = pdf
+                    key = f"{filiere['name']}/{semestre['name']}/{matiere['name']}/{name}"
+                    yield key, matiere["folder"], name, oid
+
+class PackWriter:
+    """Ajoute des objets dédupliqués par sha256 à la fin d'un fichier pack"""
+
+    def __init__(self, f, offset, objects, root, store):
+        self.f = f
+        self.offset = offset
+        self.objects = objects
+        self.root = root
+        self.store = store
+
+    def _source(self, folder, name, oid):
+        # Le magasin de contenus d'abord (déjà vérifié), l'arborescence sinon
+        if oid and self.store is not None and self.store.has(oid):
+            return self.store.object_path(oid)
+        return os.path.join(self.root, folder, name)
+
+    def add(self, folder, name, oid=None):
+        """Copie un fichier dans le pack s'il n'y est pas déjà ; renvoie son sha256"""
+        if oid and oid in self.objects:
+            return oid
+        start = self.offset + _pad(self.offset)
+        self.f.seek(start)
+        digest = hashlib.sha256()
+        size = 0
+        with open(self._source(folder, name, oid), "rb") as source:
+            while chunk := source.read(1 << 20):
+                digest.update(chunk)
+                self.f.write(chunk)
+                size += len(chunk)
+        sha = digest.hexdigest()
+        if oid and sha != oid:
+            raise ValueError(f"{folder}/{name}: sha256 {sha[:12]}… ≠ oid attendu {oid[:12]}…")
+        if sha not in self.objects:
+            self.objects[sha] = [start, size]
+            self.offset = start + size
+        return sha
+
+def _write_index(f, offset, index):
+    """Écrit l'index à la suite des données puis, en dernier, l'en-tête qui le désigne
+
+    Tant que l'en-tête n'est pas réécrit, il désigne l'ancien index, qui
+    reste intact : un pack interrompu en cours de mise à jour reste lisible.
+    """
+    data = json.dumps(index, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    f.seek(offset)
+    f.write(data)
+    f.truncate()
+    f.flush()
+    os.fsync(f.fileno())
+    f.seek(0)
+    f.write(HEADER.pack(PACK_MAGIC, PACK_VERSION, 0, offset, len(data), hashlib.sha256(data).digest())
+            .ljust(HEADER_SIZE, b"\0"))
+    f.flush()
+    os.fsync(f.fileno())
+
+def build_pack(manifest, pack_path, selectors=(), root="assets", store_path=STORE_PATH):
+    """Construit un pack pour la partie du manifeste désignée par les sélecteurs"""
+    store = ContentStore(store_path) if store_path else None
+    index = {"manifest": manifest_digest(manifest), "selectors": list(selectors), "paths": {}, "objects": {}}
+    tmp_path = pack_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(b"\0" * HEADER_SIZE)
+        writer = PackWriter(f, HEADER_SIZE, index["objects"], root, store)
+        for key, folder, name, oid in iter_manifest_files(manifest, selectors):
+            index["paths"][key] = writer.add(folder, name, oid)
+        _write_index(f, writer.offset, index)
+    os.replace(tmp_path, pack_path)
+    return index
+
+class PackReader:
+    """Lecture d'un pack : l'index est chargé une fois, chaque PDF est ensuite accessible en O(1)
+
+    read() renvoie une vue sur la projection mémoire du fichier : aucune
+    copie ni extraction, le noyau ne charge que les pages lues.
+    """
+
+    def __init__(self, pack_path):
+        self.f = open(pack_path, "rb")
+        self.mm = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, offset, size, index_sha = HEADER.unpack_from(self.mm, 0)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            raise ValueError(f"Format de pack non supporté: {magic!r} v{version}")
+        data = self.mm[offset:offset + size]
+        if hashlib.sha256(data).digest() != index_sha:
+            raise ValueError("Index du pack corrompu")
+        self.index = json.loads(data)
+        self.paths = self.index["paths"]
+        self.objects = self.index["objects"]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __contains__(self, key):
+        return key in self.paths
+
+    def oid(self, key):
+        return self.paths[key]
+
+    def read(self, key):
+        offset, size = self.objects[self.paths[key]]
+        return memoryview(self.mm)[offset:offset + size]
+
+    def extract(self, key, dest):
+        os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+        view = self.read(key)
+        try:
+            with open(dest, "wb") as f:
+                f.write(view)
+        finally:
+            view.release()
+
+    def verify(self):
+        """Liste les objets dont le contenu ne correspond plus à leur sha256"""
+        corrupted = []
+        for oid, (offset, size) in self.objects.items():
+            if hashlib.sha256(self.mm[offset:offset + size]).hexdigest() != oid:
+                corrupted.append(oid)
+        return corrupted
+
+    def close(self):
+        self.mm.close()
+        self.f.close()
+
+def update_pack(pack_path, patch, new_manifest, root="assets", store_path=STORE_PATH):
+    """Met à jour un pack en place à partir d'un patch de manifeste (manifest_diff)
+
+    Seuls les contenus nouveaux sont ajoutés, à la fin du fichier ; les
+    renommages ne copient rien. Les PDFs sans oid sont rehachés : un
+    contenu modifié sous le même nom ne laisse pas de trace dans le patch. Les octets devenus inutiles sont récupérés
+    en réécrivant le pack quand ils dépassent COMPACT_RATIO de sa taille.
+    """
+    with PackReader(pack_path) as reader:
+        index = reader.index
+    if index["manifest"] != patch["base"]:
+        raise ValueError("Le patch ne part pas du manifeste de ce pack (hash de base différent)")
+    if manifest_digest(new_manifest) != patch["target"]:
+        raise ValueError("Le nouveau manifeste ne correspond pas au hash cible du patch")
+
+    selectors = index["selectors"]
+    paths = index["paths"]
+    wanted = {key: (folder, name, oid) for key, folder, name, oid in iter_manifest_files(new_manifest, selectors)}
+    store = ContentStore(store_path) if store_path else None
+
+    with open(pack_path, "r+b") as f:
+        writer = PackWriter(f, _data_end(f), index["objects"], root, store)
+        for op in patch["ops"]:
+            kind, key = op[0], op[1]
+            if kind == ">":
+                old_oid = paths.pop(key, None)
+                key, value = op[2], op[3] if len(op) > 3 else {}
+                if key not in wanted:
+                    continue
+                if old_oid and "oid" not in value and "pdf" not in value:
+                    # Renommage sans nouveau contenu : l'objet est réutilisé tel quel
+                    paths[key] = old_oid
+                else:
+                    paths[key] = writer.add(*wanted[key])
+            elif kind == "-":
+                paths.pop(key, None)
+            elif key in wanted:
+                value = op[2]
+                if kind == "~" and key in paths and "pdf" not in value and "oid" not in value:
+                    continue
+                paths[key] = writer.add(*wanted[key])
+
+        # Sans oid, un PDF modifié sous le même nom n'apparaît pas dans le patch : on compare son contenu
+        for key, (folder, name, oid) in wanted.items():
+            if oid is None and key in paths and hash_path(os.path.join(root, folder, name)) != paths[key]:
+                paths[key] = writer.add(folder, name)
+
+        live = set(paths.values())
+        for oid in [oid for oid in index["objects"] if oid not in live]:
+            del index["objects"][oid]
+        index["manifest"] = patch["target"]
+        _write_index(f, writer.offset, index)
+        total = os.path.getsize(pack_path)
+
+    live_bytes = sum(size for _, size in index["objects"].values())
+    if live_bytes < total * (1 - COMPACT_RATIO):
+        compact_pack(pack_path)
+    return index
+
+def _data_end(f):
+    """Fin de l'index courant : les nouveaux objets s'écrivent après, sans l'écraser"""
+    f.seek(0)
+    _, _, _, offset, size, _ = HEADER.unpack(f.read(HEADER.size))
+    return offset + size
+
+def compact_pack(pack_path):
+    """Réécrit le pack avec ses seuls objets vivants"""
+    with PackReader(pack_path) as reader:
+        index = dict(reader.index, objects={})
+        tmp_path = pack_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(b"\0" * HEADER_SIZE)
+            offset = HEADER_SIZE
+            for oid, (start, size) in sorted(reader.objects.items(), key=lambda item: item[1][0]):
+                offset += _pad(offset)
+                f.seek(offset)
+                f.write(reader.mm[start:start + size])
+                index["objects"][oid] = [offset, size]
+                offset += size
+            _write_index(f, offset, index)
+    os.replace(tmp_path, pack_path)
+
+def _load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Packs hors ligne à accès direct")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="construire un pack")
+    build_parser.add_argument("pack")
+    build_parser.add_argument("selectors", nargs="*", metavar="FILIÈRE[/SEMESTRE[/MATIÈRE]]")
+    build_parser.add_argument("--manifest", default="assets/resources_manifest.json")
+    build_parser.add_argument("--root", default="assets", help="racine des dossiers du manifeste")
+    build_parser.add_argument("--store", default=STORE_PATH, help="magasin de contenus consulté en premier")
+
+    update_parser = subparsers.add_parser("update", help="appliquer un patch de manifeste à un pack")
+    update_parser.add_argument("pack")
+    update_parser.add_argument("patch")
+    update_parser.add_argument("--manifest", required=True, help="nouveau manifeste (cible du patch)")
+    update_parser.add_argument("--root", default="assets")
+    update_parser.add_argument("--store", default=STORE_PATH)
+
+    list_parser = subparsers.add_parser("list", help="lister le contenu d'un pack")
+    list_parser.add_argument("pack")
+
+    extract_parser = subparsers.add_parser("extract", help="extraire un PDF par son chemin")
+    extract_parser.add_argument("pack")
+    extract_parser.add_argument("key", help="filière/semestre/matière/fichier.pdf")
+    extract_parser.add_argument("-o", "--output", required=True)
+
+    verify_parser = subparsers.add_parser("verify", help="vérifier le sha256 de chaque objet")
+    verify_parser.add_argument("pack")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        index = build_pack(_load(args.manifest), args.pack, args.selectors, args.root, args.store)
+        print(f"📦 {len(index['paths'])} PDFs, {len(index['objects'])} contenus distincts → "
+              f"{args.pack} ({os.path.getsize(args.pack) / 1e6:.1f} Mo)")
+    elif args.command == "update":
+        index = update_pack(args.pack, _load(args.patch), _load(args.manifest), args.root, args.store)
+        print(f"🔄 {len(index['paths'])} PDFs, {len(index['objects'])} contenus → "
+              f"{args.pack} ({os.path.getsize(args.pack) / 1e6:.1f} Mo)")
+    elif args.command == "list":
+        with PackReader(args.pack) as reader:
+            for key, oid in reader.paths.items():
+                print(f"{reader.objects[oid][1]:>10}  {key}")
+    elif args.command == "extract":
+        with PackReader(args.pack) as reader:
+            reader.extract(args.key, args.output)
+        print(f"✅ {args.key} → {args.output}")
+    else:
+        with PackReader(args.pack) as reader:
+            corrupted = reader.verify()
+        print(f"{'✅' if not corrupted else '❌'} {len(corrupted)} objets corrompus")
+        raise SystemExit(1 if corrupted else 0)
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+from urllib.parse import parse_qs, urljoin, urlsplit
+
+import aiohttp
+
+from manifest_artifacts import write_atomic
+
+REDIRECT_CACHE_PATH = '.redirect_cache.json'
+REDIRECT_CACHE_VERSION = 1
+
+# Une résolution est refaite après ce délai, même si rien n'a expiré
+DEFAULT_REDIRECT_TTL = 24 * 3600
+MAX_REDIRECTS = 10
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+
+# Paramètres d'URL signée : l'adresse finale cesse de fonctionner à l'expiration
+SIGNED_URL_PARAMS = {'x-amz-signature', 'x-amz-expires', 'signature', 'expires', 'token', 'sig', 'se'}
+
+def signed_url_expiry(url):
+    """Date d'expiration (epoch) d'une URL signée, 0 si elle est signée sans date connue, None sinon"""
+    params = {key.lower(): values[-1] for key, values in parse_qs(urlsplit(url).query).items()}
+    if not SIGNED_URL_PARAMS & params.keys():
+        return None
+    try:
+        if 'x-amz-date' in params and 'x-amz-expires' in params:
+            signed_at = datetime.strptime(params['x-amz-date'], '%Y%m%dT%H%M%SZ').replace(tzinfo=timezone.utc)
+            return signed_at.timestamp() + int(params['x-amz-expires'])
+        if 'expires' in params:
+            return float(params['expires'])
+        if 'se' in params:
+            return datetime.fromisoformat(params['se'].replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        pass
+    return 0
+
+def load_redirect_cache(path=REDIRECT_CACHE_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.get('version') != REDIRECT_CACHE_VERSION:
+        return {}
+    return cache.get('urls', {})
+
+def save_redirect_cache(entries, path=REDIRECT_CACHE_PATH):
+    data = json.dumps({'version': REDIRECT_CACHE_VERSION, 'urls': entries}, ensure_ascii=False, separators=(',', ':'))
+    write_atomic(path, data.encode('utf-8'))
+
+async def resolve_url(session, url, timeout=10):
+    """Suit les redirections d'une URL sans télécharger le contenu
+
+    Renvoie {'final', 'stable', 'status', 'hops', 'permanent'} : stable est
+    la dernière adresse non signée de la chaîne (l'URL de départ au pire) et
+    permanent indique que toutes les redirections étaient permanentes.
+    """
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    hops = 0
+    permanent = True
+    stable = url
+    while True:
+        async with session.head(url, allow_redirects=False, timeout=client_timeout) as response:
+            status = response.status
+            location = response.headers.get('Location')
+        if status in (403, 405):
+            # HEAD refusé : un seul octet en GET
+            async with session.get(url, headers={'Range': 'bytes=0-0'}, allow_redirects=False,
+                                   timeout=client_timeout) as response:
+                status = response.status
+                location = response.headers.get('Location')
+        if status not in REDIRECT_STATUSES or not location:
+            return {'final': url, 'stable': stable, 'status': status, 'hops': hops, 'permanent': permanent}
+        hops += 1
+        if hops > MAX_REDIRECTS:
+            return {'final': url, 'stable': stable, 'status': None, 'hops': hops, 'permanent': False}
+        permanent = permanent and status in (301, 308)
+        url = urljoin(url, location)
+        if signed_url_expiry(url) is None:
+            stable = url
+
+def _usable(url, resolution):
+    """L'adresse stable remplace l'URL si la chaîne aboutit au contenu et raccourcit le trajet"""
+    return resolution['status'] in (200, 206) and resolution['stable'] != url
+
+async def resolve_urls(urls, cache, ttl=DEFAULT_REDIRECT_TTL, concurrency=16, timeout=10):
+    """Résout les URLs absentes ou expirées du cache, en parallèle
+
+    Les erreurs réseau ne sont pas mises en cache : l'URL d'origine reste
+    utilisée et la résolution sera retentée au prochain passage.
+    """
+    now = time.time()
+    pending = [url for url in dict.fromkeys(urls) if cache.get(url, {}).get('expires_at', 0) <= now]
+    if not pending:
+        return 0
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency, ttl_dns_cache=3600)
+
+    async def resolve_one(session, url):
+        async with semaphore:
+            try:
+                resolution = await resolve_url(session, url, timeout)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                cache.pop(url, None)
+                return
+        resolved_at = time.time()
+        # Une chaîne de redirections permanentes est gardée sept fois plus longtemps ;
+        # l'expiration d'une adresse finale signée n'importe pas, elle n'est jamais écrite
+        permanent = resolution['permanent'] and resolution['hops'] > 0
+        expires_at = resolved_at + ttl * (7 if permanent else 1)
+        cache[url] = {**resolution, 'resolved_at': resolved_at, 'expires_at': expires_at}
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*(resolve_one(session, url) for url in pending))
+    return len(pending)
+
+def resolve_manifest_urls(manifest, cache_path=REDIRECT_CACHE_PATH, ttl=DEFAULT_REDIRECT_TTL, concurrency=16):
+    """Note l'adresse finale des URLs du manifeste en ligne quand c'est sûr
+
+    L'adresse directe est écrite dans "direct_url", "url" reste inchangée :
+    l'application ouvre "url" dans le navigateur, sans moyen de détecter
+    qu'une adresse directe a cessé de répondre, et le manifeste est livré
+    avec elle. Les outils qui savent revenir en arrière (proxy, miroir)
+    peuvent préférer "direct_url". Une adresse signée (qui expire) n'est
+    jamais écrite : on s'arrête au dernier saut non signé. Une résolution en
+    échec n'écrit rien.
+    Renvoie (URLs résolues sur le réseau, adresses directes écrites).
+    """
+    pdfs = [pdf for filiere in manifest['filieres'] for semestre in filiere['semestres']
+            for matiere in semestre['matieres'] for pdf in matiere['pdfs']]
+    cache = load_redirect_cache(cache_path)
+    resolved = asyncio.run(resolve_urls((pdf['url'] for pdf in pdfs), cache, ttl, concurrency))
+
+    now = time.time()
+    annotated = 0
+    for pdf in pdfs:
+        resolution = cache.get(pdf['url'])
+        if resolution is None or resolution['expires_at'] <= now or not _usable(pdf['url'], resolution):
+            continue
+        pdf['direct_url'] = resolution['stable']
+        annotated += 1
+
+    # Les URLs disparues du manifeste sont oubliées
+    live = {pdf['url'] for pdf in pdfs}
+    save_redirect_cache({url: entry for url, entry in cache.items() if url in live}, cache_path)
+    return resolved, annotated
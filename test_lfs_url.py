@@ -1,5 +1,35 @@
 import requests
 
+from generate_github_manifest_final import URL_STRATEGIES
+from lfs_pointer import SNIFF_BYTES, check_served_head, parse_content_range_total
+
+def sniff_url(url, expected_size=None, timeout=10):
+    """Demande seulement les premiers octets d'une URL et classe le contenu servi
+    
+    Renvoie (réponse, type, taille servie, erreur). Si le serveur ignore
+    l'en-tête Range, la lecture s'arrête quand même après SNIFF_BYTES octets.
+    """
+    headers = {"Range": f"bytes=0-{SNIFF_BYTES - 1}"}
+    with requests.get(url, headers=headers, timeout=timeout, stream=True) as response:
+        if response.status_code not in (200, 206):
+            return response, None, None, f"HTTP {response.status_code}"
+        
+        head = b""
+        for chunk in response.iter_content(chunk_size=SNIFF_BYTES):
+            head += chunk
+            if len(head) >= SNIFF_BYTES:
+                break
+        head = head[:SNIFF_BYTES]
+        
+        if response.status_code == 206:
+            served_size = parse_content_range_total(response.headers.get("content-range"))
+        else:
+            length = response.headers.get("content-length")
+            served_size = int(length) if length and length.isdigit() else None
+    
+    kind, error = check_served_head(head, served_size, expected_size)
+    return response, kind, served_size, error
+
 def test_lfs_urls():
     """Teste différentes URLs pour contourner Git LFS"""
     
@@ -10,14 +40,8 @@ def test_lfs_urls():
     
     base_path = "assets/resources/lf_genie_civil/semestre_1/algebre_lineaire"
     
-    urls_to_test = [
-        # URL raw (ne fonctionne pas avec LFS)
-        f"https://raw.githubusercontent.com/light667/PolyAssistant-Android/main/{base_path}/{{file}}",
-        # URL download (devrait fonctionner)
-        f"https://github.com/light667/PolyAssistant-Android/raw/main/{base_path}/{{file}}",
-        # URL media (alternative)
-        f"https://media.githubusercontent.com/media/light667/PolyAssistant-Android/main/{base_path}/{{file}}"
-    ]
+    # raw (ne fonctionne pas avec LFS), github.com/raw (redirection), media
+    urls_to_test = [template.format(path=f"{base_path}/{{file}}") for template in URL_STRATEGIES.values()]
     
     for test_file in test_files:
         print(f"\n🔍 Test de: {test_file}")
@@ -26,19 +50,19 @@ def test_lfs_urls():
         for url_template in urls_to_test:
             url = url_template.format(file=test_file)
             try:
-                response = requests.head(url, timeout=10, allow_redirects=True)
+                response, kind, served_size, error = sniff_url(url)
                 print(f"🌐 {url}")
-                print(f"   Status: {response.status_code}")
+                range_note = {206: " (Range respecté)", 200: " (Range ignoré)"}.get(response.status_code, "")
+                print(f"   Status: {response.status_code}{range_note}")
                 print(f"   Content-Type: {response.headers.get('content-type', 'N/A')}")
-                print(f"   Content-Length: {response.headers.get('content-length', 'N/A')}")
+                print(f"   Taille servie: {served_size if served_size is not None else 'N/A'}")
                 
-                if response.status_code == 200:
-                    # Tester le contenu
-                    content_response = requests.get(url, timeout=5)
-                    if content_response.text.startswith("version https://git-lfs.github.com"):
-                        print("   ⚠️  POINTEUR LFS DÉTECTÉ")
-                    else:
-                        print("   ✅ FICHIER RÉEL DÉTECTÉ")
+                if kind == "pointer":
+                    print("   ⚠️  POINTEUR LFS DÉTECTÉ")
+                elif kind == "pdf" and not error:
+                    print("   ✅ FICHIER RÉEL DÉTECTÉ")
+                else:
+                    print(f"   ❌ {error}")
                 
             except Exception as e:
                 print(f"   ❌ Erreur: {e}")
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from standin import StandIn  # noqa: E402
+
+@pytest.fixture
+def standin():
+    """Fabrique de serveurs locaux, arrêtés à la fin du test"""
+    servers = []
+
+    def start(app):
+        server = StandIn(app)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
@@ -0,0 +1,73 @@
+import asyncio
+import threading
+import time
+
+from aiohttp import web
+
+class StandIn:
+    """Serveur aiohttp local, dans son propre thread, qui remplace GitHub pendant les tests
+
+    Il compte les requêtes par chemin et le nombre maximal de requêtes
+    simultanées, pour vérifier les bornes de concurrence et le regroupement
+    des téléchargements. Les gestionnaires injectent latences et erreurs.
+    """
+
+    def __init__(self, app):
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+        app.middlewares.append(self._track)
+        self._loop = asyncio.new_event_loop()
+        self._runner = web.AppRunner(app)
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(ready,), daemon=True)
+        self._thread.start()
+        ready.wait(10)
+
+    def _run(self, ready):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        self._loop.run_until_complete(site.start())
+        self.port = self._runner.addresses[0][1]
+        ready.set()
+        self._loop.run_forever()
+
+    @web.middleware
+    async def _track(self, request, handler):
+        self.requests.append((request.method, request.path, dict(request.headers)))
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            return await handler(request)
+        finally:
+            self.active -= 1
+
+    def url(self, path='/'):
+        return f"http://127.0.0.1:{self.port}{path}"
+
+    def count(self, path=None, method=None):
+        return sum(1 for m, p, _ in self.requests if (path is None or p == path) and (method is None or m == method))
+
+    def stop(self):
+        # Un test peut arrêter le serveur lui-même (redémarrage) avant la fixture
+        if self._loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(10)
+        self._loop.close()
+
+def wait_until(predicate, timeout=5.0):
+    """Attend qu'une condition devienne vraie (état observé depuis un autre thread)"""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition jamais remplie")
+        time.sleep(0.01)
+
+def respond(status=200, body=b'', headers=None):
+    """Gestionnaire qui renvoie toujours la même réponse"""
+    async def handler(request):
+        return web.Response(status=status, body=body, headers=headers)
+    return handler
@@ -0,0 +1,74 @@
+import asyncio
+import json
+
+from aiohttp import web
+
+from bench_endpoints import bench_endpoints, measure_download, recommend, sample_manifest_files
+
+PDF = b'%PDF-1.4\n' + bytes(200_000)
+POINTER = (b"version https://git-lfs.github.com/spec/v1\n"
+           b"oid sha256:" + b"a" * 64 + b"\nsize " + str(len(PDF)).encode() + b"\n")
+
+def github_app():
+    """Émule les trois points de GitHub : raw (pointeur), github.com/raw (2 redirections), media (PDF)"""
+    async def raw(request):
+        return web.Response(body=POINTER)
+
+    async def github_raw(request):
+        raise web.HTTPFound(f"/hop/{request.match_info['path']}")
+
+    async def hop(request):
+        # Le saut supplémentaire coûte un aller-retour
+        await asyncio.sleep(0.05)
+        raise web.HTTPFound(f"/media/{request.match_info['path']}")
+
+    async def media(request):
+        return web.Response(body=PDF, content_type='application/pdf')
+
+    app = web.Application()
+    app.router.add_get('/raw/{path:.*}', raw)
+    app.router.add_get('/gh/{path:.*}', github_raw)
+    app.router.add_get('/hop/{path:.*}', hop)
+    app.router.add_get('/media/{path:.*}', media)
+    return app
+
+def test_measure_download_follows_redirects(standin):
+    server = standin(github_app())
+    trial = measure_download(server.url('/gh/resources/a.pdf'), expected_size=len(PDF))
+
+    assert trial['hops'] == 2
+    assert trial['final_url'].endswith('/media/resources/a.pdf')
+    assert trial['kind'] == 'pdf'
+    assert trial['bytes'] == len(PDF)
+    assert 'error' not in trial
+
+def test_pointer_endpoint_is_never_recommended(standin):
+    server = standin(github_app())
+    strategies = {name: server.url(f'/{name}/{{path}}') for name in ('raw', 'gh', 'media')}
+    files = [('resources/a.pdf', len(PDF)), ('resources/b.pdf', len(PDF))]
+
+    summary = bench_endpoints(strategies, files, trials=2)
+
+    assert summary['raw']['ok'] == 0
+    assert summary['raw']['kinds'] == {'pointer': 4}
+    assert summary['gh']['ok'] == summary['gh']['trials'] == 4
+    assert summary['gh']['hops'] == 2
+    assert summary['media']['hops'] == 0
+    assert recommend(summary) == 'media'
+
+def test_recommend_requires_every_trial_to_succeed():
+    summary = {
+        'rapide': {'trials': 3, 'ok': 2, 'total': 0.1, 'ttfb': 0.01},
+        'lent': {'trials': 3, 'ok': 3, 'total': 0.5, 'ttfb': 0.05}
+    }
+    assert recommend(summary) == 'lent'
+    assert recommend({'x': {'trials': 1, 'ok': 0, 'total': None, 'ttfb': None}}) is None
+
+def test_sample_manifest_files_reads_both_manifest_kinds(tmp_path):
+    manifest = {'filieres': [{'name': 'f', 'semestres': [{'name': 's', 'matieres': [
+        {'name': 'm', 'folder': 'resources/f/s/m', 'pdfs': ['a.pdf', {'name': 'b.pdf', 'size': 10}]}]}]}]}
+    path = tmp_path / 'manifest.json'
+    path.write_text(json.dumps(manifest))
+
+    assert sorted(sample_manifest_files(str(path), 5, seed=1)) == [
+        ('resources/f/s/m/a.pdf', None), ('resources/f/s/m/b.pdf', 10)]
@@ -0,0 +1,152 @@
+import asyncio
+import hashlib
+import os
+import random
+from functools import partial
+
+from aiohttp import web
+
+from bulk_download import download_probe
+from content_store import ContentStore
+from verify_github_urls import verify_urls
+
+BLOB = b'%PDF-1.4\n' + random.Random(21).randbytes(300_000)
+OID = hashlib.sha256(BLOB).hexdigest()
+
+def range_app(cuts=0):
+    """Sert BLOB avec Range, 416 au-delà de la fin ; les cuts premières réponses sont coupées"""
+    state = {'cuts': cuts}
+
+    async def handler(request):
+        start = 0
+        status = 200
+        headers = {'ETag': f'"{OID}"'}
+        range_header = request.headers.get('Range')
+        if range_header:
+            start = int(range_header.removeprefix('bytes=').rstrip('-'))
+            if start >= len(BLOB):
+                return web.Response(status=416, headers={'Content-Range': f'bytes */{len(BLOB)}'})
+            status = 206
+            headers['Content-Range'] = f'bytes {start}-{len(BLOB) - 1}/{len(BLOB)}'
+        body = BLOB[start:]
+        response = web.StreamResponse(status=status, headers=headers)
+        response.content_length = len(body)
+        await response.prepare(request)
+        if state['cuts']:
+            state['cuts'] -= 1
+            await response.write(body[:len(body) // 3])
+            request.transport.close()
+            return response
+        await response.write(body)
+        return response
+
+    app = web.Application()
+    app.router.add_get('/blob.pdf', handler)
+    return app
+
+def download(server, store, pdf):
+    entries = [{'file': 'blob.pdf', 'url': server.url('/blob.pdf'), 'pdf': pdf}]
+
+    async def run():
+        probe = partial(download_probe, store=store)
+        return [result async for result in verify_urls(entries, probe=probe, retries=0)]
+    [result] = asyncio.run(run())
+    return result
+
+def ranges(server):
+    return [headers.get('Range') for _, _, headers in server.requests]
+
+def test_restart_after_kill_resumes_with_range(standin, tmp_path):
+    server = standin(range_app(cuts=1))
+    store = ContentStore(str(tmp_path / 'store'))
+    pdf = {'sha256': OID, 'size': len(BLOB)}
+
+    # Premier lancement interrompu : il reste un partiel
+    assert 'error' in download(server, store, pdf)
+    partial_size = os.path.getsize(store.partial_path(OID))
+    assert 0 < partial_size < len(BLOB)
+
+    result = download(server, store, pdf)
+
+    assert 'error' not in result
+    assert result['resumed_from'] == partial_size
+    assert ranges(server) == [None, f'bytes={partial_size}-']
+    with open(store.object_path(OID), 'rb') as f:
+        assert f.read() == BLOB
+
+def test_complete_partial_is_committed_without_request(standin, tmp_path):
+    server = standin(range_app())
+    store = ContentStore(str(tmp_path / 'store'))
+    # Arrêt entre la dernière écriture et l'entrée au magasin
+    with open(store.partial_path(OID), 'wb') as f:
+        f.write(BLOB)
+
+    result = download(server, store, {'sha256': OID, 'size': len(BLOB)})
+
+    assert 'error' not in result
+    assert store.has(OID)
+    assert server.count() == 0
+
+def test_corrupt_complete_partial_is_downloaded_again(standin, tmp_path):
+    server = standin(range_app())
+    store = ContentStore(str(tmp_path / 'store'))
+    with open(store.partial_path(OID), 'wb') as f:
+        f.write(BLOB[:-1] + b'x')
+
+    result = download(server, store, {'sha256': OID, 'size': len(BLOB)})
+
+    assert 'error' not in result
+    assert ranges(server) == [None]
+    assert store.has(OID)
+
+def test_range_not_satisfiable_restarts_from_zero(standin, tmp_path):
+    server = standin(range_app())
+    store = ContentStore(str(tmp_path / 'store'))
+    # Sans taille attendue, un partiel trop long n'est découvert que par le 416
+    with open(store.partial_path(OID), 'wb') as f:
+        f.write(BLOB + b'suite')
+
+    result = download(server, store, {'sha256': OID})
+
+    assert 'error' not in result
+    assert ranges(server) == [f'bytes={len(BLOB) + 5}-', None]
+    assert store.has(OID)
+
+def from_zero_app(always_partial=False):
+    """Répond à Range par un 206 servi depuis l'octet 0 ; sans Range, 200 (ou 206 si always_partial)"""
+    async def handler(request):
+        if request.headers.get('Range') is None and not always_partial:
+            return web.Response(body=BLOB)
+        headers = {'Content-Range': f'bytes 0-{len(BLOB) - 1}/{len(BLOB)}'}
+        return web.Response(status=206, body=BLOB, headers=headers)
+
+    app = web.Application()
+    app.router.add_get('/blob.pdf', handler)
+    return app
+
+def write_partial(store, data):
+    with open(store.partial_path(OID), 'wb') as f:
+        f.write(data)
+
+def test_mismatched_content_range_restarts_from_zero(standin, tmp_path):
+    server = standin(from_zero_app())
+    store = ContentStore(str(tmp_path / 'store'))
+    write_partial(store, BLOB[:1000])
+
+    result = download(server, store, {'sha256': OID, 'size': len(BLOB)})
+
+    assert 'error' not in result
+    assert ranges(server) == ['bytes=1000-', None]
+    with open(store.object_path(OID), 'rb') as f:
+        assert f.read() == BLOB
+
+def test_unrequested_partial_response_is_an_error(standin, tmp_path):
+    server = standin(from_zero_app(always_partial=True))
+    store = ContentStore(str(tmp_path / 'store'))
+    write_partial(store, BLOB[:1000])
+
+    result = download(server, store, {'sha256': OID, 'size': len(BLOB)})
+
+    assert result['error'] == 'Réponse partielle sans reprise demandée'
+    assert ranges(server) == ['bytes=1000-', None]
+    assert not store.has(OID)
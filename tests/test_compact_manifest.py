@@ -0,0 +1,64 @@
+import json
+
+import generate_github_manifest_final as generator
+from generate_github_manifest_final import (COMPACT_MANIFEST_PATH, build_compact_manifest,
+                                            expand_compact_manifest)
+
+HEAD = 'c' * 40
+PINNED = 'a' * 40
+
+LOCAL_MANIFEST = {
+    'filieres': [{
+        'name': 'lf_genie_civil',
+        'semestres': [{
+            'name': 'semestre_1',
+            'matieres': [{
+                'name': 'algebre_lineaire',
+                'folder': 'resources/lf_genie_civil/semestre_1/algebre_lineaire',
+                'pdfs': ['epingle.pdf', 'modifie.pdf']
+            }, {
+                'name': 'analyse',
+                'folder': 'resources/lf_genie_civil/semestre_1/analyse',
+                'pdfs': ['libre.pdf']
+            }]
+        }]
+    }]
+}
+
+def generate(tmp_path, monkeypatch, **kwargs):
+    (tmp_path / 'assets').mkdir()
+    (tmp_path / 'assets' / 'resources_manifest.json').write_text(json.dumps(LOCAL_MANIFEST), encoding='utf-8')
+    monkeypatch.chdir(tmp_path)
+    pins = {'assets/resources/lf_genie_civil/semestre_1/algebre_lineaire/epingle.pdf': PINNED}
+    monkeypatch.setattr(generator, 'pinned_commits', lambda paths: (HEAD, pins))
+    monkeypatch.setattr(generator, '_git', lambda *args: 'origin/main\n')
+
+    generator.generate_github_manifest_final(compact=True, **kwargs)
+
+    online = json.loads((tmp_path / 'assets' / 'resources_manifest_online.json').read_text(encoding='utf-8'))
+    compact = json.loads((tmp_path / COMPACT_MANIFEST_PATH).read_text(encoding='utf-8'))
+    return online, compact
+
+def test_pinned_compact_expands_to_online_manifest(tmp_path, monkeypatch):
+    online, compact = generate(tmp_path, monkeypatch, pin=True)
+
+    assert expand_compact_manifest(compact) == online
+    [epingle, modifie] = online['filieres'][0]['semestres'][0]['matieres'][0]['pdfs']
+    assert f'/{PINNED}/assets/' in epingle['url'] and epingle['immutable']
+    assert '/main/assets/' in modifie['url'] and 'immutable' not in modifie
+    assert online['cache']['commit'] == HEAD
+
+def test_unpinned_compact_expands_to_online_manifest(tmp_path, monkeypatch):
+    online, compact = generate(tmp_path, monkeypatch)
+
+    assert expand_compact_manifest(compact) == online
+    assert 'cache' not in compact
+    assert all('refs' not in matiere for matiere in compact['filieres'][0]['semestres'][0]['matieres'])
+
+def test_version_1_is_still_readable():
+    compact = build_compact_manifest(LOCAL_MANIFEST)
+    compact['version'] = 1
+
+    pdfs = expand_compact_manifest(compact)['filieres'][0]['semestres'][0]['matieres'][1]['pdfs']
+
+    assert pdfs[0]['url'].endswith('/main/assets/resources/lf_genie_civil/semestre_1/analyse/libre.pdf')
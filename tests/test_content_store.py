@@ -0,0 +1,123 @@
+import hashlib
+import os
+import random
+import subprocess
+
+import pytest
+
+from content_store import dedup_trees, repair_trees, verify_trees
+
+TREES = ('resources', 'assets/resources')
+STORE = '.content_store'
+
+def content(seed):
+    return b'%PDF-1.4\n' + random.Random(seed).randbytes(4000)
+
+FILES = {
+    'resources/gc/s1/a.pdf': content(1),
+    'resources/gc/s1/b.pdf': content(2),
+    'assets/resources/gc/s1/a.pdf': content(1),
+    'assets/resources/gc/s1/b.pdf': content(2),
+    'assets/resources/gc/s2/c.pdf': content(3),
+}
+
+@pytest.fixture
+def trees(tmp_path, monkeypatch):
+    """Deux arborescences qui se recoupent, dans un dossier courant temporaire"""
+    monkeypatch.chdir(tmp_path)
+    for path, data in FILES.items():
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+    return tmp_path
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def oid(seed):
+    return hashlib.sha256(content(seed)).hexdigest()
+
+def corrupt_in_place(path):
+    """Modifie l'inode lui-même : tous ses liens voient la corruption"""
+    os.chmod(path, 0o644)
+    with open(path, 'r+b') as f:
+        f.write(b'XXXX')
+
+def test_dedup_is_idempotent_and_keeps_content(trees):
+    first = dedup_trees(TREES, STORE)
+
+    assert first['files'] == 5 and first['distinct'] == 3
+    assert first['bytes_after'] < first['bytes_before']
+    assert {path: read(path) for path in FILES} == FILES
+    assert os.path.samefile('resources/gc/s1/a.pdf', 'assets/resources/gc/s1/a.pdf')
+    assert not os.stat('resources/gc/s1/a.pdf').st_mode & 0o222
+
+    second = dedup_trees(TREES, STORE)
+
+    assert second['linked'] == 0
+    # Un inode n'est haché qu'une fois : seuls les contenus distincts sont relus
+    assert second['hashed'] == first['bytes_after']
+    assert {path: read(path) for path in FILES} == FILES
+
+def test_verify_reports_corrupt_missing_copies_and_orphans(trees):
+    dedup_trees(TREES, STORE)
+    assert verify_trees(TREES, STORE)['corrupt'] == {}
+
+    corrupt_in_place('resources/gc/s1/a.pdf')
+    with open('resources/gc/s1/nouveau.pdf', 'wb') as f:
+        f.write(content(4))
+    os.remove('assets/resources/gc/s1/b.pdf')
+    with open('assets/resources/gc/s1/b.pdf', 'wb') as f:
+        f.write(content(2))
+    os.remove('assets/resources/gc/s2/c.pdf')
+
+    report = verify_trees(TREES, STORE)
+
+    assert list(report['corrupt']) == [oid(1)]
+    assert sorted(report['corrupt'][oid(1)]) == ['assets/resources/gc/s1/a.pdf', 'resources/gc/s1/a.pdf']
+    assert report['missing'] == [('resources/gc/s1/nouveau.pdf', oid(4))]
+    assert report['copies'] == [('assets/resources/gc/s1/b.pdf', oid(2))]
+    assert report['orphans'] == [oid(3)]
+
+def test_repair_from_a_healthy_copy(trees):
+    dedup_trees(TREES, STORE)
+    with open('resources/gc/s1/copie_saine.pdf', 'wb') as f:
+        f.write(content(1))
+    corrupt_in_place('resources/gc/s1/a.pdf')
+
+    report, lost = repair_trees(TREES, STORE)
+
+    assert lost == []
+    assert report['sources'] == {oid(1): 'resources/gc/s1/copie_saine.pdf'}
+    assert {path: read(path) for path in FILES} == FILES
+    after = verify_trees(TREES, STORE)
+    assert after['corrupt'] == {} and after['copies'] == [] and after['missing'] == []
+    assert os.path.samefile('resources/gc/s1/copie_saine.pdf', 'assets/resources/gc/s1/a.pdf')
+
+def test_repair_from_git(trees):
+    def git(*args):
+        subprocess.run(['git', '-c', 'user.name=t', '-c', 'user.email=t@t', *args],
+                       check=True, capture_output=True)
+    git('init', '-q')
+    git('add', *FILES)
+    git('commit', '-q', '-m', 'pdfs')
+    dedup_trees(TREES, STORE)
+    corrupt_in_place('assets/resources/gc/s2/c.pdf')
+
+    report, lost = repair_trees(TREES, STORE)
+
+    assert report['sources'] == {}
+    assert lost == []
+    assert read('assets/resources/gc/s2/c.pdf') == FILES['assets/resources/gc/s2/c.pdf']
+    after = verify_trees(TREES, STORE)
+    assert after['corrupt'] == {} and after['missing'] == []
+
+def test_unrecoverable_object_is_reported(trees):
+    dedup_trees(TREES, STORE)
+    corrupt_in_place('assets/resources/gc/s2/c.pdf')
+
+    # Pas de copie saine ni de dépôt git : rien pour reconstruire
+    _, lost = repair_trees(TREES, STORE)
+
+    assert lost == ['assets/resources/gc/s2/c.pdf']
@@ -0,0 +1,92 @@
+import asyncio
+import hashlib
+import random
+
+from aiohttp import web
+
+from standin import respond
+from verify_github_urls import deep_probe, verify_urls
+
+BLOB = b'%PDF-1.4\n' + random.Random(13).randbytes(300_000)
+OID = hashlib.sha256(BLOB).hexdigest()
+
+def blob_app(cuts=1, honor_range=True):
+    """Sert BLOB ; les cuts premières réponses sont coupées au milieu du corps"""
+    state = {'cuts': cuts}
+
+    async def handler(request):
+        start = 0
+        status = 200
+        headers = {}
+        range_header = request.headers.get('Range')
+        if range_header and honor_range:
+            start = int(range_header.removeprefix('bytes=').rstrip('-'))
+            status = 206
+            headers['Content-Range'] = f'bytes {start}-{len(BLOB) - 1}/{len(BLOB)}'
+        body = BLOB[start:]
+        response = web.StreamResponse(status=status, headers=headers)
+        response.content_length = len(body)
+        await response.prepare(request)
+        if state['cuts']:
+            state['cuts'] -= 1
+            await response.write(body[:len(body) // 2])
+            request.transport.close()
+            return response
+        await response.write(body)
+        return response
+
+    app = web.Application()
+    app.router.add_get('/blob.pdf', handler)
+    return app
+
+def probe(server, pdf):
+    entries = [{'file': 'blob.pdf', 'url': server.url('/blob.pdf'), 'pdf': pdf}]
+
+    async def run():
+        return [result async for result in verify_urls(entries, probe=deep_probe, retries=0)]
+    [result] = asyncio.run(run())
+    return result
+
+def test_matching_blob_passes(standin):
+    server = standin(blob_app(cuts=0))
+    result = probe(server, {'sha256': OID, 'size': len(BLOB)})
+
+    assert 'error' not in result
+    assert result['served_sha256'] == OID
+    assert result['bytes'] == len(BLOB)
+    assert result['resumes'] == 0
+
+def test_cut_transfer_resumes_with_range(standin):
+    server = standin(blob_app(cuts=2))
+    result = probe(server, {'sha256': OID, 'size': len(BLOB)})
+
+    assert 'error' not in result
+    assert result['served_sha256'] == OID
+    assert result['resumes'] == 2
+    ranges = [headers.get('Range') for _, _, headers in server.requests]
+    assert ranges[0] is None and all(ranges[1:])
+
+def test_resume_ignored_by_server_restarts_hash(standin):
+    server = standin(blob_app(cuts=1, honor_range=False))
+    result = probe(server, {'sha256': OID, 'size': len(BLOB)})
+
+    assert 'error' not in result
+    assert result['served_sha256'] == OID
+
+def test_wrong_content_is_reported(standin):
+    app = web.Application()
+    app.router.add_get('/blob.pdf', respond(body=BLOB[:-1] + b'x'))
+    server = standin(app)
+
+    result = probe(server, {'sha256': OID, 'size': len(BLOB)})
+
+    assert result['error'].startswith('sha256')
+
+def test_wrong_size_is_reported(standin):
+    app = web.Application()
+    app.router.add_get('/blob.pdf', respond(body=BLOB[:1000]))
+    server = standin(app)
+
+    result = probe(server, {'sha256': OID, 'size': len(BLOB)})
+
+    assert result['error'].startswith('Taille reçue 1000')
@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+import pytest
+from aiohttp import web
+
+from host_throttle import CircuitOpenError, HostThrottle, backoff_delay, parse_retry_after
+from verify_github_urls import verify_urls
+
+def throttling_app(max_concurrent, retry_after=None):
+    """Répond 429 au-delà de max_concurrent requêtes simultanées, comme un CDN qui se protège"""
+    state = {'active': 0, 'throttled': 0, 'times': []}
+
+    async def handler(request):
+        state['times'].append(time.monotonic())
+        if state['active'] >= max_concurrent:
+            state['throttled'] += 1
+            headers = {'Retry-After': retry_after} if retry_after is not None else None
+            return web.Response(status=429, headers=headers)
+        state['active'] += 1
+        try:
+            await asyncio.sleep(0.05)
+            return web.Response()
+        finally:
+            state['active'] -= 1
+
+    app = web.Application()
+    app.router.add_route('*', '/{name}', handler)
+    return app, state
+
+def collect(entries, **kwargs):
+    async def run():
+        return [result async for result in verify_urls(entries, **kwargs)]
+    return asyncio.run(run())
+
+def test_throttled_host_loses_no_result(standin):
+    app, state = throttling_app(max_concurrent=3)
+    server = standin(app)
+    entries = [{'file': f'f{i}', 'url': server.url(f'/f{i}')} for i in range(40)]
+
+    results = collect(entries, concurrency=16, per_host=8, retries=8)
+
+    assert len(results) == 40
+    assert [result.get('error') for result in results if result['status'] != 200] == []
+    assert state['throttled'] > 0
+    # La limite par hôte a baissé : bien moins de refus que de requêtes
+    assert state['throttled'] < 40
+
+def test_retry_after_is_honored(standin):
+    app, state = throttling_app(max_concurrent=0, retry_after='0.6')
+    server = standin(app)
+
+    [result] = collect([{'file': 'f', 'url': server.url('/f')}], retries=1)
+
+    assert result['status'] == 429
+    assert result['attempts'] == 2
+    assert result['error'] == 'HTTP 429'
+    # Au-delà du backoff du premier essai (0,5 s au plus) : c'est bien Retry-After qui est attendu
+    first, retry = state['times']
+    assert retry - first >= 0.6
+
+def test_parse_retry_after():
+    assert parse_retry_after('2.5') == 2.5
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:10 GMT', now=1445412480) == 10
+    assert parse_retry_after('99999') == 300
+    assert parse_retry_after('demain') is None
+    assert parse_retry_after(None) is None
+
+def test_backoff_delay_is_capped():
+    assert all(0 <= backoff_delay(attempt) <= 0.5 * 2 ** attempt for attempt in range(5))
+    assert all(backoff_delay(20) <= 30 for _ in range(100))
+
+def test_limit_halves_once_per_window_then_grows():
+    async def scenario():
+        throttle = HostThrottle(8)
+        tickets = [await throttle.acquire() for _ in range(8)]
+        for ticket in tickets:
+            await throttle.release(ticket, 'throttled')
+        # Huit refus de la même fenêtre : une seule division par deux
+        assert throttle.limit == 4
+        for _ in range(20):
+            await throttle.release(await throttle.acquire(), 'ok')
+        return throttle.limit
+    assert asyncio.run(scenario()) > 4
+
+def test_circuit_opens_on_dead_host():
+    async def scenario():
+        throttle = HostThrottle(4, threshold=2, cooldown=0.01, max_cooldown=0.05)
+        with pytest.raises(CircuitOpenError):
+            for _ in range(20):
+                await throttle.release(await throttle.acquire(), 'failed')
+    asyncio.run(scenario())
+
+def test_unreachable_host_fails_without_hanging():
+    # Port 9 (discard) fermé en local : connexion refusée immédiatement
+    entries = [{'file': f'f{i}', 'url': f'http://127.0.0.1:9/f{i}'} for i in range(3)]
+    results = collect(entries, retries=0)
+
+    assert [result['status'] for result in results] == [None] * 3
+    assert all(result['error'] for result in results)
@@ -0,0 +1,71 @@
+import hashlib
+import http.client
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from content_store import ContentStore
+from lan_mirror import MirrorIndex, MirrorServer, rewrite_manifest
+
+BLOB = b'%PDF-1.4\n' + b'x' * 5000
+OID = hashlib.sha256(BLOB).hexdigest()
+
+@pytest.fixture
+def mirror(tmp_path):
+    """Miroir servant un magasin d'un seul objet, dans un thread"""
+    store = ContentStore(str(tmp_path / 'store'))
+    source = tmp_path / 'blob.pdf'
+    source.write_bytes(BLOB)
+    store.add(str(source), OID)
+    server = MirrorServer(('127.0.0.1', 0), MirrorIndex(None, store.root))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join(10)
+
+def get(server, path):
+    connection = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=10)
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+def test_object_is_served_by_oid(mirror):
+    assert get(mirror, f'/oid/{OID}') == (200, BLOB)
+
+@pytest.mark.parametrize('oid', [
+    # 64 caractères, mais un chemin absolu une fois joint au magasin
+    'ab/etc' + '/' * 52 + 'passwd',
+    OID.upper(),
+])
+def test_non_hex_oid_never_reaches_the_filesystem(mirror, oid):
+    assert len(oid) == 64
+    status, body = get(mirror, f'/oid/{oid}')
+
+    assert status == 404
+    assert b'root:' not in body
+
+def test_serving_and_rewriting_do_not_need_aiohttp():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = "import sys, lan_mirror; print('aiohttp' in sys.modules)"
+    output = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == 'False'
+
+def test_rewrite_keeps_the_origin_url():
+    pdf = {'name': 'a b.pdf', 'url': 'https://media.example/a%20b.pdf', 'sha256': OID}
+    manifest = {'filieres': [{'name': 'f', 'semestres': [{'name': 's', 'matieres': [
+        {'name': 'm', 'folder': 'resources/f/s/m', 'pdfs': [pdf, {'name': 'c.pdf', 'url': 'https://media.example/c.pdf'}]}
+    ]}]}]}
+
+    assert rewrite_manifest(manifest, 'http://10.0.0.5:8080/') == 2
+    [by_oid, by_path] = manifest['filieres'][0]['semestres'][0]['matieres'][0]['pdfs']
+    assert by_oid['url'] == f'http://10.0.0.5:8080/oid/{OID}' and by_oid['immutable']
+    assert by_oid['fallback_url'] == 'https://media.example/a%20b.pdf'
+    assert by_path['url'] == 'http://10.0.0.5:8080/resources/f/s/m/c.pdf'
@@ -0,0 +1,123 @@
+import copy
+import hashlib
+from urllib.parse import quote
+
+import pytest
+
+from manifest_diff import apply_patch, diff_manifests
+
+BASE_URL = 'https://media.example/main/assets'
+
+def oid(name):
+    return hashlib.sha256(name.encode('utf-8')).hexdigest()
+
+def pdf(folder, name, content=None, size=1000):
+    sha = oid(content or name)
+    return {'name': name, 'url': f'{BASE_URL}/{folder}/{quote(name)}', 'source': 'github_media_lfs',
+            'size': size, 'sha256': sha, 'oid': sha}
+
+def online_manifest(matieres):
+    """Manifeste en ligne : {(matière, dossier): [entrées]}, table des blobs comprise"""
+    pdfs = [entry for entries in matieres.values() for entry in entries]
+    return {
+        'filieres': [{'name': 'gc', 'semestres': [{'name': 's1', 'matieres': [
+            {'name': name, 'folder': folder, 'pdfs': entries} for (name, folder), entries in matieres.items()
+        ]}]}],
+        'blobs': {entry['sha256']: {'size': entry['size'], 'lfs': True} for entry in sorted(pdfs, key=lambda e: e['sha256'])}
+    }
+
+ALGEBRE = ('algebre', 'resources/gc/s1/algebre')
+ANALYSE = ('analyse', 'resources/gc/s1/analyse')
+
+@pytest.fixture
+def old():
+    return online_manifest({
+        ALGEBRE: [pdf(ALGEBRE[1], 'cours.pdf'), pdf(ALGEBRE[1], 'td 1.pdf'), pdf(ALGEBRE[1], 'vieux.pdf')],
+        ANALYSE: [pdf(ANALYSE[1], 'examen.pdf')],
+    })
+
+def round_trip(old, new):
+    patch = diff_manifests(old, new)
+    assert apply_patch(old, patch) == new
+    return patch
+
+def test_identical_manifests_give_an_empty_patch(old):
+    patch = round_trip(old, copy.deepcopy(old))
+    assert patch['ops'] == [] and 'blobs' not in patch and 'top' not in patch
+
+def test_rename_is_detected_by_oid(old):
+    new = online_manifest({
+        ALGEBRE: [pdf(ALGEBRE[1], 'cours.pdf'), pdf(ALGEBRE[1], 'td 1 corrigé.pdf', content='td 1.pdf'),
+                  pdf(ALGEBRE[1], 'vieux.pdf')],
+        ANALYSE: [pdf(ANALYSE[1], 'examen.pdf')],
+    })
+
+    patch = round_trip(old, new)
+
+    # Nom et URL sont déduits : l'opération ne porte que les deux clés
+    assert patch['ops'] == [['>', 'gc/s1/algebre/td 1.pdf', 'gc/s1/algebre/td 1 corrigé.pdf']]
+
+def test_move_to_another_folder(old):
+    new = online_manifest({
+        ALGEBRE: [pdf(ALGEBRE[1], 'cours.pdf'), pdf(ALGEBRE[1], 'td 1.pdf')],
+        ANALYSE: [pdf(ANALYSE[1], 'examen.pdf'), pdf(ANALYSE[1], 'vieux.pdf')],
+    })
+
+    patch = round_trip(old, new)
+
+    assert [op[:3] for op in patch['ops']] == [['>', 'gc/s1/algebre/vieux.pdf', 'gc/s1/analyse/vieux.pdf']]
+
+def test_folder_change_of_a_matiere(old):
+    moved = ('algebre', 'resources/gc/s1/algebre_lineaire')
+    new = online_manifest({
+        moved: [pdf(moved[1], 'cours.pdf'), pdf(moved[1], 'td 1.pdf'), pdf(moved[1], 'vieux.pdf')],
+        ANALYSE: [pdf(ANALYSE[1], 'examen.pdf')],
+    })
+
+    round_trip(old, new)
+
+def test_content_and_blob_changes(old):
+    new = online_manifest({
+        ALGEBRE: [pdf(ALGEBRE[1], 'cours.pdf', content='cours v2', size=2500), pdf(ALGEBRE[1], 'td 1.pdf')],
+        ANALYSE: [pdf(ANALYSE[1], 'examen.pdf'), pdf(ANALYSE[1], 'nouveau.pdf', size=42)],
+    })
+
+    patch = round_trip(old, new)
+
+    assert {op[0] for op in patch['ops']} == {'~', '-', '+'}
+    assert set(patch['blobs']['+']) == {oid('cours v2'), oid('nouveau.pdf')}
+    assert set(patch['blobs']['-']) == {oid('cours.pdf'), oid('vieux.pdf')}
+
+def test_top_level_metadata(old):
+    new = copy.deepcopy(old)
+    new['cache'] = {'commit': 'c' * 40, 'manifest_cache_control': 'no-cache'}
+    old['generated'] = 'hier'
+    new['generated'] = "aujourd'hui"
+
+    patch = round_trip(old, new)
+
+    assert patch['top'] == {'cache': new['cache'], 'generated': "aujourd'hui"}
+
+def test_local_manifest_rename_and_order():
+    def local(pdfs):
+        return {'filieres': [{'name': 'gc', 'semestres': [{'name': 's1', 'matieres': [
+            {'name': 'algebre', 'folder': ALGEBRE[1], 'pdfs': pdfs, 'oids': [oid(name) for name in pdfs]}
+        ]}]}]}
+    old = local(['b.pdf', 'a.pdf'])
+    new = local(['c.pdf', 'b.pdf'])
+    new['filieres'][0]['semestres'][0]['matieres'][0]['oids'][0] = oid('a.pdf')
+
+    patch = round_trip(old, new)
+
+    assert patch['ops'] == [['>', 'gc/s1/algebre/a.pdf', 'gc/s1/algebre/c.pdf']]
+    assert patch['order'] == ['gc/s1/algebre/c.pdf', 'gc/s1/algebre/b.pdf']
+
+def test_patch_on_another_base_is_rejected(old):
+    new = copy.deepcopy(old)
+    new['filieres'][0]['semestres'][0]['matieres'][0]['pdfs'].pop()
+    patch = diff_manifests(old, new)
+    other = copy.deepcopy(old)
+    other['generated'] = 'ailleurs'
+
+    with pytest.raises(ValueError, match='hash de base'):
+        apply_patch(other, patch)
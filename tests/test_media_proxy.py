@@ -0,0 +1,175 @@
+import asyncio
+import hashlib
+import random
+import threading
+import time
+
+import aiohttp
+from aiohttp import web
+
+from media_proxy import LruCache, make_app
+
+CHUNK = 50_000
+FILES = {f'f{i}.pdf': b'%PDF-1.4\n' + random.Random(i).randbytes(400_000) for i in range(4)}
+OIDS = {name: hashlib.sha256(data).hexdigest() for name, data in FILES.items()}
+
+def slow_upstream(gate=None, sent=None):
+    """Amont lent : 50 Ko toutes les 50 ms, soit ~0,4 s par fichier ; bad.pdf a un dernier octet faux
+
+    Avec gate, le dernier morceau attend que le test l'ouvre (10 s au plus) ;
+    sent reçoit le nom des fichiers envoyés en entier.
+    """
+    async def handler(request):
+        name = request.match_info['name']
+        if name == 'absent.pdf':
+            raise web.HTTPNotFound()
+        data = FILES.get(name) or FILES['f0.pdf'][:-1] + b'x'
+        response = web.StreamResponse(headers={'Content-Type': 'application/pdf'})
+        response.content_length = len(data)
+        await response.prepare(request)
+        for i in range(0, len(data), CHUNK):
+            if gate is not None and i + CHUNK >= len(data):
+                deadline = time.monotonic() + 10
+                while not gate.is_set() and time.monotonic() < deadline:
+                    await asyncio.sleep(0.01)
+            await response.write(data[i:i + CHUNK])
+            await asyncio.sleep(0.05)
+        if sent is not None:
+            sent.add(name)
+        return response
+
+    app = web.Application()
+    app.router.add_get('/media/{name}', handler)
+    return app
+
+def manifest_for(upstream):
+    pdfs = [{'name': name, 'url': upstream.url(f'/media/{name}'), 'sha256': OIDS[name], 'size': len(data)}
+            for name, data in FILES.items()]
+    # Contenu servi ≠ sha256 annoncé
+    pdfs.append({'name': 'bad.pdf', 'url': upstream.url('/media/bad.pdf'),
+                 'sha256': hashlib.sha256(b'attendu').hexdigest(), 'size': len(FILES['f0.pdf'])})
+    # Source en 404 : le proxy passe à fallback_url
+    pdfs.append({'name': 'absent.pdf', 'url': upstream.url('/media/absent.pdf'),
+                 'fallback_url': upstream.url('/media/f3.pdf'), 'sha256': OIDS['f3.pdf'], 'size': len(FILES['f3.pdf'])})
+    return {'filieres': [{'name': 'f', 'semestres': [{'name': 's', 'matieres': [
+        {'name': 'm', 'folder': 'resources/f/s/m', 'pdfs': pdfs}]}]}]}
+
+def start_proxy(standin, tmp_path, max_bytes=10 ** 7, upstream_app=None):
+    upstream = standin(upstream_app or slow_upstream())
+    proxy = standin(make_app(manifest_for(upstream), LruCache(str(tmp_path / 'cache'), max_bytes), timeout=5))
+    return upstream, proxy
+
+async def fetch(session, url, headers=None):
+    """(statut, corps) ; statut 'coupé' si la connexion est interrompue"""
+    body = b''
+    try:
+        async with session.get(url, headers=headers) as response:
+            async for chunk in response.content.iter_chunked(1 << 16):
+                body += chunk
+            return response.status, body
+    except aiohttp.ClientPayloadError:
+        return 'coupé', body
+
+def run(*requests):
+    async def main():
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+            return await asyncio.gather(*(fetch(session, *request) for request in requests))
+    return asyncio.run(main())
+
+def stats(proxy):
+    async def main():
+        async with aiohttp.ClientSession() as session:
+            async with session.get(proxy.url('/_stats')) as response:
+                return await response.json()
+    return asyncio.run(main())
+
+def test_concurrent_misses_collapse_into_one_upstream_request(standin, tmp_path):
+    gate, sent = threading.Event(), set()
+    upstream, proxy = start_proxy(standin, tmp_path, upstream_app=slow_upstream(gate, sent))
+    url = proxy.url(f'/oid/{OIDS["f0.pdf"]}')
+    clients = 30
+    first_bytes = []
+
+    async def client(session):
+        async with session.get(url) as response:
+            head = await response.content.readany()
+            # Premiers octets reçus alors que l'amont retient encore son dernier morceau
+            first_bytes.append('f0.pdf' not in sent)
+            if len(first_bytes) == clients:
+                gate.set()
+            return response.status, head + await response.read()
+
+    async def main():
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+            return await asyncio.gather(*(client(session) for _ in range(clients)))
+    results = asyncio.run(main())
+
+    assert all(status == 200 and body == FILES['f0.pdf'] for status, body in results)
+    assert first_bytes == [True] * clients
+    assert gate.is_set()
+    assert upstream.count('/media/f0.pdf') == 1
+    assert stats(proxy)['collapsed'] == clients - 1
+
+def test_range_during_fill(standin, tmp_path):
+    upstream, proxy = start_proxy(standin, tmp_path)
+    url = proxy.url(f'/oid/{OIDS["f1.pdf"]}')
+
+    async def main():
+        async with aiohttp.ClientSession() as session:
+            full = asyncio.ensure_future(fetch(session, url))
+            await asyncio.sleep(0.1)
+            partial = await fetch(session, url, {'Range': 'bytes=300000-300099'})
+            return partial, await full
+    (status, body), (full_status, full_body) = asyncio.run(main())
+
+    assert status == 206 and body == FILES['f1.pdf'][300000:300100]
+    assert full_status == 200 and full_body == FILES['f1.pdf']
+    assert upstream.count('/media/f1.pdf') == 1
+
+def test_wrong_content_is_cut_and_not_cached(standin, tmp_path):
+    upstream, proxy = start_proxy(standin, tmp_path)
+
+    [(status, body)] = run((proxy.url('/media/bad.pdf'),))
+
+    assert status == 'coupé'
+    assert len(body) < len(FILES['f0.pdf'])
+    assert stats(proxy)['cached_objects'] == 0
+    run((proxy.url('/media/bad.pdf'),))
+    assert upstream.count('/media/bad.pdf') == 2
+
+def test_missing_upstream_falls_back(standin, tmp_path):
+    upstream, proxy = start_proxy(standin, tmp_path)
+
+    [(status, body)] = run((proxy.url('/media/absent.pdf'),))
+
+    assert status == 200 and body == FILES['f3.pdf']
+    assert upstream.count('/media/f3.pdf') == 1
+
+def test_cache_is_bounded_least_recently_used_first(standin, tmp_path):
+    size = len(FILES['f0.pdf'])
+    upstream, proxy = start_proxy(standin, tmp_path, max_bytes=2 * size + 1)
+
+    for name in ('f0.pdf', 'f1.pdf', 'f0.pdf', 'f2.pdf'):
+        [(status, _)] = run((proxy.url(f'/oid/{OIDS[name]}'),))
+        assert status == 200
+
+    current = stats(proxy)
+    assert current['cached_bytes'] <= 2 * size + 1
+    assert current['evicted'] == 1
+    # f0 a été relu : c'est f1 qui est sorti
+    run((proxy.url(f'/oid/{OIDS["f0.pdf"]}'),), (proxy.url(f'/oid/{OIDS["f1.pdf"]}'),))
+    assert upstream.count('/media/f0.pdf') == 1
+    assert upstream.count('/media/f1.pdf') == 2
+
+def test_cache_survives_restart(standin, tmp_path):
+    upstream, proxy = start_proxy(standin, tmp_path)
+    run((proxy.url(f'/oid/{OIDS["f2.pdf"]}'),))
+    proxy.stop()
+
+    cache = LruCache(str(tmp_path / 'cache'), 10 ** 7)
+    assert list(cache.entries) == [OIDS['f2.pdf']]
+    restarted = standin(make_app(manifest_for(upstream), cache))
+    [(status, body)] = run((restarted.url(f'/oid/{OIDS["f2.pdf"]}'),))
+
+    assert status == 200 and body == FILES['f2.pdf']
+    assert upstream.count('/media/f2.pdf') == 1
@@ -0,0 +1,154 @@
+import copy
+import hashlib
+import os
+import random
+import struct
+
+import pytest
+
+import offline_pack
+
+from manifest_diff import diff_manifests
+from offline_pack import ALIGN, PackReader, build_pack, compact_pack, update_pack
+
+FOLDER = 'resources/gc/s1/algebre'
+OTHER = 'resources/gc/s1/analyse'
+
+def content(seed):
+    return b'%PDF-1.4\n' + random.Random(seed).randbytes(6000)
+
+def write_tree(root, files):
+    """Écrit {(dossier, nom): contenu} sous root"""
+    for (folder, name), data in files.items():
+        path = root / folder / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+
+def local_manifest(files, with_oids=True):
+    """Manifeste local à une matière par dossier, avec ou sans liste "oids" """
+    matieres = {}
+    for (folder, name), data in files.items():
+        matiere = matieres.setdefault(folder, {'name': folder.rsplit('/', 1)[1], 'folder': folder, 'pdfs': []})
+        matiere['pdfs'].append(name)
+        if with_oids:
+            matiere.setdefault('oids', []).append(hashlib.sha256(data).hexdigest())
+    return {'filieres': [{'name': 'gc', 'semestres': [{'name': 's1', 'matieres': list(matieres.values())}]}]}
+
+def pack_contents(pack_path):
+    with PackReader(str(pack_path)) as reader:
+        return {key: bytes(reader.read(key)) for key in reader.paths}
+
+@pytest.fixture
+def packed(tmp_path):
+    """Arborescence, manifeste avec oids et pack construit dessus"""
+    root = tmp_path / 'assets'
+    files = {(FOLDER, 'a.pdf'): content(1), (FOLDER, 'b.pdf'): content(2),
+             (FOLDER, 'c.pdf'): content(3), (OTHER, 'copie.pdf'): content(1)}
+    write_tree(root, files)
+    manifest = local_manifest(files)
+    pack = tmp_path / 'gc.pack'
+    build_pack(manifest, str(pack), root=str(root), store_path=None)
+    return root, files, manifest, pack
+
+def changed(root, files):
+    """Renomme a, modifie b sur place, supprime c, ajoute d"""
+    new_files = {(FOLDER, 'a_renomme.pdf'): content(1), (FOLDER, 'b.pdf'): content(20),
+                 (FOLDER, 'd.pdf'): content(4), (OTHER, 'copie.pdf'): content(1)}
+    write_tree(root, new_files)
+    return new_files
+
+def test_build_then_read(packed):
+    root, files, manifest, pack = packed
+
+    with PackReader(str(pack)) as reader:
+        assert set(reader.paths) == {'gc/s1/algebre/a.pdf', 'gc/s1/algebre/b.pdf',
+                                     'gc/s1/algebre/c.pdf', 'gc/s1/analyse/copie.pdf'}
+        assert bytes(reader.read('gc/s1/algebre/b.pdf')) == content(2)
+        # Même contenu dans deux matières : un seul objet
+        assert reader.oid('gc/s1/algebre/a.pdf') == reader.oid('gc/s1/analyse/copie.pdf')
+        assert len(reader.objects) == 3
+        assert all(offset % ALIGN == 0 for offset, _ in reader.objects.values())
+        assert reader.verify() == []
+
+def test_update_matches_fresh_build(packed, tmp_path):
+    root, files, manifest, pack = packed
+    new_files = changed(root, files)
+    new_manifest = local_manifest(new_files)
+    patch = diff_manifests(manifest, new_manifest)
+    assert {op[0] for op in patch['ops']} == {'>', '-', '+', '~'}
+
+    index = update_pack(str(pack), patch, new_manifest, root=str(root), store_path=None)
+    fresh = tmp_path / 'fresh.pack'
+    fresh_index = build_pack(new_manifest, str(fresh), root=str(root), store_path=None)
+
+    assert pack_contents(pack) == pack_contents(fresh)
+    assert index['manifest'] == fresh_index['manifest']
+    assert set(index['objects']) == set(fresh_index['objects'])
+
+def test_interrupted_update_keeps_previous_index(packed, monkeypatch):
+    root, files, manifest, pack = packed
+    new_files = changed(root, files)
+    new_manifest = local_manifest(new_files)
+    before = pack_contents(pack)
+
+    class CrashingHeader(struct.Struct):
+        """Arrêt brutal juste avant la réécriture de l'en-tête"""
+        def pack(self, *values):
+            raise KeyboardInterrupt
+
+    with monkeypatch.context() as m:
+        m.setattr(offline_pack, 'HEADER', CrashingHeader(offline_pack.HEADER.format))
+        with pytest.raises(KeyboardInterrupt):
+            update_pack(str(pack), diff_manifests(manifest, new_manifest), new_manifest,
+                        root=str(root), store_path=None)
+
+    assert pack_contents(pack) == before
+    with PackReader(str(pack)) as reader:
+        assert reader.verify() == []
+
+def test_compaction_keeps_every_object_readable(packed, monkeypatch):
+    root, files, manifest, pack = packed
+    new_files = changed(root, files)
+    new_manifest = local_manifest(new_files)
+    # Pas de compaction automatique : les octets morts restent jusqu'à compact_pack
+    monkeypatch.setattr(offline_pack, 'COMPACT_RATIO', 1.0)
+    update_pack(str(pack), diff_manifests(manifest, new_manifest), new_manifest, root=str(root), store_path=None)
+    before, size = pack_contents(pack), os.path.getsize(pack)
+
+    compact_pack(str(pack))
+
+    assert pack_contents(pack) == before
+    assert os.path.getsize(pack) < size
+    with PackReader(str(pack)) as reader:
+        assert reader.verify() == []
+
+def test_patch_from_another_base_is_rejected(packed):
+    root, files, manifest, pack = packed
+    other = local_manifest({(FOLDER, 'autre.pdf'): content(9)})
+    new_manifest = local_manifest(changed(root, files))
+
+    with pytest.raises(ValueError, match='hash de base'):
+        update_pack(str(pack), diff_manifests(other, new_manifest), new_manifest, root=str(root), store_path=None)
+    with pytest.raises(ValueError, match='hash cible'):
+        update_pack(str(pack), diff_manifests(manifest, new_manifest), other, root=str(root), store_path=None)
+    assert pack_contents(pack)['gc/s1/algebre/c.pdf'] == content(3)
+
+def test_update_without_oids_rehashes_modified_files(tmp_path):
+    root = tmp_path / 'assets'
+    files = {(FOLDER, 'a.pdf'): content(1), (FOLDER, 'b.pdf'): content(2)}
+    write_tree(root, files)
+    manifest = local_manifest(files, with_oids=False)
+    pack = tmp_path / 'gc.pack'
+    build_pack(manifest, str(pack), root=str(root), store_path=None)
+
+    # Modifié en place, même nom : le manifeste (et donc le patch) ne change pas
+    write_tree(root, {(FOLDER, 'b.pdf'): content(3)})
+    new_manifest = copy.deepcopy(manifest)
+    patch = diff_manifests(manifest, new_manifest)
+    assert patch['ops'] == []
+
+    update_pack(str(pack), patch, new_manifest, root=str(root), store_path=None)
+
+    assert pack_contents(pack)['gc/s1/algebre/b.pdf'] == content(3)
+    with PackReader(str(pack)) as reader:
+        assert reader.verify() == []
@@ -0,0 +1,96 @@
+import asyncio
+import random
+
+from aiohttp import web
+
+from lfs_pointer import SNIFF_BYTES, check_served_head
+from standin import respond, wait_until
+from verify_github_urls import range_probe, verify_urls
+
+PDF = b'%PDF-1.4\n' + random.Random(12).randbytes(2_000_000)
+
+def pdf_app(honor_range=True, total=len(PDF)):
+    """Sert PDF par morceaux ; total est la taille annoncée dans Content-Range"""
+    state = {'finished': False, 'done': False}
+
+    async def handler(request):
+        range_header = request.headers.get('Range')
+        try:
+            if range_header and honor_range:
+                start, end = map(int, range_header.removeprefix('bytes=').split('-'))
+                return web.Response(status=206, body=PDF[start:end + 1],
+                                    headers={'Content-Range': f'bytes {start}-{end}/{total}'})
+            response = web.StreamResponse()
+            response.content_length = len(PDF)
+            await response.prepare(request)
+            for i in range(0, len(PDF), 1 << 16):
+                await response.write(PDF[i:i + (1 << 16)])
+                await asyncio.sleep(0.01)
+            state['finished'] = True
+            return response
+        finally:
+            state['done'] = True
+
+    app = web.Application()
+    app.router.add_get('/doc.pdf', handler)
+    return app, state
+
+def probe(server, expected_size=len(PDF)):
+    entries = [{'file': 'doc.pdf', 'url': server.url('/doc.pdf'), 'pdf': {'size': expected_size}}]
+
+    async def run():
+        return [result async for result in verify_urls(entries, probe=range_probe, retries=0)]
+    [result] = asyncio.run(run())
+    return result
+
+def test_pdf_with_range(standin):
+    app, _ = pdf_app()
+    server = standin(app)
+
+    result = probe(server)
+
+    assert 'error' not in result
+    assert result['status'] == 206 and result['range_honored']
+    assert result['kind'] == 'pdf'
+    assert result['served_size'] == len(PDF)
+    assert result['bytes'] == SNIFF_BYTES
+
+def test_range_ignored_reads_only_the_head(standin):
+    app, state = pdf_app(honor_range=False)
+    server = standin(app)
+
+    result = probe(server)
+
+    assert 'error' not in result
+    assert result['status'] == 200 and not result['range_honored']
+    assert result['kind'] == 'pdf'
+    assert result['served_size'] == len(PDF)
+    # Connexion coupée après les premiers octets : le serveur n'a pas pu tout envoyer
+    wait_until(lambda: state['done'])
+    assert not state['finished']
+
+def test_html_error_page(standin):
+    app = web.Application()
+    page = b'<!DOCTYPE html>\n<html><body>Rate limit exceeded</body></html>'
+    app.router.add_get('/doc.pdf', respond(body=page, headers={'Content-Type': 'text/html'}))
+    server = standin(app)
+
+    result = probe(server)
+
+    assert result['kind'] == 'html'
+    assert result['error'] == 'Page HTML servie au lieu du PDF'
+
+def test_content_range_total_differs_from_expected_size(standin):
+    app, _ = pdf_app(total=len(PDF) - 10)
+    server = standin(app)
+
+    result = probe(server)
+
+    assert result['kind'] == 'pdf'
+    assert result['error'] == f'Taille servie {len(PDF) - 10} ≠ taille LFS {len(PDF)}'
+
+def test_check_served_head():
+    assert check_served_head(PDF[:SNIFF_BYTES], len(PDF), len(PDF)) == ('pdf', None)
+    assert check_served_head(b'  \n%PDF-1.7', None, 10) == ('pdf', None)
+    assert check_served_head(b'GIF89a', 6)[0] == 'unknown'
+    assert check_served_head(b'<html><head>', 12)[1] == 'Page HTML servie au lieu du PDF'
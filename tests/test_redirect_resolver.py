@@ -0,0 +1,65 @@
+import os
+import subprocess
+import sys
+
+from aiohttp import web
+
+from redirect_resolver import load_redirect_cache, resolve_manifest_urls, signed_url_expiry
+from standin import respond
+
+def redirect_app():
+    async def moved(request):
+        raise web.HTTPMovedPermanently('/final/a.pdf')
+
+    async def to_cdn(request):
+        raise web.HTTPFound('/cdn/b.pdf')
+
+    async def signed_hop(request):
+        raise web.HTTPFound('/signed/b.pdf?X-Amz-Signature=abc&X-Amz-Expires=300&X-Amz-Date=20260101T000000Z')
+
+    app = web.Application()
+    app.router.add_route('*', '/perm/a.pdf', moved)
+    app.router.add_route('*', '/final/a.pdf', respond(body=b'%PDF'))
+    app.router.add_route('*', '/gh/b.pdf', to_cdn)
+    app.router.add_route('*', '/cdn/b.pdf', signed_hop)
+    app.router.add_route('*', '/signed/b.pdf', respond(body=b'%PDF'))
+    app.router.add_route('*', '/direct/c.pdf', respond(body=b'%PDF'))
+    app.router.add_route('*', '/broken/d.pdf', respond(404))
+    return app
+
+def manifest_for(server, paths):
+    pdfs = [{'name': path.rsplit('/', 1)[1], 'url': server.url(path), 'immutable': True} for path in paths]
+    return {'filieres': [{'name': 'f', 'semestres': [{'name': 's', 'matieres': [{'name': 'm', 'pdfs': pdfs}]}]}]}
+
+def test_direct_url_is_noted_without_touching_url(standin, tmp_path):
+    server = standin(redirect_app())
+    paths = ['/perm/a.pdf', '/gh/b.pdf', '/direct/c.pdf', '/broken/d.pdf']
+    manifest = manifest_for(server, paths)
+    cache_path = str(tmp_path / 'redirects.json')
+
+    resolved, annotated = resolve_manifest_urls(manifest, cache_path)
+
+    pdfs = manifest['filieres'][0]['semestres'][0]['matieres'][0]['pdfs']
+    # L'application n'ouvre que "url" : elle ne change jamais
+    assert [pdf['url'] for pdf in pdfs] == [server.url(path) for path in paths]
+    assert all(pdf['immutable'] for pdf in pdfs)
+    assert resolved == 4 and annotated == 2
+    assert pdfs[0]['direct_url'] == server.url('/final/a.pdf')
+    # Chaîne qui finit signée : on s'arrête au dernier saut non signé
+    assert pdfs[1]['direct_url'] == server.url('/cdn/b.pdf')
+    assert 'direct_url' not in pdfs[2] and 'direct_url' not in pdfs[3]
+
+    # Deuxième passage : tout vient du cache
+    assert resolve_manifest_urls(manifest_for(server, paths), cache_path)[0] == 0
+    assert set(load_redirect_cache(cache_path)) == {server.url(path) for path in paths}
+
+def test_signed_url_expiry():
+    assert signed_url_expiry('https://x/a.pdf') is None
+    assert signed_url_expiry('https://x/a.pdf?token=abc') == 0
+    assert signed_url_expiry('https://x/a?X-Amz-Date=20260101T000000Z&X-Amz-Expires=60&X-Amz-Signature=s') == 1767225660
+
+def test_manifest_generation_does_not_need_aiohttp():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = "import sys, generate_github_manifest_final, test_lfs_url; print('aiohttp' in sys.modules)"
+    output = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == 'False'
@@ -0,0 +1,78 @@
+import json
+import os
+import random
+import subprocess
+import sys
+
+from aiohttp import web
+
+from verify_github_urls import PROBES
+from verify_github_urls_final import SAMPLE_MODES, check_sample, stratified_estimate, stratified_order, wilson_interval
+
+def test_unsampled_strata_do_not_bias_the_estimate_low():
+    sizes = {'a': 100, 'b': 900}
+    # Seule la petite strate est tirée, avec 50 % d'échecs
+    assert stratified_estimate(sizes, {'a': 10}, {'a': 5}) == 0.5
+
+def test_estimate_weights_strata_by_size():
+    sizes = {'a': 100, 'b': 300}
+    assert stratified_estimate(sizes, {'a': 10, 'b': 10}, {'a': 10}) == 0.25
+    assert stratified_estimate(sizes, {}, {}) == 0.0
+
+def test_stratified_prefix_covers_strata_proportionally():
+    entries = [{'filiere': f, 'semestre': 's1', 'pdf': {}} for f in ['a'] * 30 + ['b'] * 60 + ['c'] * 10]
+    order, sizes = stratified_order(entries, random.Random(1))
+
+    prefix = [entry['filiere'] for entry in order[:10]]
+    assert sorted(set(prefix)) == ['a', 'b', 'c']
+    assert prefix.count('b') == 6
+
+def test_wilson_interval_shrinks_to_the_rate_on_full_population():
+    assert wilson_interval(0.1, 50, 50, 1.96) == (0.1, 0.1)
+    low, high = wilson_interval(0.0, 100, 10_000, 1.96)
+    assert low == 0.0 and 0 < high < 0.05
+
+def test_modes_match_the_verifier_probes():
+    assert set(SAMPLE_MODES) == set(PROBES)
+
+def test_quick_check_does_not_import_aiohttp():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = "import sys, verify_github_urls_final; print('aiohttp' in sys.modules)"
+    output = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == 'False'
+
+def sample_manifest(server, tmp_path, broken):
+    filieres = []
+    for name in ('a', 'b', 'c', 'd'):
+        pdfs = [{'name': f'{i}.pdf', 'url': server.url(f'/{name if name in broken else "ok"}/{i}.pdf')}
+                for i in range(50)]
+        filieres.append({'name': name, 'semestres': [{'name': 's1', 'matieres': [{'name': 'm', 'pdfs': pdfs}]}]})
+    path = tmp_path / 'online.json'
+    path.write_text(json.dumps({'filieres': filieres}))
+    return str(path)
+
+def gate_app():
+    async def handler(request):
+        return web.Response(status=200 if request.path.startswith('/ok/') else 404)
+    app = web.Application()
+    app.router.add_route('*', '/{tail:.*}', handler)
+    return app
+
+def test_gate_fails_when_a_stratum_is_broken(standin, tmp_path):
+    server = standin(gate_app())
+    passed, rate, (low, high), failures = check_sample(
+        manifest_path=sample_manifest(server, tmp_path, broken={'d'}), max_failure_rate=0.05,
+        min_sample=8, batch=8, seed=1, retries=0)
+
+    assert not passed
+    assert low > 0.05
+    assert failures
+
+def test_gate_passes_early_on_a_healthy_manifest(standin, tmp_path):
+    server = standin(gate_app())
+    passed, rate, _, failures = check_sample(
+        manifest_path=sample_manifest(server, tmp_path, broken=set()), max_failure_rate=0.05,
+        min_sample=30, batch=16, seed=1, retries=0)
+
+    assert passed and rate == 0.0 and not failures
+    assert server.count() < 200
@@ -0,0 +1,59 @@
+import asyncio
+
+from aiohttp import web
+
+from verification_cache import VerificationCache
+from verify_github_urls import cached_probe, head_probe, verify_urls
+
+def run(server, cache):
+    entries = [{'file': 'a.pdf', 'url': server.url('/a.pdf'), 'pdf': {'sha256': 'a' * 64}}]
+    probe = cached_probe(head_probe, cache, 'head')
+
+    async def collect():
+        return [result async for result in verify_urls(entries, probe=probe, retries=0)]
+    [result] = asyncio.run(collect())
+    return result
+
+def switchable_app(state):
+    async def handler(request):
+        return web.Response(status=state['status'], headers={'ETag': '"v1"'})
+    app = web.Application()
+    app.router.add_route('*', '/a.pdf', handler)
+    return app
+
+def test_fresh_success_is_reused_without_request(standin, tmp_path):
+    server = standin(switchable_app({'status': 200}))
+    with VerificationCache(str(tmp_path / 'cache.sqlite')) as cache:
+        first = run(server, cache)
+        second = run(server, cache)
+
+    assert first['status'] == 200 and not first.get('cached')
+    assert second['status'] == 200 and second['cached']
+    assert server.count('/a.pdf') == 1
+
+def test_http_error_is_probed_again(standin, tmp_path):
+    state = {'status': 404}
+    server = standin(switchable_app(state))
+    with VerificationCache(str(tmp_path / 'cache.sqlite')) as cache:
+        first = run(server, cache)
+        state['status'] = 200
+        second = run(server, cache)
+
+    assert first['error'] == 'HTTP 404'
+    assert second['status'] == 200 and 'error' not in second and not second.get('cached')
+    assert server.count('/a.pdf') == 2
+
+def test_stale_result_is_revalidated(standin, tmp_path):
+    async def handler(request):
+        if request.headers.get('If-None-Match') == '"v1"':
+            return web.Response(status=304, headers={'ETag': '"v1"'})
+        return web.Response(headers={'ETag': '"v1"'})
+    app = web.Application()
+    app.router.add_route('*', '/a.pdf', handler)
+    server = standin(app)
+    with VerificationCache(str(tmp_path / 'cache.sqlite'), ttl=0) as cache:
+        run(server, cache)
+        second = run(server, cache)
+
+    assert second['status'] == 200 and second['revalidated']
+    assert server.requests[1][2].get('If-None-Match') == '"v1"'
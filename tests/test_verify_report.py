@@ -0,0 +1,66 @@
+import json
+import xml.etree.ElementTree as ET
+
+from verify_report import VerificationReport, percentile
+
+def result(i, filiere='gc', host='media.example', error=None, **extra):
+    outcome = {'filiere': filiere, 'semestre': 's1', 'matiere': 'm', 'file': f'f{i}.pdf',
+               'url': f'https://{host}/f{i}.pdf', 'status': 200, 'latency': i / 1000, 'bytes': 10,
+               'pdf': {'name': f'f{i}.pdf'}, **extra}
+    if error:
+        outcome['error'] = error
+    return outcome
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert [percentile(values, q) for q in (50, 95, 99)] == [50, 95, 99]
+    assert percentile([7], 99) == 7
+    assert percentile([], 50) is None
+
+def test_latency_percentiles_per_filiere():
+    report = VerificationReport()
+    for i in range(1, 101):
+        report.add(result(i))
+    # Résultat servi par le cache : compté, mais sans latence
+    report.add(result(5000, cached=True))
+
+    stats = report.summary(elapsed=2.0)['filieres']['gc']
+
+    assert stats['requests'] == 101
+    assert (stats['p50'], stats['p95'], stats['p99']) == (0.05, 0.095, 0.099)
+    assert stats['requests_per_s'] == 50.5
+
+def test_shared_probe_counts_once_per_host():
+    report = VerificationReport()
+    # Trois entrées du même contenu : une seule requête envoyée, pour f1
+    probed = 'https://media.example/f1.pdf'
+    for i in (1, 2, 3):
+        report.add(result(i, probed_url=probed))
+    report.add(result(4, host='raw.example'))
+
+    summary = report.summary(elapsed=1.0)
+
+    assert summary['hosts']['media.example']['requests'] == 1
+    assert summary['hosts']['media.example']['bytes'] == 10
+    assert summary['hosts']['raw.example']['requests'] == 1
+    assert summary['filieres']['gc']['requests'] == 4
+
+def test_junit_and_jsonl_outputs(tmp_path):
+    jsonl, junit = tmp_path / 'report.jsonl', tmp_path / 'report.xml'
+    report = VerificationReport(str(jsonl), str(junit))
+    report.add(result(1))
+    report.add(result(2, error='HTTP 404'))
+    report.add(result(3, filiere='info', error='Timeout'))
+    report.add(result(4, filiere='info'))
+    report.close(elapsed=1.5)
+
+    root = ET.parse(junit).getroot()
+    assert (root.get('tests'), root.get('failures')) == ('4', '2')
+    suites = {suite.get('name'): suite for suite in root.iter('testsuite')}
+    assert {name: suite.get('failures') for name, suite in suites.items()} == {'gc': '1', 'info': '1'}
+    [failure] = suites['gc'].iter('failure')
+    assert failure.get('message') == 'HTTP 404' and failure.text == 'https://media.example/f2.pdf'
+
+    lines = [json.loads(line) for line in jsonl.read_text(encoding='utf-8').splitlines()]
+    assert [line['type'] for line in lines] == ['result'] * 4 + ['summary']
+    assert 'pdf' not in lines[0]
@@ -0,0 +1,111 @@
+import asyncio
+import time
+
+from aiohttp import web
+
+from standin import respond
+from verify_github_urls import head_probe, range_probe, verify_urls
+
+def collect(entries, **kwargs):
+    """Résultats de verify_urls dans l'ordre où ils sont produits, avec leur instant d'arrivée"""
+    async def run():
+        start = time.perf_counter()
+        return [(result, time.perf_counter() - start) async for result in verify_urls(entries, **kwargs)]
+    return asyncio.run(run())
+
+def entries_for(server, paths):
+    return [{'file': path, 'url': server.url(path)} for path in paths]
+
+def slow_app(delay):
+    async def handler(request):
+        await asyncio.sleep(delay)
+        return web.Response(body=b'%PDF-1.4')
+    app = web.Application()
+    app.router.add_route('*', '/{name}', handler)
+    return app
+
+def test_global_concurrency_is_bounded(standin):
+    server = standin(slow_app(0.1))
+    results = collect(entries_for(server, [f'/f{i}' for i in range(16)]), concurrency=4, per_host=8)
+
+    assert len(results) == 16
+    assert all(result['status'] == 200 for result, _ in results)
+    assert server.max_active == 4
+
+def test_per_host_limit(standin):
+    server = standin(slow_app(0.1))
+    results = collect(entries_for(server, [f'/f{i}' for i in range(12)]), concurrency=32, per_host=3)
+
+    assert all(result['status'] == 200 for result, _ in results)
+    assert server.max_active == 3
+
+def test_timeout_is_reported(standin):
+    server = standin(slow_app(2))
+    [(result, elapsed)] = collect(entries_for(server, ['/lent']), timeout=0.2, retries=0)
+
+    assert result['status'] is None
+    assert result['error'].startswith('Timeout')
+    assert elapsed < 1.5
+
+def test_results_stream_as_they_complete(standin):
+    async def handler(request):
+        await asyncio.sleep(float(request.query['delay']))
+        return web.Response()
+    app = web.Application()
+    app.router.add_route('*', '/f', handler)
+    server = standin(app)
+    entries = [{'file': name, 'url': server.url(f'/f?delay={delay}')}
+               for name, delay in (('lent', 0.6), ('moyen', 0.3), ('rapide', 0.05))]
+
+    results = collect(entries, concurrency=3)
+
+    assert [result['file'] for result, _ in results] == ['rapide', 'moyen', 'lent']
+    # Le premier résultat arrive sans attendre le plus lent
+    assert results[0][1] < 0.3
+
+def test_404_is_an_error_and_not_retried(standin):
+    app = web.Application()
+    app.router.add_route('*', '/absent', respond(404))
+    server = standin(app)
+
+    [(result, _)] = collect(entries_for(server, ['/absent']), retries=3)
+
+    assert result['status'] == 404
+    assert result['error'] == 'HTTP 404'
+    assert result['attempts'] == 1
+    assert server.count('/absent') == 1
+
+def test_server_errors_are_retried(standin):
+    calls = []
+    async def flaky(request):
+        calls.append(request.path)
+        return web.Response(status=500 if len(calls) == 1 else 200)
+    app = web.Application()
+    app.router.add_route('*', '/instable', flaky)
+    server = standin(app)
+
+    [(result, _)] = collect(entries_for(server, ['/instable']), retries=2)
+
+    assert result['status'] == 200
+    assert 'error' not in result
+    assert result['attempts'] == 2
+
+def test_range_probe_detects_lfs_pointer(standin):
+    pointer = (b"version https://git-lfs.github.com/spec/v1\n"
+               b"oid sha256:" + b"a" * 64 + b"\nsize 12345\n")
+    app = web.Application()
+    app.router.add_get('/pointeur.pdf', respond(body=pointer))
+    server = standin(app)
+    entries = [{'file': 'pointeur.pdf', 'url': server.url('/pointeur.pdf'), 'pdf': {'size': 12345}}]
+
+    [(result, _)] = collect(entries, probe=range_probe)
+
+    assert result['kind'] == 'pointer'
+    assert 'error' in result
+
+def test_head_probe_uses_head(standin):
+    server = standin(slow_app(0))
+    collect(entries_for(server, ['/f']), probe=head_probe)
+
+    assert server.count('/f', 'HEAD') == 1
+    assert server.count('/f', 'GET') == 0
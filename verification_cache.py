@@ -0,0 +1,97 @@
+import json
+import sqlite3
+import time
+
+CACHE_PATH = '.verify_cache.sqlite'
+
+# Un résultat valide est réutilisé sans requête pendant ce délai
+DEFAULT_TTL = 3 * 24 * 3600
+
+class VerificationCache:
+    """Résultats de vérification persistants, indexés par URL + oid + mode
+
+    Un résultat frais (200 ou 206 sans erreur, vérifié depuis moins de ttl secondes)
+    est réutilisé tel quel. Un résultat périmé fournit son ETag et son
+    Last-Modified pour une revalidation conditionnelle (304).
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self.pending = 0
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                url TEXT NOT NULL,
+                oid TEXT NOT NULL,
+                mode TEXT NOT NULL,
+                status INTEGER,
+                error TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                latency REAL,
+                checked_at REAL NOT NULL,
+                outcome TEXT NOT NULL,
+                PRIMARY KEY (url, oid, mode)
+            )
+        """)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, url, oid, mode):
+        row = self.db.execute(
+            "SELECT status, error, etag, last_modified, latency, checked_at, outcome "
+            "FROM results WHERE url = ? AND oid = ? AND mode = ?",
+            (url, oid or '', mode)
+        ).fetchone()
+        if row is None:
+            return None
+        keys = ('status', 'error', 'etag', 'last_modified', 'latency', 'checked_at', 'outcome')
+        record = dict(zip(keys, row))
+        record['outcome'] = json.loads(record['outcome'])
+        return record
+
+    def is_fresh(self, record, now=None):
+        now = time.time() if now is None else now
+        # Les sondes ne posent pas d'erreur sur un 4xx : c'est le statut qui compte
+        return (record['error'] is None and record['status'] in (200, 206)
+                and now - record['checked_at'] < self.ttl)
+
+    def validators(self, record):
+        """En-têtes de revalidation conditionnelle d'un résultat périmé"""
+        headers = {}
+        if record['etag']:
+            headers['If-None-Match'] = record['etag']
+        if record['last_modified']:
+            headers['If-Modified-Since'] = record['last_modified']
+        return headers
+
+    def put(self, url, oid, mode, outcome):
+        self.db.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (url, oid or '', mode, outcome.get('status'), outcome.get('error'), outcome.get('etag'),
+             outcome.get('last_modified'), outcome.get('latency'), time.time(), json.dumps(outcome))
+        )
+        self._maybe_commit()
+
+    def touch(self, url, oid, mode):
+        """Marque un résultat comme revérifié (réponse 304)"""
+        self.db.execute(
+            "UPDATE results SET checked_at = ? WHERE url = ? AND oid = ? AND mode = ?",
+            (time.time(), url, oid or '', mode)
+        )
+        self._maybe_commit()
+
+    def _maybe_commit(self):
+        self.pending += 1
+        if self.pending >= 100:
+            self.db.commit()
+            self.pending = 0
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
@@ -1,51 +1,371 @@
+import argparse
+import asyncio
+import hashlib
 import json
-import requests
+import time
+from functools import partial
+from urllib.parse import urlsplit
 
-def verify_github_urls():
+import aiohttp
+
+from host_throttle import (RETRYABLE_STATUSES, THROTTLE_STATUSES, CircuitOpenError, HostThrottle,
+                           backoff_delay, parse_retry_after)
+from lfs_pointer import SNIFF_BYTES, check_served_head, parse_content_range_start, parse_content_range_total
+from verification_cache import CACHE_PATH, DEFAULT_TTL, VerificationCache
+from verify_report import VerificationReport
+
+MANIFEST_PATH = 'assets/resources_manifest_online.json'
+
+def iter_manifest_pdfs(manifest):
+    """Parcourt les PDFs du manifeste en ligne avec leur position"""
+    for filiere in manifest['filieres']:
+        for semestre in filiere['semestres']:
+            for matiere in semestre['matieres']:
+                for pdf in matiere['pdfs']:
+                    yield {
+                        'filiere': filiere['name'],
+                        'semestre': semestre['name'],
+                        'matiere': matiere['name'],
+                        'file': pdf['name'],
+                        'url': pdf['url'],
+                        'pdf': pdf
+                    }
+
+def _response_headers(response):
+    """ETag et Last-Modified (revalidation ultérieure), Retry-After s'il est présent"""
+    headers = {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified')}
+    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+    if retry_after is not None:
+        headers['retry_after'] = retry_after
+    return headers
+
+async def head_probe(session, entry, timeout):
+    """Vérifie une URL par une requête HEAD"""
+    async with session.head(entry['url'], headers=entry.get('validators'),
+                            timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+        return {'status': response.status, **_response_headers(response)}
+
+async def range_probe(session, entry, timeout):
+    """Lit seulement les premiers octets (Range) pour reconnaître le contenu servi
+    
+    Un serveur qui ignore Range répond 200 avec le fichier entier : on lit
+    alors les mêmes octets puis on coupe la connexion sans tout télécharger.
+    """
+    headers = {'Range': f'bytes=0-{SNIFF_BYTES - 1}', **entry.get('validators', {})}
+    async with session.get(entry['url'], headers=headers,
+                           timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+        if response.status not in (200, 206):
+            return {'status': response.status, **_response_headers(response)}
+        
+        try:
+            head = await response.content.readexactly(SNIFF_BYTES)
+        except asyncio.IncompleteReadError as e:
+            head = e.partial
+        
+        if response.status == 206:
+            served_size = parse_content_range_total(response.headers.get('Content-Range'))
+        else:
+            served_size = response.content_length
+            response.close()
+        
+        kind, error = check_served_head(head, served_size, entry.get('pdf', {}).get('size'))
+        outcome = {
+            'status': response.status,
+            **_response_headers(response),
+            'kind': kind,
+            'served_size': served_size,
+            'bytes': len(head),
+            'range_honored': response.status == 206
+        }
+        if error:
+            outcome['error'] = error
+        return outcome
+
+class BandwidthLimiter:
+    """Seau à jetons partagé : plafonne le débit global en octets par seconde"""
+    
+    def __init__(self, rate):
+        self.rate = rate
+        self.allowance = rate
+        self.last = time.monotonic()
+        self.lock = asyncio.Lock()
+    
+    async def consume(self, amount):
+        # Le verrou est gardé pendant l'attente : les téléchargements se
+        # partagent le débit au lieu de se doubler
+        async with self.lock:
+            now = time.monotonic()
+            self.allowance = min(self.rate, self.allowance + (now - self.last) * self.rate)
+            self.last = now
+            self.allowance -= amount
+            if self.allowance < 0:
+                await asyncio.sleep(-self.allowance / self.rate)
+
+async def deep_probe(session, entry, timeout, limiter=None, chunk_size=1 << 16, max_resumes=3):
+    """Télécharge le contenu en flux et compare son sha256 à l'oid LFS
+    
+    Le corps n'est jamais gardé en mémoire : chaque bloc alimente le hash.
+    Un transfert coupé reprend là où il s'est arrêté grâce à Range.
+    """
+    pdf = entry.get('pdf', {})
+    expected_sha256 = pdf.get('sha256') or pdf.get('oid')
+    expected_size = pdf.get('size')
+    # Pas de délai global : seules les connexions et lectures bloquées expirent
+    client_timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+    
+    digest = hashlib.sha256()
+    received = 0
+    resumes = 0
+    status = None
+    while True:
+        headers = {'Range': f'bytes={received}-'} if received else entry.get('validators', {})
+        try:
+            async with session.get(entry['url'], headers=headers, timeout=client_timeout) as response:
+                if status is None:
+                    status = response.status
+                    first_headers = _response_headers(response)
+                if not received and response.status != 200:
+                    return {'status': response.status, **_response_headers(response)}
+                if received and response.status == 200:
+                    # Reprise ignorée par le serveur : on repart de zéro
+                    digest = hashlib.sha256()
+                    received = 0
+                elif received and (response.status != 206 or
+                                   parse_content_range_start(response.headers.get('Content-Range')) != received):
+                    return {'status': response.status, 'error': f"Reprise impossible à l'octet {received}"}
+                
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    if limiter is not None:
+                        await limiter.consume(len(chunk))
+                    digest.update(chunk)
+                    received += len(chunk)
+            break
+        except (aiohttp.ClientPayloadError, aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if not received or resumes >= max_resumes:
+                raise
+            resumes += 1
+    
+    served_sha256 = digest.hexdigest()
+    outcome = {'status': status, **first_headers, 'served_sha256': served_sha256, 'bytes': received, 'resumes': resumes}
+    if expected_size is not None and received != expected_size:
+        outcome['error'] = f"Taille reçue {received} ≠ taille LFS {expected_size}"
+    elif expected_sha256 and served_sha256 != expected_sha256:
+        outcome['error'] = f"sha256 {served_sha256[:12]}… ≠ oid {expected_sha256[:12]}…"
+    return outcome
+
+PROBES = {'head': head_probe, 'range': range_probe, 'deep': deep_probe}
+
+def cached_probe(probe, cache, mode):
+    """Enveloppe une sonde avec le cache de résultats persistant
+    
+    Les résultats frais sont renvoyés sans requête ; les périmés sont
+    revalidés par requête conditionnelle, et un 304 réutilise le résultat
+    stocké. Les erreurs de transport ne sont jamais mises en cache.
+    """
+    async def probe_with_cache(session, entry, timeout):
+        oid = entry.get('pdf', {}).get('oid') or entry.get('pdf', {}).get('sha256')
+        record = cache.get(entry['url'], oid, mode)
+        if record is not None and cache.is_fresh(record):
+            return {**record['outcome'], 'cached': True}
+        
+        if record is not None:
+            entry = {**entry, 'validators': cache.validators(record)}
+        start = time.perf_counter()
+        outcome = await probe(session, entry, timeout)
+        outcome['latency'] = time.perf_counter() - start
+        
+        if outcome['status'] == 304 and record is not None:
+            cache.touch(entry['url'], oid, mode)
+            return {**record['outcome'], 'latency': outcome['latency'], 'revalidated': True}
+        # Une surcharge passagère ne remplace pas le dernier résultat connu
+        if outcome['status'] not in RETRYABLE_STATUSES:
+            cache.put(entry['url'], oid, mode, outcome)
+        return outcome
+    
+    return probe_with_cache
+
+async def verify_urls(entries, probe=head_probe, concurrency=32, per_host=8, timeout=10, retries=4):
+    """Vérifie les URLs en parallèle et renvoie les résultats au fil de l'eau
+    
+    La concurrence est bornée globalement (nombre de workers) et par hôte,
+    où elle s'adapte aux signaux de surcharge (429, 503, Retry-After). Les
+    surcharges, erreurs 5xx et erreurs réseau sont réessayées jusqu'à
+    retries fois avec une attente exponentielle, sans bloquer de worker.
+    Les connexions sont gardées ouvertes et réutilisées, et les résolutions
+    DNS sont mises en cache pour toute la durée de la vérification.
+    """
+    queue = asyncio.Queue()
+    for entry in entries:
+        queue.put_nowait((entry, 0))
+    remaining = queue.qsize()
+    results = asyncio.Queue()
+    throttles = {}
+    loop = asyncio.get_running_loop()
+    
+    connector = aiohttp.TCPConnector(
+        limit=concurrency,
+        limit_per_host=per_host,
+        ttl_dns_cache=3600,
+        keepalive_timeout=30
+    )
+    
+    def finish(result):
+        nonlocal remaining
+        results.put_nowait(result)
+        remaining -= 1
+        if not remaining:
+            for _ in range(concurrency):
+                queue.put_nowait(None)
+    
+    async def worker(session):
+        while (item := await queue.get()) is not None:
+            entry, attempt = item
+            host = urlsplit(entry['url']).netloc
+            throttle = throttles.setdefault(host, HostThrottle(per_host))
+            try:
+                ticket = await throttle.acquire()
+            except CircuitOpenError:
+                finish({**entry, 'status': None, 'error': f"Circuit ouvert : {host} ne répond plus",
+                        'attempts': attempt, 'entry': entry})
+                continue
+            
+            # Le délai ne court qu'une fois la place obtenue
+            start = time.perf_counter()
+            try:
+                outcome = await probe(session, entry, timeout)
+            except asyncio.TimeoutError:
+                outcome = {'status': None, 'error': f'Timeout après {timeout}s'}
+            except aiohttp.ClientError as e:
+                outcome = {'status': None, 'error': str(e) or type(e).__name__}
+            outcome.setdefault('latency', time.perf_counter() - start)
+            
+            status = outcome['status']
+            retry_after = outcome.get('retry_after')
+            if status in THROTTLE_STATUSES:
+                await throttle.release(ticket, 'throttled', retry_after)
+            elif status is None or status in RETRYABLE_STATUSES:
+                await throttle.release(ticket, 'failed', retry_after)
+            else:
+                await throttle.release(ticket, 'ok')
+            
+            if (status is None or status in RETRYABLE_STATUSES) and attempt < retries:
+                # Remis en file après l'attente ; le worker passe à la suite
+                delay = retry_after if retry_after is not None else backoff_delay(attempt)
+                loop.call_later(delay, queue.put_nowait, (entry, attempt + 1))
+                continue
+            
+            if status is not None and status not in (200, 206) and 'error' not in outcome:
+                outcome['error'] = f"HTTP {status}"
+            finish({**entry, **outcome, 'attempts': attempt + 1, 'entry': entry})
+    
+    if not remaining:
+        return
+    async with aiohttp.ClientSession(connector=connector) as session:
+        workers = [asyncio.create_task(worker(session)) for _ in range(concurrency)]
+        
+        async def close_when_done():
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                await results.put(None)
+        
+        finished = asyncio.create_task(close_when_done())
+        try:
+            while (result := await results.get()) is not None:
+                yield result
+            await finished
+        finally:
+            for task in workers:
+                task.cancel()
+
+def group_key(entry):
+    """Clé de regroupement : oid LFS (ou sha256), à défaut l'URL"""
+    pdf = entry.get('pdf', {})
+    return pdf.get('oid') or pdf.get('sha256') or entry['url']
+
+def group_entries(entries, key=group_key):
+    """Regroupe les entrées qui désignent le même contenu"""
+    groups = {}
+    for entry in entries:
+        groups.setdefault(key(entry), []).append(entry)
+    return groups
+
+async def verify_grouped(groups, **kwargs):
+    """Sonde un représentant par groupe et répercute le résultat à tout le groupe"""
+    representatives = {id(members[0]): members for members in groups.values()}
+    
+    async for result in verify_urls((members[0] for members in groups.values()), **kwargs):
+        members = representatives[id(result['entry'])]
+        outcome = {k: v for k, v in result.items() if k not in members[0] and k != 'entry'}
+        for member in members:
+            yield {**member, **outcome, 'probed_url': members[0]['url'], 'shared': len(members) > 1}
+
+async def verify_github_urls_async(manifest_path=MANIFEST_PATH, concurrency=32, per_host=8, timeout=10,
+                                   dedupe=True, mode='head', bandwidth=None, cache_path=CACHE_PATH,
+                                   cache_ttl=DEFAULT_TTL, retries=4, jsonl_path=None, junit_path=None):
     """Vérifie que toutes les URLs GitHub sont accessibles"""
     
-    with open('assets/resources_manifest_online.json', 'r', encoding='utf-8') as f:
+    with open(manifest_path, 'r', encoding='utf-8') as f:
         manifest = json.load(f)
     
     print("🔍 Vérification des URLs GitHub...")
     
     accessible = 0
     errors = []
+    start = time.perf_counter()
     
-    for filiere in manifest['filieres']:
-        print(f"\n📚 Filière: {filiere['name']}")
-        
-        for semestre in filiere['semestres']:
-            print(f"  📅 Semestre: {semestre['name']}")
-            
-            for matiere in semestre['matieres']:
-                print(f"    📖 Matière: {matiere['name']}")
-                
-                for pdf in matiere['pdfs']:
-                    url = pdf['url']
-                    try:
-                        response = requests.head(url, timeout=10)
-                        if response.status_code == 200:
-                            print(f"      ✅ {pdf['name']}")
-                            accessible += 1
-                        else:
-                            print(f"      ❌ {pdf['name']} - HTTP {response.status_code}")
-                            errors.append({
-                                'file': pdf['name'],
-                                'url': url,
-                                'error': f'HTTP {response.status_code}'
-                            })
-                    except Exception as e:
-                        print(f"      ❌ {pdf['name']} - {str(e)}")
-                        errors.append({
-                            'file': pdf['name'],
-                            'url': url,
-                            'error': str(e)
-                        })
+    probe = PROBES[mode]
+    if mode == 'deep' and bandwidth:
+        probe = partial(deep_probe, limiter=BandwidthLimiter(bandwidth))
+    cache = VerificationCache(cache_path, cache_ttl) if cache_path else None
+    if cache is not None:
+        probe = cached_probe(probe, cache, mode)
+    options = {'probe': probe, 'concurrency': concurrency, 'per_host': per_host, 'timeout': timeout,
+               'retries': retries}
+    
+    if dedupe:
+        # Un même contenu copié dans plusieurs filières n'est sondé qu'une fois
+        groups = group_entries(iter_manifest_pdfs(manifest))
+        total = sum(len(members) for members in groups.values())
+        print(f"🔗 {total} entrées → {len(groups)} contenus distincts à sonder")
+    else:
+        groups = group_entries(iter_manifest_pdfs(manifest), key=id)
+    
+    report = VerificationReport(jsonl_path, junit_path)
+    cached = revalidated = retried = 0
+    try:
+        async for result in verify_grouped(groups, **options):
+            report.add(result)
+            cached += result.get('cached', False)
+            revalidated += result.get('revalidated', False)
+            retried += result.get('attempts', 1) > 1
+            accessible, errors = _report(result, accessible, errors)
+    finally:
+        if cache is not None:
+            cache.close()
+    
+    elapsed = time.perf_counter() - start
+    summary = report.close(elapsed)
     
     print(f"\n📊 RÉSULTATS:")
     print(f"   ✅ {accessible} fichiers accessibles")
     print(f"   ❌ {len(errors)} fichiers avec erreurs")
+    if cache is not None:
+        print(f"   💾 {cached} réutilisés depuis le cache, {revalidated} revalidés (304)")
+    if retried:
+        print(f"   🔁 {retried} fichiers vérifiés après plusieurs tentatives")
+    print(f"   ⏱️  {elapsed:.1f} s")
+    
+    print(f"\n📈 Latences (p50 / p95 / p99):")
+    for kind, groups in (('hôte', summary['hosts']), ('filière', summary['filieres'])):
+        for name, stats in groups.items():
+            if stats['p50'] is None:
+                continue
+            print(f"   {kind} {name}: {stats['p50'] * 1000:.0f} / {stats['p95'] * 1000:.0f} / "
+                  f"{stats['p99'] * 1000:.0f} ms, {stats['requests_per_s']:.1f} req/s")
+    for path in (jsonl_path, junit_path):
+        if path:
+            print(f"   📝 Rapport: {path}")
     
     if errors:
         print(f"\n🚨 Fichiers avec erreurs:")
@@ -54,6 +374,47 @@ def verify_github_urls():
             print(f"     {error['url']}")
             print(f"     Erreur: {error['error']}")
             print()
+    
+    return accessible, errors
+
+def _report(result, accessible, errors):
+    """Affiche un résultat dès son arrivée et met à jour les compteurs"""
+    where = f"{result['filiere']}/{result['semestre']}/{result['matiere']}"
+    if 'error' not in result:
+        print(f"  ✅ {where}/{result['file']}")
+        accessible += 1
+    else:
+        print(f"  ❌ {where}/{result['file']} - {result['error']}")
+        errors.append(result)
+    return accessible, errors
+
+def verify_github_urls(**kwargs):
+    """Point d'entrée synchrone de la vérification"""
+    return asyncio.run(verify_github_urls_async(**kwargs))
 
 if __name__ == "__main__":
-    verify_github_urls()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Vérification des URLs du manifeste en ligne")
+    parser.add_argument("--manifest", default=MANIFEST_PATH)
+    parser.add_argument("--concurrency", type=int, default=32, help="requêtes simultanées au total")
+    parser.add_argument("--per-host", type=int, default=8, help="requêtes simultanées par hôte")
+    parser.add_argument("--timeout", type=float, default=10, help="délai par requête (s)")
+    parser.add_argument("--per-entry", action="store_true", help="sonder chaque entrée, même si son contenu est partagé")
+    parser.add_argument("--mode", choices=sorted(PROBES), default="head",
+                        help="head : statut HTTP ; range : premiers octets (pointeur LFS, PDF, HTML) et taille ; "
+                             "deep : téléchargement complet et sha256 comparé à l'oid")
+    parser.add_argument("--bandwidth", type=int, help="débit global maximal en octets/s (mode deep)")
+    parser.add_argument("--cache", default=CACHE_PATH, help="base SQLite des résultats précédents")
+    parser.add_argument("--no-cache", action="store_true", help="tout revérifier sans lire ni écrire le cache")
+    parser.add_argument("--cache-ttl", type=float, default=DEFAULT_TTL / 3600,
+                        help="durée (h) pendant laquelle un résultat valide est réutilisé sans requête")
+    parser.add_argument("--retries", type=int, default=4,
+                        help="nouvelles tentatives après une surcharge (429/503), une erreur 5xx ou réseau")
+    parser.add_argument("--jsonl", help="rapport JSON Lines (un résultat par ligne, puis les statistiques)")
+    parser.add_argument("--junit", help="rapport JUnit XML (une suite par filière)")
+    args = parser.parse_args()
+    
+    verify_github_urls(manifest_path=args.manifest, concurrency=args.concurrency,
+                       per_host=args.per_host, timeout=args.timeout, dedupe=not args.per_entry,
+                       mode=args.mode, bandwidth=args.bandwidth,
+                       cache_path=None if args.no_cache else args.cache, cache_ttl=args.cache_ttl * 3600,
+                       retries=args.retries, jsonl_path=args.jsonl, junit_path=args.junit)
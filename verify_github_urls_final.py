@@ -1,9 +1,18 @@
+import argparse
+import asyncio
 import json
+import math
+import random
+import sys
+from statistics import NormalDist
+
+MANIFEST_PATH = 'assets/resources_manifest_online.json'
+SAMPLE_MODES = ('head', 'range', 'deep')
 
 def check_manifest_urls():
     """Vérifie rapidement les URLs dans le manifeste généré"""
     
-    with open('assets/resources_manifest_online.json', 'r', encoding='utf-8') as f:
+    with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
         manifest = json.load(f)
     
     print("🔍 Vérification rapide des URLs dans le manifeste...")
@@ -35,5 +44,132 @@ def check_manifest_urls():
                     
                     return  # On s'arrête après le premier PDF
 
+def stratum_of(entry):
+    """Strate d'échantillonnage : filière, semestre et source de l'URL"""
+    return (entry['filiere'], entry['semestre'], entry['pdf'].get('source', '?'))
+
+def stratified_order(entries, rng):
+    """Ordonne les entrées pour que tout préfixe soit un échantillon stratifié
+    
+    Chaque strate est mélangée, puis ses éléments sont répartis à intervalles
+    réguliers (rang + aléa) / taille : les k premiers tirages contiennent
+    chaque strate en proportion de sa taille, à un élément près.
+    """
+    strata = {}
+    for entry in entries:
+        strata.setdefault(stratum_of(entry), []).append(entry)
+    keyed = []
+    for members in strata.values():
+        rng.shuffle(members)
+        size = len(members)
+        keyed.extend(((rank + rng.random()) / size, entry) for rank, entry in enumerate(members))
+    keyed.sort(key=lambda item: item[0])
+    return [entry for _, entry in keyed], {name: len(members) for name, members in strata.items()}
+
+def stratified_estimate(sizes, sampled, failed):
+    """Taux d'échec estimé : moyenne des taux par strate pondérés par leur taille
+    
+    Seules les strates déjà tirées comptent, et leurs poids sont renormalisés :
+    une strate pas encore sondée n'est pas comptée comme sans échec.
+    """
+    weights = {name: size for name, size in sizes.items() if sampled.get(name)}
+    total = sum(weights.values())
+    if not total:
+        return 0.0
+    return sum(size / total * failed.get(name, 0) / sampled[name] for name, size in weights.items())
+
+def wilson_interval(rate, n, population, z):
+    """Intervalle de Wilson avec correction de population finie"""
+    if n >= population:
+        return rate, rate
+    # La correction revient à un effectif effectif plus grand
+    n_eff = n * (population - 1) / (population - n)
+    denominator = 1 + z * z / n_eff
+    center = (rate + z * z / (2 * n_eff)) / denominator
+    half = z * math.sqrt(rate * (1 - rate) / n_eff + z * z / (4 * n_eff * n_eff)) / denominator
+    return max(0.0, center - half), min(1.0, center + half)
+
+async def check_sample_async(manifest_path=MANIFEST_PATH, max_failure_rate=0.05, confidence=0.95, margin=0.02,
+                             min_sample=30, max_sample=None, batch=64, seed=None, mode='head', **options):
+    """Vérifie un échantillon stratifié jusqu'à pouvoir conclure
+    
+    Les tirages se font par lots ; après chaque lot, le taux d'échec est
+    estimé avec son intervalle de confiance. On s'arrête dès que la borne
+    supérieure passe sous max_failure_rate (succès), que la borne inférieure
+    la dépasse (échec), ou que l'intervalle est plus étroit que ±margin.
+    """
+    # aiohttp n'est nécessaire qu'ici : la vérification rapide s'en passe
+    from verify_github_urls import PROBES, iter_manifest_pdfs, verify_urls
+    
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    
+    rng = random.Random(seed)
+    order, sizes = stratified_order(list(iter_manifest_pdfs(manifest)), rng)
+    population = len(order)
+    budget = min(population, max_sample or population)
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    
+    print(f"🎲 Échantillonnage stratifié: {population} PDFs, {len(sizes)} strates (filière × semestre × source)")
+    
+    sampled, failed = {}, {}
+    failures = []
+    n = 0
+    rate, low, high = 0.0, 0.0, 1.0
+    while n < budget:
+        chunk = order[n:min(budget, n + max(batch, min_sample - n))]
+        async for result in verify_urls(chunk, probe=PROBES[mode], **options):
+            name = stratum_of(result)
+            sampled[name] = sampled.get(name, 0) + 1
+            if 'error' in result:
+                failed[name] = failed.get(name, 0) + 1
+                failures.append(result)
+        n += len(chunk)
+        
+        rate = stratified_estimate(sizes, sampled, failed)
+        low, high = wilson_interval(rate, n, population, z)
+        print(f"   {n:5d} vérifiés, {len(failures)} en erreur → taux estimé {rate:.1%} "
+              f"[{low:.1%} ; {high:.1%}] à {confidence:.0%}")
+        if n >= min_sample and (high <= max_failure_rate or low > max_failure_rate or (high - low) / 2 <= margin):
+            break
+    
+    passed = high <= max_failure_rate
+    print(f"\n📊 Taux d'échec estimé: {rate:.2%} (IC {confidence:.0%}: {low:.2%} – {high:.2%}), "
+          f"{n}/{population} PDFs vérifiés")
+    for result in failures[:10]:
+        print(f"   ❌ {result['filiere']}/{result['semestre']}/{result['matiere']}/{result['file']} - {result['error']}")
+    if passed:
+        print(f"✅ Taux d'échec inférieur à {max_failure_rate:.0%} avec {confidence:.0%} de confiance")
+    else:
+        print(f"❌ Impossible de garantir un taux d'échec inférieur à {max_failure_rate:.0%}")
+    return passed, rate, (low, high), failures
+
+def check_sample(**kwargs):
+    """Point d'entrée synchrone de la vérification par échantillonnage"""
+    return asyncio.run(check_sample_async(**kwargs))
+
 if __name__ == "__main__":
-    check_manifest_urls()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Vérification rapide du manifeste en ligne")
+    parser.add_argument("--sample", action="store_true",
+                        help="sonder un échantillon stratifié et estimer le taux d'échec (code de sortie 1 si trop élevé)")
+    parser.add_argument("--manifest", default=MANIFEST_PATH)
+    parser.add_argument("--max-failure-rate", type=float, default=0.05, help="taux d'échec toléré")
+    parser.add_argument("--confidence", type=float, default=0.95, help="niveau de confiance de l'intervalle")
+    parser.add_argument("--margin", type=float, default=0.02, help="demi-largeur d'intervalle suffisante pour s'arrêter")
+    parser.add_argument("--min-sample", type=int, default=30)
+    parser.add_argument("--max-sample", type=int, help="nombre maximal de PDFs sondés")
+    parser.add_argument("--batch", type=int, default=64, help="PDFs sondés entre deux estimations")
+    parser.add_argument("--seed", type=int, help="graine du tirage (reproductible)")
+    parser.add_argument("--mode", choices=SAMPLE_MODES, default="head")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--timeout", type=float, default=10)
+    args = parser.parse_args()
+    
+    if not args.sample:
+        check_manifest_urls()
+    else:
+        passed, *_ = check_sample(manifest_path=args.manifest, max_failure_rate=args.max_failure_rate,
+                                  confidence=args.confidence, margin=args.margin, min_sample=args.min_sample,
+                                  max_sample=args.max_sample, batch=args.batch, seed=args.seed, mode=args.mode,
+                                  concurrency=args.concurrency, timeout=args.timeout)
+        sys.exit(0 if passed else 1)
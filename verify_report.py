@@ -0,0 +1,119 @@
+import json
+import math
+import xml.etree.ElementTree as ET
+from urllib.parse import urlsplit
+
+# Champs du résultat qui ne vont pas dans le rapport (entrée brute du manifeste)
+SKIPPED_FIELDS = ('entry', 'pdf')
+
+PERCENTILES = (50, 95, 99)
+
+def percentile(sorted_values, q):
+    """Percentile q (rang le plus proche) d'une liste déjà triée"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+class _Group:
+    __slots__ = ('requests', 'errors', 'bytes', 'latencies')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.bytes = 0
+        self.latencies = []
+
+    def summary(self, elapsed):
+        latencies = sorted(self.latencies)
+        stats = {'requests': self.requests, 'errors': self.errors, 'bytes': self.bytes}
+        for q in PERCENTILES:
+            stats[f'p{q}'] = percentile(latencies, q)
+        stats['requests_per_s'] = self.requests / elapsed if elapsed else None
+        stats['bytes_per_s'] = self.bytes / elapsed if elapsed else None
+        return stats
+
+class VerificationReport:
+    """Rapport de vérification : JSON Lines au fil de l'eau, JUnit XML à la fin
+
+    Chaque résultat est écrit immédiatement dans un fichier à grand tampon
+    et n'alimente que des compteurs ; les percentiles et le XML ne sont
+    calculés qu'à la fermeture. Les latences sont agrégées par hôte (une
+    seule fois par requête réellement envoyée) et par filière (résultats
+    issus du cache exclus).
+    """
+
+    def __init__(self, jsonl_path=None, junit_path=None, buffer_size=1 << 16):
+        self.jsonl = open(jsonl_path, 'w', encoding='utf-8', buffering=buffer_size) if jsonl_path else None
+        self.junit_path = junit_path
+        self.hosts = {}
+        self.filieres = {}
+        self.testcases = {}
+
+    def add(self, result):
+        record = {k: v for k, v in result.items() if k not in SKIPPED_FIELDS}
+        if self.jsonl is not None:
+            self.jsonl.write(json.dumps({'type': 'result', **record}, ensure_ascii=False))
+            self.jsonl.write('\n')
+
+        failed = 'error' in result
+        latency = None if result.get('cached') else result.get('latency')
+        # Une requête partagée n'est comptée qu'une fois pour son hôte
+        if result.get('probed_url', result['url']) == result['url']:
+            host = self.hosts.setdefault(urlsplit(result['url']).netloc, _Group())
+            self._count(host, result, latency, failed)
+        self._count(self.filieres.setdefault(result['filiere'], _Group()), result, latency, failed)
+
+        if self.junit_path:
+            self.testcases.setdefault(result['filiere'], []).append((
+                f"{result['filiere']}.{result['semestre']}.{result['matiere']}",
+                result['file'], result.get('latency') or 0.0, result.get('error'), result['url']
+            ))
+
+    @staticmethod
+    def _count(group, result, latency, failed):
+        group.requests += 1
+        group.errors += failed
+        group.bytes += result.get('bytes') or 0
+        if latency is not None:
+            group.latencies.append(latency)
+
+    def summary(self, elapsed):
+        return {
+            'elapsed': elapsed,
+            'hosts': {name: group.summary(elapsed) for name, group in self.hosts.items()},
+            'filieres': {name: group.summary(elapsed) for name, group in self.filieres.items()}
+        }
+
+    def close(self, elapsed):
+        """Termine le rapport et renvoie les statistiques agrégées"""
+        summary = self.summary(elapsed)
+        if self.jsonl is not None:
+            self.jsonl.write(json.dumps({'type': 'summary', **summary}, ensure_ascii=False))
+            self.jsonl.write('\n')
+            self.jsonl.close()
+        if self.junit_path:
+            self._write_junit(summary)
+        return summary
+
+    def _write_junit(self, summary):
+        total = sum(len(cases) for cases in self.testcases.values())
+        failures = sum(1 for cases in self.testcases.values() for case in cases if case[3])
+        root = ET.Element('testsuites', name='verify_github_urls', tests=str(total),
+                          failures=str(failures), time=f"{summary['elapsed']:.3f}")
+        for filiere, cases in self.testcases.items():
+            stats = summary['filieres'][filiere]
+            suite = ET.SubElement(root, 'testsuite', name=filiere, tests=str(len(cases)),
+                                  failures=str(sum(1 for case in cases if case[3])),
+                                  time=f"{sum(case[2] for case in cases):.3f}")
+            properties = ET.SubElement(suite, 'properties')
+            for key in ('p50', 'p95', 'p99', 'requests_per_s', 'bytes_per_s'):
+                if stats[key] is not None:
+                    ET.SubElement(properties, 'property', name=key, value=f"{stats[key]:.4f}")
+            for classname, name, latency, error, url in cases:
+                case = ET.SubElement(suite, 'testcase', classname=classname, name=name, time=f"{latency:.4f}")
+                if error:
+                    ET.SubElement(case, 'failure', message=str(error)).text = url
+        tree = ET.ElementTree(root)
+        ET.indent(tree)
+        tree.write(self.junit_path, encoding='utf-8', xml_declaration=True)